@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'NovaX_project.settings')
+# Serve the counseling endpoints with the async views (awaited Gemini calls)
+os.environ.setdefault('COUNSELOR_ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import os
+import tempfile
 from pathlib import Path
 # at top (optional but nice)
 from django.urls import reverse_lazy
@@ -143,3 +145,68 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+
+# Career prediction model registry (see NovaX_webpage/model_registry.py)
+CAREER_MODEL_STORE = BASE_DIR / 'NovaX_webpage' / 'model_store'
+CAREER_MODEL_CHECK_INTERVAL = 30  # seconds between checks for a newly published version
+CAREER_MODEL_MMAP = True  # memory-map the flat ensemble arrays so workers share them
+CAREER_MODEL_ARTIFACTS = True  # serve converted artifacts (manifest.json) instead of unpickling when present
+CAREER_MODEL_VERIFY_CHECKSUMS = True  # check artifact sha256 sums before serving a version
+
+# Per-worker LRU of ensemble results (see NovaX_webpage/prediction_cache.py)
+CAREER_PREDICTION_CACHE_SIZE = 4096  # rows; 0 disables the cache
+CAREER_PREDICTION_CACHE_SHARED = False  # also use the Django cache so workers share results
+CAREER_EXPLANATION_CACHE_SIZE = 1024  # profiles whose perturbation scores are kept (see explanations.py)
+
+# Off-request-thread inference (see NovaX_webpage/inference_pool.py)
+CAREER_INFERENCE_PROCESSES = 0  # pool processes per web worker; 0 scores on the request thread
+CAREER_INFERENCE_MAX_BATCH_SIZE = 64  # rows per micro-batch
+CAREER_INFERENCE_MAX_WAIT_MS = 5  # how long the dispatcher waits to fill a micro-batch
+CAREER_INFERENCE_THREADS = None  # OpenMP/BLAS threads per process; None = cpu_count // (workers x processes)
+CAREER_WEB_WORKERS = None  # web worker count for that default; None reads WEB_CONCURRENCY
+
+# Warm the models in a background thread when the app loads (gunicorn workers warm up in post_fork)
+CAREER_WARMUP_ON_STARTUP = False
+
+# Seconds between checks for attempts saved by other workers (see NovaX_webpage/similar_students.py)
+CAREER_SIMILAR_REFRESH_INTERVAL = 60
+
+# Shadow evaluation of a candidate model version on sampled traffic (see NovaX_webpage/shadow.py)
+CAREER_SHADOW_VERSION = None  # published version to compare against the active one
+CAREER_SHADOW_SAMPLE_RATE = 0.0  # fraction of scored profiles also scored by the shadow version
+CAREER_SHADOW_FLUSH_INTERVAL = 60  # seconds between writes of the ShadowComparison buckets
+
+# Streaming sketches of the live model inputs, compared by `manage.py drift_report` (see NovaX_webpage/drift.py)
+CAREER_DRIFT_SKETCHES = True
+CAREER_DRIFT_FLUSH_INTERVAL = 60  # seconds between writes of the InputSketch buckets
+
+# Return the top careers so far with every counseling answer
+CAREER_LIVE_PREDICTIONS = True
+
+# Gemini counselor calls (see NovaX_webpage/ai_counselor.py)
+COUNSELOR_MODEL = 'gemini-pro'
+# The available-model list is checked off the request path and cached on disk for this long (seconds)
+COUNSELOR_DISCOVERY_TTL = 6 * 3600
+COUNSELOR_DISCOVERY_CACHE = os.path.join(tempfile.gettempdir(), 'novax_gemini_models.json')
+COUNSELOR_CONNECT_RETRY = 30  # seconds before a failed connection is retried, doubling up to 16x
+COUNSELOR_REQUEST_TIMEOUT = 10  # seconds per Gemini call
+COUNSELOR_MAX_ATTEMPTS = 3  # tries when Gemini is rate limiting, with exponential backoff between them
+COUNSELOR_LATENCY_BUDGET = 8  # seconds one answer may spend on Gemini (all attempts and backoff)
+# Circuit breaker around Gemini (see NovaX_webpage/circuit_breaker.py): opens when at least MIN_CALLS
+# calls in the last WINDOW seconds have a FAILURE_RATE of errors or calls slower than SLOW_CALL_MS
+COUNSELOR_BREAKER_WINDOW = 60
+COUNSELOR_BREAKER_MIN_CALLS = 5
+COUNSELOR_BREAKER_FAILURE_RATE = 0.5
+COUNSELOR_BREAKER_SLOW_CALL_MS = 5000
+COUNSELOR_BREAKER_OPEN_SECONDS = 30  # rule-based only for this long, then one probe call
+# Cache of AI counselor replies per prompt fingerprint (see NovaX_webpage/reply_cache.py)
+COUNSELOR_REPLY_CACHE_SIZE = 1024  # fingerprints per worker; 0 disables the cache
+COUNSELOR_REPLY_CACHE_TTL = 3600  # seconds
+COUNSELOR_REPLY_CACHE_VARIANTS = 3  # Gemini replies collected per fingerprint, then served in rotation
+COUNSELOR_REPLY_CACHE_SHARED = False  # also keep the variants in the Django cache so workers share them
+# Concurrent identical Gemini prompts share one call (see NovaX_webpage/single_flight.py)
+COUNSELOR_SINGLE_FLIGHT = True
+COUNSELOR_SINGLE_FLIGHT_SHARED = False  # also coalesce across workers with a lock in the Django cache
+COUNSELOR_SINGLE_FLIGHT_LOCK_SECONDS = 10  # lock lifetime; waits also end with COUNSELOR_LATENCY_BUDGET
+# Route the counseling endpoints to the async views; asgi.py turns this on, WSGI keeps the sync views
+COUNSELOR_ASYNC_VIEWS = os.environ.get('COUNSELOR_ASYNC_VIEWS') == '1'
@@ -273,3 +273,21 @@ class UserAdmin(BaseUserAdmin):
 # Unregister the original User admin, then register our extended one
 admin.site.unregister(User)
 admin.site.register(User, UserAdmin)
+
+
+from .models import InputSketch, ShadowComparison
+
+
+@admin.register(ShadowComparison)
+class ShadowComparisonAdmin(admin.ModelAdmin):
+    list_display = ("bucket", "primary_version", "shadow_version", "source", "samples", "top1_agreement", "mean_rank_correlation")
+    list_filter = ("shadow_version", "source")
+    readonly_fields = [f.name for f in ShadowComparison._meta.fields]
+
+
+@admin.register(InputSketch)
+class InputSketchAdmin(admin.ModelAdmin):
+    list_display = ("bucket", "model_version", "rows")
+    list_filter = ("model_version",)
+    exclude = ("count_min",)
+    readonly_fields = ("bucket", "model_version", "rows", "histograms", "moments", "profiles")
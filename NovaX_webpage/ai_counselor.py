@@ -1,4 +1,9 @@
+import asyncio
+import hashlib
 import os
+import tempfile
+import threading
+import time
 import google.generativeai as genai
 from django.conf import settings
 import json
@@ -7,36 +12,140 @@ from time import sleep
 import google.api_core.exceptions
 import logging
 
+from .circuit_breaker import OPEN, gemini_breaker
+from .reply_cache import reply_cache
+from .single_flight import single_flight
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class EducationalCounselor:
     def __init__(self):
+        # Per Gemini call: seconds before giving up, and tries on rate limiting
+        self.request_timeout = getattr(settings, 'COUNSELOR_REQUEST_TIMEOUT', 10)
+        self.max_attempts = getattr(settings, 'COUNSELOR_MAX_ATTEMPTS', 3)
+        # Hard limit on the time one answer may spend on Gemini, retries and backoff included
+        self.latency_budget = getattr(settings, 'COUNSELOR_LATENCY_BUDGET', 8)
+        self.breaker = gemini_breaker
+
+        # The Gemini model is attached by a background thread (see connect_in_background);
+        # until then, and whenever it is unavailable, answers are rule-based
+        self.model = None
+        self.model_name = getattr(settings, 'COUNSELOR_MODEL', 'gemini-pro')
+        self.discovery_cache = getattr(
+            settings, 'COUNSELOR_DISCOVERY_CACHE', os.path.join(tempfile.gettempdir(), 'novax_gemini_models.json')
+        )
+        self.discovery_ttl = getattr(settings, 'COUNSELOR_DISCOVERY_TTL', 6 * 3600)
+        # Seconds before a failed connection is tried again, doubling with each failure
+        self.connect_retry = getattr(settings, 'COUNSELOR_CONNECT_RETRY', 30)
+        self.connection_state = 'not started'
+        self._connect_pid = None
+        self._connecting = False
+        self._connect_failures = 0
+        self._retry_at = 0.0
+        self._connect_lock = threading.Lock()
+
+    def _needs_connect(self, pid):
+        if self._connect_pid != pid:
+            # Threads do not survive fork: a forked worker starts its own
+            return True
+        return self.model is None and not self._connecting and time.monotonic() >= self._retry_at
+
+    def connect_in_background(self):
+        """Start attaching the Gemini model unless it is attached, being attached or backing off; never blocks"""
+        pid = os.getpid()
+        if not self._needs_connect(pid):
+            return
+        with self._connect_lock:
+            if not self._needs_connect(pid):
+                return
+            if self._connect_pid != pid:
+                self._connect_pid = pid
+                self._connect_failures = 0
+            self._connecting = True
+            self.connection_state = 'connecting'
+        threading.Thread(target=self._connect, name='gemini-connect', daemon=True).start()
+
+    def _connect(self):
+        state = 'failed'
+        try:
+            state = self._attach_model()
+        finally:
+            with self._connect_lock:
+                self.connection_state = state
+                if state == 'connected':
+                    self._connect_failures = 0
+                else:
+                    self._connect_failures += 1
+                    delay = self.connect_retry * 2 ** min(self._connect_failures - 1, 4)
+                    self._retry_at = time.monotonic() + delay
+                    logger.info(f"Gemini connection will be retried in {delay}s")
+                self._connecting = False
+
+    def _attach_model(self):
+        """Configure Gemini and attach the model; returns the new connection state"""
         # Retrieve API key from environment variable
         api_key = os.getenv('GEMINI_API_KEY')
         if not api_key:
             logger.error("GEMINI_API_KEY environment variable is not set. Falling back to rule-based responses.")
-            self.model = None
-            return
+            return 'no api key'
         
         try:
             genai.configure(api_key=api_key)
             # Verify available models
-            available_models = [model.name for model in genai.list_models()]
-            logger.info(f"Available Gemini models: {available_models}")
-            if 'models/gemini-pro' not in available_models:
-                logger.error("Model 'gemini-pro' not available. Falling back to rule-based responses.")
-                self.model = None
-                return
-            self.model = genai.GenerativeModel('gemini-pro')
+            available_models = self._available_models(api_key)
+            if f'models/{self.model_name}' not in available_models:
+                logger.error(f"Model '{self.model_name}' not available. Falling back to rule-based responses.")
+                return 'model unavailable'
+            self.model = genai.GenerativeModel(self.model_name)
             logger.info("✅ Gemini AI Connected Successfully!")
+            return 'connected'
         except Exception as e:
             logger.error(f"❌ Gemini AI setup failed: {str(e)}")
-            self.model = None
+            return 'failed'
+
+    def _available_models(self, api_key):
+        """Gemini model names, from the on-disk discovery cache while it is fresh"""
+        # Key the cache by the API key (hashed): another key may see other models
+        key = hashlib.sha256(api_key.encode()).hexdigest()[:16]
+        try:
+            with open(self.discovery_cache) as f:
+                cached = json.load(f)
+            if cached.get('key') == key and time.time() - cached['checked_at'] < self.discovery_ttl:
+                return cached['models']
+        except (OSError, ValueError, KeyError):
+            pass
+
+        available_models = [model.name for model in genai.list_models(request_options={'timeout': self.request_timeout})]
+        logger.info(f"Available Gemini models: {available_models}")
+        try:
+            tmp = f"{self.discovery_cache}.{os.getpid()}.tmp"
+            with open(tmp, 'w') as f:
+                json.dump({'key': key, 'checked_at': time.time(), 'models': available_models}, f)
+            os.replace(tmp, self.discovery_cache)
+        except OSError as e:
+            logger.warning(f"Could not cache the Gemini model list: {e}")
+        return available_models
+
+    def status(self):
+        return {
+            'state': self.connection_state,
+            'connect_failures': self._connect_failures,
+            'retry_in': (
+                round(max(self._retry_at - time.monotonic(), 0), 1)
+                if self.model is None and not self._connecting and self._connect_failures else None
+            ),
+            'model': self.model_name if self.model else None,
+            'discovery_cache': self.discovery_cache,
+            'circuit_breaker': self.breaker.stats(),
+            'reply_cache': reply_cache.stats(),
+            'single_flight': single_flight.stats(),
+        }
     
     def get_initial_greeting(self):
         """Return initial greeting message with human touch"""
+        self.connect_in_background()
         greetings = [
             "👋 Hello there! I'm Alex, your AI Education Counselor. I'm here to help you discover career paths that truly match who you are. Let's get to know each other better!",
             "🌟 Welcome! I'm Dr. Evans, your virtual career guide. I'll help you uncover exciting career possibilities based on your unique personality and strengths. Ready to begin our journey?",
@@ -53,7 +162,76 @@ class EducationalCounselor:
     
     def process_answer(self, user_input, current_field, conversation_step, collected_data):
         """Process user's answer and determine next question"""
+        response = self._answer_without_ai(user_input, current_field, conversation_step, collected_data)
+        if response is not None:
+            return response
+        
+        # If we have AI model, use it for more natural conversation
+        if self._use_ai(conversation_step, collected_data):
+            cache_key = reply_cache.key(self.model_name, user_input, current_field, collected_data)
+            cached = reply_cache.get(cache_key)
+            if cached is not None:
+                return cached
+            # The latency budget covers waiting for a coalesced call as well as our own
+            deadline = time.monotonic() + self.latency_budget
+            try:
+                # Students sending the same prompt at the same time share one Gemini call
+                response = single_flight.do(cache_key, lambda: self._gemini_reply(
+                    cache_key, user_input, current_field, conversation_step, collected_data, deadline
+                ), deadline=deadline, wait_shared=self.breaker.state != OPEN)
+            except Exception as e:
+                logger.error(f"AI response failed: {str(e)}. Falling back to rule-based response.")
+                return self._rule_based_next_question(user_input, current_field, conversation_step, collected_data)
+            if response is not None:
+                return dict(response)
         
+        # Rule-based flow
+        return self._rule_based_next_question(user_input, current_field, conversation_step, collected_data)
+
+    async def process_answer_async(self, user_input, current_field, conversation_step, collected_data):
+        """process_answer for async views: Gemini calls and rate-limit backoff do not block the worker"""
+        response = self._answer_without_ai(user_input, current_field, conversation_step, collected_data)
+        if response is not None:
+            return response
+
+        if self._use_ai(conversation_step, collected_data):
+            cache_key = reply_cache.key(self.model_name, user_input, current_field, collected_data)
+            cached = await reply_cache.aget(cache_key)
+            if cached is not None:
+                return cached
+            deadline = time.monotonic() + self.latency_budget
+            try:
+                response = await single_flight.do_async(cache_key, lambda: self._gemini_reply_async(
+                    cache_key, user_input, current_field, conversation_step, collected_data, deadline
+                ), deadline=deadline, wait_shared=self.breaker.state != OPEN)
+                if response is not None:
+                    return dict(response)
+            except Exception as e:
+                logger.error(f"AI response failed: {str(e)}. Falling back to rule-based response.")
+        return self._rule_based_next_question(user_input, current_field, conversation_step, collected_data)
+
+    def _gemini_reply(self, cache_key, user_input, current_field, conversation_step, collected_data, deadline):
+        """One Gemini reply, added to the reply cache; None while the circuit breaker is open"""
+        # An open breaker sends the answer straight to the rule-based flow
+        if not self.breaker.allow():
+            return None
+        response = self._ai_enhanced_response(user_input, current_field, conversation_step, collected_data, deadline)
+        reply_cache.add(cache_key, response)
+        return response
+
+    async def _gemini_reply_async(self, cache_key, user_input, current_field, conversation_step, collected_data, deadline):
+        if not self.breaker.allow():
+            return None
+        response = await self._ai_enhanced_response_async(user_input, current_field, conversation_step, collected_data, deadline)
+        await reply_cache.aadd(cache_key, response)
+        return response
+
+    def _use_ai(self, conversation_step, collected_data):
+        self.connect_in_background()
+        return bool(self.model) and len(collected_data) > 2 and not self._is_edit_mode(conversation_step)
+
+    def _answer_without_ai(self, user_input, current_field, conversation_step, collected_data):
+        """Responses that never need the AI model (edit requests, invalid scores), else None"""
         # Check if user wants to edit previous answers
         if self._is_edit_request(user_input):
             return self._handle_edit_request(user_input, collected_data)
@@ -73,17 +251,7 @@ class EducationalCounselor:
                 "show_edit_option": len(collected_data) > 0,
                 "completed": False
             }
-        
-        # If we have AI model, use it for more natural conversation
-        if self.model and len(collected_data) > 2 and not self._is_edit_mode(conversation_step):
-            try:
-                return self._ai_enhanced_response(user_input, current_field, conversation_step, collected_data)
-            except Exception as e:
-                logger.error(f"AI response failed: {str(e)}. Falling back to rule-based response.")
-                return self._rule_based_next_question(user_input, current_field, conversation_step, collected_data)
-        
-        # Rule-based flow
-        return self._rule_based_next_question(user_input, current_field, conversation_step, collected_data)
+        return None
     
     def _is_edit_request(self, user_input):
         """Check if user wants to edit previous answers"""
@@ -461,9 +629,8 @@ class EducationalCounselor:
             ("Attention_to_Detail", "preference", "Finally, how important is attention to detail in your ideal work? (1 = prefer big-picture thinking, 10 = extremely detail-oriented and precise)")
         ]
     
-    def _ai_enhanced_response(self, user_input, current_field, conversation_step, collected_data):
-        """Use AI to generate more natural responses with retry logic"""
-        prompt = f"""
+    def _ai_prompt(self, user_input, current_field, collected_data):
+        return f"""
         You are a warm, empathetic educational counselor named Alex having a natural conversation with a student. 
         So far you've collected these ratings (1-10 scale): {collected_data}
         
@@ -484,22 +651,88 @@ class EducationalCounselor:
             "show_edit_option": true
         }}
         """
+
+    def _attempt_timeout(self, deadline, attempt):
+        """Timeout for this attempt, or None when the latency budget is spent or the breaker opened"""
+        remaining = deadline - time.monotonic()
+        if remaining <= 0.1:
+            return None
+        # The first attempt was admitted by _gemini_reply; retries must pass the breaker again
+        if attempt > 1 and not self.breaker.allow():
+            return None
+        return min(self.request_timeout, remaining)
+
+    def _backoff(self, deadline, attempt):
+        """Seconds to wait before the next attempt, or None to stop retrying"""
+        delay = 2 ** attempt
+        if attempt >= self.max_attempts or time.monotonic() + delay >= deadline:
+            return None
+        return delay
+
+    def _ai_enhanced_response(self, user_input, current_field, conversation_step, collected_data, deadline=None):
+        """Use AI to generate more natural responses with retry logic"""
+        prompt = self._ai_prompt(user_input, current_field, collected_data)
+        deadline = deadline or time.monotonic() + self.latency_budget
         
-        max_attempts = 3
-        attempt = 0
-        while attempt < max_attempts:
+        for attempt in range(1, self.max_attempts + 1):
+            timeout = self._attempt_timeout(deadline, attempt)
+            if timeout is None:
+                break
+            started = time.monotonic()
             try:
-                response = self.model.generate_content(prompt)
-                return json.loads(response.text)
+                response = self.model.generate_content(prompt, request_options={'timeout': timeout})
             except google.api_core.exceptions.ResourceExhausted:
-                attempt += 1
-                logger.warning(f"Rate limit hit, retrying attempt {attempt}/{max_attempts}")
-                sleep(2 ** attempt)  # Exponential backoff
+                self.breaker.record_failure()
+                logger.warning(f"Rate limit hit, retrying attempt {attempt}/{self.max_attempts}")
+                delay = self._backoff(deadline, attempt)
+                if delay is None:
+                    break
+                sleep(delay)  # Exponential backoff
+                continue
             except Exception as e:
+                self.breaker.record_failure()
                 logger.error(f"AI response failed: {str(e)}")
                 raise
-        logger.error("Max retry attempts exceeded for AI response")
-        raise Exception("Failed to generate AI response after retries")
+            self.breaker.record_success((time.monotonic() - started) * 1000)
+            return json.loads(response.text)
+        logger.error("Retry attempts or latency budget exhausted for AI response")
+        raise Exception("Failed to generate AI response within the latency budget")
+
+    async def _ai_enhanced_response_async(self, user_input, current_field, conversation_step, collected_data, deadline=None):
+        """_ai_enhanced_response on the event loop: awaits the call and the backoff instead of sleeping"""
+        prompt = self._ai_prompt(user_input, current_field, collected_data)
+        deadline = deadline or time.monotonic() + self.latency_budget
+
+        for attempt in range(1, self.max_attempts + 1):
+            timeout = self._attempt_timeout(deadline, attempt)
+            if timeout is None:
+                break
+            started = time.monotonic()
+            try:
+                # wait_for is the hard limit even if the transport ignores its own timeout
+                response = await asyncio.wait_for(
+                    self.model.generate_content_async(prompt, request_options={'timeout': timeout}),
+                    timeout=timeout,
+                )
+            except google.api_core.exceptions.ResourceExhausted:
+                self.breaker.record_failure()
+                logger.warning(f"Rate limit hit, retrying attempt {attempt}/{self.max_attempts}")
+                delay = self._backoff(deadline, attempt)
+                if delay is None:
+                    break
+                await asyncio.sleep(delay)  # Exponential backoff, other chats keep running
+                continue
+            except asyncio.TimeoutError:
+                self.breaker.record_failure()
+                logger.error(f"AI response timed out after {timeout:.1f}s")
+                raise
+            except Exception:
+                self.breaker.record_failure()
+                raise
+            self.breaker.record_success((time.monotonic() - started) * 1000)
+            return json.loads(response.text)
+        logger.error("Retry attempts or latency budget exhausted for AI response")
+        raise Exception("Failed to generate AI response within the latency budget")
 
 # Global instance
 counselor = EducationalCounselor()
\ No newline at end of file
@@ -1,6 +1,14 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class NovaxWebpageConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'NovaX_webpage'
+
+    def ready(self):
+        # Warm the prediction models once the app registry is ready (off for manage.py commands)
+        if getattr(settings, 'CAREER_WARMUP_ON_STARTUP', False):
+            from .warmup import warm_up_in_background
+
+            warm_up_in_background()
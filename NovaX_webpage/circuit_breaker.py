@@ -0,0 +1,146 @@
+"""
+Circuit breaker around the Gemini counselor calls.
+
+Every call outcome is recorded in a rolling time window; a call that
+succeeds but takes longer than ``slow_call_ms`` counts as a failure. Once the
+window holds at least ``min_calls`` outcomes and the failure rate reaches
+``failure_rate``, the breaker opens: ``allow()`` answers False without
+touching the network, so counseling goes straight to the rule-based path.
+After ``open_seconds`` it lets ``half_open_calls`` probe calls through; a
+successful probe closes it again, a failed one re-opens it.
+
+State is per worker process and shared by all of its threads (and the
+event loop of the async views).
+"""
+import logging
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+class CircuitBreaker:
+    """Rolling-window failure / latency breaker (see module docstring)"""
+
+    def __init__(self, name, window=60, min_calls=5, failure_rate=0.5, slow_call_ms=5000,
+                 open_seconds=30, half_open_calls=1):
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_ms = slow_call_ms
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self.state = CLOSED
+        self._lock = threading.Lock()
+        self._outcomes = deque()  # (monotonic time, failed)
+        self._opened_at = None
+        self._probes = 0
+        self._probe_started = None
+        self.calls = 0
+        self.failures = 0
+        self.slow_calls = 0
+        self.rejected = 0
+        self.times_opened = 0
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            'gemini',
+            window=getattr(settings, 'COUNSELOR_BREAKER_WINDOW', 60),
+            min_calls=getattr(settings, 'COUNSELOR_BREAKER_MIN_CALLS', 5),
+            failure_rate=getattr(settings, 'COUNSELOR_BREAKER_FAILURE_RATE', 0.5),
+            slow_call_ms=getattr(settings, 'COUNSELOR_BREAKER_SLOW_CALL_MS', 5000),
+            open_seconds=getattr(settings, 'COUNSELOR_BREAKER_OPEN_SECONDS', 30),
+        )
+
+    def allow(self):
+        """Whether a call may go out now; callers must record its outcome"""
+        now = time.monotonic()
+        with self._lock:
+            if self.state == OPEN:
+                if now - self._opened_at < self.open_seconds:
+                    self.rejected += 1
+                    return False
+                self.state = HALF_OPEN
+                self._probes = 0
+                logger.info(f"Circuit {self.name} half-open: probing")
+            if self.state == HALF_OPEN:
+                if self._probes >= self.half_open_calls:
+                    if now - self._probe_started < self.open_seconds:
+                        self.rejected += 1
+                        return False
+                    # The probes never reported back (e.g. a cancelled request): send new ones
+                    self._probes = 0
+                self._probes += 1
+                self._probe_started = now
+            return True
+
+    def record_success(self, latency_ms):
+        slow = latency_ms >= self.slow_call_ms
+        with self._lock:
+            self.calls += 1
+            self.slow_calls += slow
+            if self.state == HALF_OPEN and not slow:
+                self.state = CLOSED
+                self._outcomes.clear()
+                logger.info(f"Circuit {self.name} closed")
+                return
+            self._record_locked(failed=slow)
+
+    def record_failure(self):
+        with self._lock:
+            self.calls += 1
+            self.failures += 1
+            self._record_locked(failed=True)
+
+    def _record_locked(self, failed):
+        now = time.monotonic()
+        if self.state == HALF_OPEN:
+            if failed:
+                self._open_locked(now)
+            return
+        self._outcomes.append((now, failed))
+        while self._outcomes and now - self._outcomes[0][0] > self.window:
+            self._outcomes.popleft()
+        if self.state == CLOSED and len(self._outcomes) >= self.min_calls:
+            failed_calls = sum(1 for _, f in self._outcomes if f)
+            if failed_calls / len(self._outcomes) >= self.failure_rate:
+                self._open_locked(now)
+
+    def _open_locked(self, now):
+        self.state = OPEN
+        self._opened_at = now
+        self._outcomes.clear()
+        self.times_opened += 1
+        logger.warning(f"Circuit {self.name} open for {self.open_seconds}s")
+
+    def stats(self):
+        with self._lock:
+            recent = len(self._outcomes)
+            recent_failures = sum(1 for _, f in self._outcomes if f)
+            return {
+                'state': self.state,
+                'recent_calls': recent,
+                'recent_failure_rate': round(recent_failures / recent, 3) if recent else None,
+                'open_for_seconds': (
+                    round(max(self.open_seconds - (time.monotonic() - self._opened_at), 0), 1)
+                    if self.state == OPEN else None
+                ),
+                'calls': self.calls,
+                'failures': self.failures,
+                'slow_calls': self.slow_calls,
+                'rejected': self.rejected,
+                'times_opened': self.times_opened,
+            }
+
+
+# Global instance
+gemini_breaker = CircuitBreaker.from_settings()
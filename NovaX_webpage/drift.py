@@ -0,0 +1,297 @@
+"""
+Streaming sketches of the model inputs seen in production.
+
+Every live prediction adds its input rows to three per-worker sketches:
+
+* a fixed-bin histogram per feature (one bin per answer value 1-10, plus an
+  underflow and an overflow bin) with the running sum and sum of squares;
+* a count-min sketch of whole input rows, so the frequency of any profile
+  can be estimated after merging workers;
+* a handful of heavy-hitter candidates (the rows with the highest count-min
+  estimate in this worker), so the report can name the common profiles.
+
+Updating is a few vectorized numpy calls and one small hash per row. The
+sketches are flushed to hourly ``InputSketch`` rows every
+``CAREER_DRIFT_FLUSH_INTERVAL`` seconds from a background thread, adding to
+what other workers already wrote. ``manage.py drift_report`` compares a
+window of them against the training-time baseline.
+"""
+import hashlib
+import logging
+import struct
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from .feature_schema import ANSWER_MAX, ANSWER_MIN, CAREER_FEATURES
+
+logger = logging.getLogger(__name__)
+
+# Bin edges halfway between answer values: bin 0 is underflow, the last is overflow
+BIN_EDGES = np.arange(ANSWER_MIN - 0.5, ANSWER_MAX + 1.0)
+N_BINS = len(BIN_EDGES) + 1
+BIN_LABELS = ['<'] + [str(v) for v in range(ANSWER_MIN, ANSWER_MAX + 1)] + ['>']
+
+COUNT_MIN_DEPTH = 4
+COUNT_MIN_WIDTH = 1024
+TOP_PROFILES = 20
+# Failed flushes kept for retrying before the oldest is dropped
+MAX_FAILED_SNAPSHOTS = 10
+
+
+_CELLS = struct.Struct(f'<{COUNT_MIN_DEPTH}I')
+
+
+def row_digest(row):
+    """Stable (cross-process) hash of one input row; ``.hex()`` is its key"""
+    return hashlib.blake2b(np.asarray(row, dtype=np.float64).tobytes(), digest_size=4 * COUNT_MIN_DEPTH).digest()
+
+
+def count_min_cells(digest, width=COUNT_MIN_WIDTH):
+    """Flat index of the row's counter in each count-min row (4 hash bytes per row)"""
+    return [d * width + h % width for d, h in enumerate(_CELLS.unpack(digest))]
+
+
+def count_min_estimate(table, key):
+    table = np.asarray(table)
+    return int(table.ravel()[count_min_cells(bytes.fromhex(key), table.shape[1])].min())
+
+
+class DriftSketch:
+    """Per-worker input sketches, periodically added to the database"""
+
+    def __init__(self, features=CAREER_FEATURES, flush_interval=60, enabled=True):
+        self.features = tuple(features)
+        self.flush_interval = flush_interval
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._flushing = threading.Lock()
+        self._offsets = np.arange(len(self.features)) * N_BINS
+        self._reset()
+        self._next_flush = time.monotonic() + flush_interval
+        self.observed = 0
+        self.flushes = 0
+        self.errors = 0
+        self.dropped_rows = 0
+        self._failed = []  # snapshots whose write failed, retried on the next flush
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            flush_interval=getattr(settings, 'CAREER_DRIFT_FLUSH_INTERVAL', 60),
+            enabled=getattr(settings, 'CAREER_DRIFT_SKETCHES', True),
+        )
+
+    def _reset(self):
+        self._version = None
+        self._rows = 0
+        self._hist = np.zeros(len(self.features) * N_BINS, dtype=np.int64)
+        self._sum = np.zeros(len(self.features))
+        self._sumsq = np.zeros(len(self.features))
+        # A flat list: single-counter updates are far cheaper than on a numpy array
+        self._count_min = [0] * (COUNT_MIN_DEPTH * COUNT_MIN_WIDTH)
+        self._profiles = {}  # digest -> (estimate, row)
+
+    # ----- updating (request path) -----
+
+    def observe(self, bundle, input_array):
+        """Add the N x n_features input rows of one prediction call"""
+        if not self.enabled or input_array.shape[1] != len(self.features):
+            return
+        bins = np.searchsorted(BIN_EDGES, input_array, side='right') + self._offsets
+        counts = np.bincount(bins.ravel(), minlength=len(self._hist))
+        digests = [row_digest(row) for row in input_array]
+
+        previous = None
+        with self._lock:
+            if self._version != bundle.version and self._rows:
+                # Keep buckets per version: flush what the old one collected first
+                previous = self._snapshot_locked()
+            self._version = bundle.version
+            self._rows += len(input_array)
+            self._hist += counts
+            self._sum += input_array.sum(axis=0)
+            self._sumsq += np.einsum('ij,ij->j', input_array, input_array)
+            for digest, row in zip(digests, input_array):
+                self._add_profile(digest, row)
+            self.observed += len(input_array)
+
+        if previous:
+            self._write_in_background(previous)
+        if time.monotonic() >= self._next_flush:
+            self._next_flush = time.monotonic() + self.flush_interval
+            self._write_in_background(self._snapshot())
+
+    def _add_profile(self, digest, row):
+        count_min = self._count_min
+        cells = count_min_cells(digest)
+        for cell in cells:
+            count_min[cell] += 1
+        estimate = min(count_min[cell] for cell in cells)
+        if digest in self._profiles or len(self._profiles) < TOP_PROFILES:
+            self._profiles[digest] = (estimate, row)
+            return
+        weakest = min(self._profiles, key=lambda k: self._profiles[k][0])
+        if estimate > self._profiles[weakest][0]:
+            del self._profiles[weakest]
+            self._profiles[digest] = (estimate, row)
+
+    # ----- flushing -----
+
+    def _write_in_background(self, snapshot):
+        from django.db import connection
+
+        def run():
+            try:
+                self._write_pending(snapshot)
+            finally:
+                connection.close()
+
+        if snapshot or self._failed:
+            threading.Thread(target=run, name='drift-flush', daemon=True).start()
+
+    def _snapshot_locked(self):
+        """Take the collected sketches and start new ones (caller holds the lock)"""
+        if not self._rows:
+            return None
+        snapshot = {
+            'version': self._version,
+            'rows': self._rows,
+            'hist': self._hist.reshape(len(self.features), N_BINS),
+            'sum': self._sum,
+            'sumsq': self._sumsq,
+            'count_min': np.array(self._count_min, dtype=np.int64).reshape(COUNT_MIN_DEPTH, COUNT_MIN_WIDTH),
+            'profiles': {digest.hex(): row for digest, (_, row) in self._profiles.items()},
+        }
+        self._reset()
+        return snapshot
+
+    def _snapshot(self):
+        with self._lock:
+            return self._snapshot_locked()
+
+    def flush(self):
+        """Write the collected sketches now (e.g. when a worker exits)"""
+        self._next_flush = time.monotonic() + self.flush_interval
+        self._write_pending(self._snapshot())
+
+    def _write_pending(self, snapshot):
+        """Write ``snapshot`` and any earlier ones whose write failed; keep what fails again"""
+        with self._lock:
+            pending, self._failed = self._failed, []
+        if snapshot:
+            pending.append(snapshot)
+        for item in pending:
+            if not self._write(item):
+                with self._lock:
+                    self._failed.append(item)
+                    if len(self._failed) > MAX_FAILED_SNAPSHOTS:
+                        # The database has been unavailable for many intervals: drop the oldest
+                        dropped = self._failed.pop(0)
+                        self.dropped_rows += dropped['rows']
+
+    def _write(self, snapshot):
+        from django.db import transaction
+
+        from .models import InputSketch
+
+        hour = timezone.now().replace(minute=0, second=0, microsecond=0)
+        try:
+            # One writer per worker at a time keeps the read-add-save below simple
+            with self._flushing, transaction.atomic():
+                row, _ = InputSketch.objects.select_for_update().get_or_create(
+                    bucket=hour, model_version=snapshot['version']
+                )
+                row.rows += snapshot['rows']
+                for i, feature in enumerate(self.features):
+                    hist = row.histograms.get(feature) or [0] * N_BINS
+                    row.histograms[feature] = (np.asarray(hist) + snapshot['hist'][i]).tolist()
+                    total, total_sq = row.moments.get(feature) or (0.0, 0.0)
+                    row.moments[feature] = [total + float(snapshot['sum'][i]), total_sq + float(snapshot['sumsq'][i])]
+                count_min = np.asarray(row.count_min) if row.count_min else 0
+                row.count_min = (count_min + snapshot['count_min']).tolist()
+                for key, values in snapshot['profiles'].items():
+                    row.profiles[key] = dict(zip(self.features, np.asarray(values).tolist()))
+                if len(row.profiles) > 4 * TOP_PROFILES:
+                    # Keep the candidates that are still frequent after merging workers
+                    ranked = sorted(row.profiles, key=lambda key: -count_min_estimate(row.count_min, key))
+                    row.profiles = {key: row.profiles[key] for key in ranked[:4 * TOP_PROFILES]}
+                row.save()
+            self.flushes += 1
+            return True
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Could not save input drift sketches (kept for the next flush): {e}")
+            return False
+
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'observed': self.observed,
+            'unflushed_rows': self._rows + sum(item['rows'] for item in self._failed),
+            'dropped_rows': self.dropped_rows,
+            'flushes': self.flushes,
+            'errors': self.errors,
+        }
+
+
+# ----- reporting -----
+
+def merge_sketches(sketches, features=CAREER_FEATURES):
+    """Add up InputSketch rows: (rows, histograms, moments, count-min table, profiles)"""
+    rows = 0
+    hist = np.zeros((len(features), N_BINS), dtype=np.int64)
+    moments = np.zeros((len(features), 2))
+    count_min = np.zeros((COUNT_MIN_DEPTH, COUNT_MIN_WIDTH), dtype=np.int64)
+    profiles = {}
+    for sketch in sketches:
+        rows += sketch.rows
+        for i, feature in enumerate(features):
+            if feature in sketch.histograms:
+                hist[i] += sketch.histograms[feature]
+                moments[i] += sketch.moments[feature]
+        if sketch.count_min:
+            count_min += np.asarray(sketch.count_min)
+        profiles.update(sketch.profiles)
+    return rows, hist, moments, count_min, profiles
+
+
+def histogram_baseline(matrix):
+    """Fixed-bin histograms (n_features x N_BINS) of a training input matrix"""
+    matrix = np.asarray(matrix, dtype=np.float64)
+    bins = np.searchsorted(BIN_EDGES, matrix, side='right')
+    return np.stack([np.bincount(bins[:, i], minlength=N_BINS) for i in range(matrix.shape[1])])
+
+
+def population_stability(expected, actual, floor=1e-4):
+    """Population stability index between two histograms (> 0.25 is a large shift)"""
+    expected = np.maximum(np.asarray(expected, dtype=np.float64) / max(np.sum(expected), 1), floor)
+    actual = np.maximum(np.asarray(actual, dtype=np.float64) / max(np.sum(actual), 1), floor)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+def training_baseline(bundle):
+    """What the model's fitted scaler recorded about its training inputs.
+
+    ``{'mean', 'std'}`` for a StandardScaler, ``{'min', 'max'}`` for a
+    MinMaxScaler (arrays in feature order), or an empty dict.
+    """
+    if bundle.flat is not None:
+        op, a, b = bundle.flat.scaler, bundle.flat.scale_a, bundle.flat.scale_b
+    else:
+        from .tree_export import _scaler_arrays
+        op, a, b = _scaler_arrays(bundle.scaler, bundle.schema.n_features)
+    a, b = np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64)
+    if op == 'standard':
+        return {'mean': a, 'std': b}
+    if op == 'minmax':
+        # x * a + b maps the training range onto [0, 1]
+        return {'min': -b / a, 'max': (1 - b) / a}
+    return {}
+
+
+# Global instance
+drift_sketch = DriftSketch.from_settings()
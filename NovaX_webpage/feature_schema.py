@@ -0,0 +1,112 @@
+"""
+Feature schema for the career prediction model.
+
+One place that knows the 13 model inputs, their training order and where
+each value comes from in counseling data, survey responses or API payloads.
+"""
+import numpy as np
+
+# Use the EXACT features (and order) the model was trained on
+CAREER_FEATURES = (
+    "O_score", "C_score", "E_score", "A_score", "N_score",
+    "Numerical Aptitude", "Spatial Aptitude", "Perceptual Aptitude",
+    "Abstract Reasoning", "Verbal Reasoning",
+    "Enjoy_Teamwork", "Creative_Thinking", "Attention_to_Detail",
+)
+
+# Training feature name -> key used in collected data.
+# None means the value is not collected and the default is always used.
+# Features not listed here use the same name in collected data.
+CAREER_FEATURE_SOURCES = {
+    "Numerical Aptitude": "Numerical_Aptitude",
+    "Spatial Aptitude": "Spatial_Aptitude",
+    "Perceptual Aptitude": None,  # Not currently collected
+    "Abstract Reasoning": "Abstract_Reasoning",
+    "Verbal Reasoning": "Verbal_Aptitude",
+}
+
+# Neutral value used for anything the student did not answer
+DEFAULT_FEATURE_VALUE = 5.0
+
+# Scale of every collected answer
+ANSWER_MIN = 1
+ANSWER_MAX = 10
+
+# Stand-in key for features that are never read from collected data
+_NOT_COLLECTED = object()
+
+
+class FeatureSchema:
+    """Turns feature dicts into contiguous model input rows / matrices.
+
+    The key lookups are resolved once here, so building a row is a single
+    list comprehension of ``dict.get`` calls with no per-request setup.
+    Values may be given under the collected name (``Verbal_Aptitude``) or
+    the training name (``Verbal Reasoning``); the collected name wins.
+    """
+
+    def __init__(self, features, sources=None, default=DEFAULT_FEATURE_VALUE, dtype=np.float64):
+        sources = sources or {}
+        self.features = tuple(features)
+        self.default = float(default)
+        self.dtype = np.dtype(dtype)
+
+        # (collected key, training name) pairs in model column order; features
+        # that are not collected are looked up under neither name
+        keys = []
+        for feat in self.features:
+            source = sources.get(feat, feat)
+            keys.append((_NOT_COLLECTED, _NOT_COLLECTED) if source is None else (source, feat))
+        self._keys = tuple(keys)
+        self.source_keys = tuple(None if k is _NOT_COLLECTED else k for k, _ in self._keys)
+        self.index = {feat: col for col, feat in enumerate(self.features)}
+        # Collected key / training name -> column, for callers that edit single columns
+        for col, key in enumerate(self.source_keys):
+            if key is not None:
+                self.index.setdefault(key, col)
+
+    def __len__(self):
+        return len(self.features)
+
+    @property
+    def n_features(self):
+        return len(self.features)
+
+    def _values(self, data):
+        get = data.get
+        default = self.default
+        return [get(key, get(feat, default)) for key, feat in self._keys]
+
+    def row(self, data, dtype=None):
+        """Return a 1-D input row for one feature dict"""
+        return self._check_finite(np.array(self._values(data), dtype=dtype or self.dtype))
+
+    def matrix(self, records, dtype=None):
+        """Return a C-contiguous N x n_features input matrix"""
+        values = self._values
+        matrix = np.array([values(data) for data in records], dtype=dtype or self.dtype)
+        return self._check_finite(matrix.reshape(-1, self.n_features))
+
+    def _check_finite(self, array):
+        # null (None -> NaN) or inf would silently fall through every tree split
+        if not np.isfinite(array).all():
+            columns = np.flatnonzero(~np.isfinite(array.reshape(-1, self.n_features)).all(axis=0))
+            raise ValueError(f"Feature values must be finite numbers: {[self.features[c] for c in columns]}")
+        return array
+
+    def validate(self, scaler):
+        """Check the schema against what the fitted scaler expects"""
+        expected = getattr(scaler, 'n_features_in_', None)
+        if expected is not None and expected != self.n_features:
+            raise ValueError(
+                f"Feature schema has {self.n_features} features but the scaler expects {expected}"
+            )
+        names = getattr(scaler, 'feature_names_in_', None)
+        if names is not None and tuple(names) != self.features:
+            raise ValueError(f"Feature schema order {self.features} does not match scaler features {tuple(names)}")
+        return self
+
+
+def career_feature_schema(dtype=np.float64):
+    """Build the schema used by the career ensemble"""
+    return FeatureSchema(CAREER_FEATURES, CAREER_FEATURE_SOURCES, dtype=dtype)
@@ -0,0 +1,213 @@
+"""
+Process pool that runs ensemble inference off the request threads.
+
+Request threads put their input rows on a queue; a dispatcher thread groups
+whatever arrives within ``max_wait_ms`` (up to ``max_batch_size`` rows) into
+one micro-batch per model version and hands it to a pool process, which keeps
+its own preloaded models. BLAS/OpenMP threads of xgboost and scikit-learn
+therefore run in the pool processes, not next to the request handlers.
+
+Disabled unless ``CAREER_INFERENCE_PROCESSES`` > 0; when the pool is off,
+broken or too slow, callers fall back to in-process ``bundle.predict_proba``.
+"""
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+# ----- pool process side -----
+
+def _init_process():
+    """Set up Django and load the active models once per pool process"""
+    import django
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'NovaX_project.settings')
+    django.setup()
+    from .warmup import warm_up
+
+    # Score in this process; never start a nested pool from here
+    inference_pool.processes = 0
+
+    state = warm_up()
+    logger.info(f"Inference process {os.getpid()} ready with models {state.get('version')}")
+
+
+def _score(version, input_array):
+    """Average ensemble probabilities for one micro-batch"""
+    from .model_registry import registry
+
+    bundle = registry.get(version)
+    if bundle is None:
+        raise RuntimeError(f'Prediction models {version} are not loaded in the inference process.')
+    return bundle.predict_proba(input_array)
+
+
+# ----- request process side -----
+
+class InferencePool:
+    """Micro-batching front end for a pool of inference processes"""
+
+    def __init__(self, processes=0, max_batch_size=64, max_wait_ms=5, timeout=10, start_method='spawn'):
+        self.processes = processes
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.timeout = timeout
+        self.start_method = start_method
+        self._queue = queue.Queue()
+        self._executor = None
+        self._dispatcher = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.rows = 0
+        self.fallbacks = 0
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            processes=getattr(settings, 'CAREER_INFERENCE_PROCESSES', 0),
+            max_batch_size=getattr(settings, 'CAREER_INFERENCE_MAX_BATCH_SIZE', 64),
+            max_wait_ms=getattr(settings, 'CAREER_INFERENCE_MAX_WAIT_MS', 5),
+            timeout=getattr(settings, 'CAREER_INFERENCE_TIMEOUT', 10),
+        )
+
+    @property
+    def enabled(self):
+        return self.processes > 0
+
+    def _ensure_started(self):
+        # Started lazily so each gunicorn worker gets its own pool after fork
+        if self._pid == os.getpid() and self._executor is not None:
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._executor is not None:
+                return
+            self._queue = queue.Queue()
+            self._executor = self._new_executor()
+            self._dispatcher = threading.Thread(target=self._dispatch, name='inference-dispatcher', daemon=True)
+            self._dispatcher.start()
+            self._pid = os.getpid()
+            logger.info(f"Inference pool started: {self.processes} processes, "
+                        f"batches of <= {self.max_batch_size} rows, {self.max_wait * 1000:.0f}ms wait")
+
+    def _new_executor(self):
+        return ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=multiprocessing.get_context(self.start_method),
+            initializer=_init_process,
+        )
+
+    def submit(self, version, input_array):
+        """Queue rows for scoring; returns a Future of their probabilities"""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((version, np.asarray(input_array, dtype=np.float64), future))
+        return future
+
+    def predict_proba(self, bundle, input_array):
+        """Score ``input_array`` in the pool, or in-process if that is not possible"""
+        if not self.enabled:
+            return bundle.predict_proba(input_array)
+        try:
+            return self.submit(bundle.version, input_array).result(timeout=self.timeout)
+        except Exception as e:
+            self.fallbacks += 1
+            logger.warning(f"Inference pool unavailable, scoring in-process: {e!r}")
+            return bundle.predict_proba(input_array)
+
+    def _dispatch(self):
+        while True:
+            pending = [self._queue.get()]
+            try:
+                self._gather(pending)
+                by_version = {}
+                for item in pending:
+                    by_version.setdefault(item[0], []).append(item)
+                for version, items in by_version.items():
+                    self._run_batch(version, items)
+            except Exception as e:
+                # The dispatcher must survive anything: fail these callers now
+                # instead of leaving them to their timeout
+                logger.exception(f"Inference dispatcher error: {e}")
+                self._fail(pending, e)
+
+    def _gather(self, pending):
+        """Add everything that arrives before the wait deadline (or until the batch is full)"""
+        n_rows = len(pending[0][1])
+        deadline = time.monotonic() + self.max_wait
+        while n_rows < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            pending.append(item)
+            n_rows += len(item[1])
+
+    def _fail(self, items, error):
+        """Fail the futures of ``items`` that have no outcome yet"""
+        for _, _, future in items:
+            if not future.done():
+                future.set_exception(error)
+
+    def _run_batch(self, version, items):
+        try:
+            batch = np.vstack([rows for _, rows, _ in items])
+            self.batches += 1
+            self.rows += len(batch)
+            result = self._executor.submit(_score, version, batch)
+        except Exception as e:
+            if isinstance(e, BrokenProcessPool):
+                # A pool process died: start a fresh pool for the next batches
+                logger.error(f"Inference pool broken, restarting it: {e}")
+                self._executor = self._new_executor()
+            self._fail(items, e)
+            return
+
+        def deliver(done):
+            error = done.exception()
+            start = 0
+            for _, rows, future in items:
+                # Futures the dispatcher already failed keep that outcome
+                if not future.done():
+                    if error is not None:
+                        future.set_exception(error)
+                    else:
+                        future.set_result(done.result()[start:start + len(rows)])
+                start += len(rows)
+
+        result.add_done_callback(deliver)
+
+    def shutdown(self):
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'processes': self.processes,
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000,
+            'batches': self.batches,
+            'rows': self.rows,
+            'avg_batch_rows': round(self.rows / self.batches, 2) if self.batches else None,
+            'queued': self._queue.qsize(),
+            'fallbacks': self.fallbacks,
+        }
+
+
+# Global instance
+inference_pool = InferencePool.from_settings()
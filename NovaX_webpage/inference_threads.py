@@ -0,0 +1,101 @@
+"""
+Per-process BLAS/OpenMP thread budget for ensemble inference.
+
+Every gunicorn worker (and every inference pool process) would otherwise
+let xgboost / scikit-learn start one OpenMP and one BLAS thread per core,
+so N workers start N x cores threads competing for the same cores.
+Model calls first run ``ensure_limits()``, which caps the native pools at
+``CAREER_INFERENCE_THREADS`` threads, by default
+``cpu_count // (web workers x inference processes per worker)``. The cap is
+process-wide and left in place: restoring it after every call would race
+between concurrent request threads.
+"""
+import logging
+import os
+import threading
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_controller = None
+_applied_budget = None
+_controller_lock = threading.Lock()
+
+
+def cpu_count():
+    """CPUs this process may run on (respects affinity / container cpusets)"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def web_workers():
+    """Web worker processes sharing the machine (gunicorn reads WEB_CONCURRENCY too)"""
+    workers = getattr(settings, 'CAREER_WEB_WORKERS', None) or os.environ.get('WEB_CONCURRENCY') or 1
+    return max(1, int(workers))
+
+
+def thread_budget():
+    """Native threads one process may use for a model call"""
+    budget = getattr(settings, 'CAREER_INFERENCE_THREADS', None)
+    if budget:
+        return max(1, int(budget))
+    processes = getattr(settings, 'CAREER_INFERENCE_PROCESSES', 0)
+    # With the inference pool on, the pool processes do the scoring
+    return max(1, cpu_count() // (web_workers() * max(1, processes)))
+
+
+def _get_controller():
+    global _controller
+    if _controller is None:
+        with _controller_lock:
+            if _controller is None:
+                from threadpoolctl import ThreadpoolController
+
+                _controller = ThreadpoolController()
+    return _controller
+
+
+def reset():
+    """Forget the known thread pools (call after importing new native libraries)"""
+    global _controller, _applied_budget
+    with _controller_lock:
+        _controller = None
+        _applied_budget = None
+
+
+def ensure_limits():
+    """Cap OpenMP/BLAS threads at the budget (cheap once applied)"""
+    global _applied_budget
+    budget = thread_budget()
+    if _applied_budget == budget:
+        return budget
+    controller = _get_controller()
+    with _controller_lock:
+        # Not used as a context manager, so the limits stay in effect
+        controller.limit(limits=budget)
+        _applied_budget = budget
+    logger.info(f"Inference thread budget {budget} applied to {len(controller.lib_controllers)} native pools")
+    return budget
+
+
+def describe():
+    """Budget and the native thread pools currently loaded (for diagnostics)"""
+    return {
+        'cpu_count': cpu_count(),
+        'web_workers': web_workers(),
+        'inference_processes': getattr(settings, 'CAREER_INFERENCE_PROCESSES', 0),
+        'budget': thread_budget(),
+        'applied': _applied_budget,
+        'pools': [
+            {
+                'user_api': info.get('user_api'),
+                'internal_api': info.get('internal_api'),
+                'num_threads': info.get('num_threads'),
+                'prefix': info.get('prefix'),
+            }
+            for info in _get_controller().info()
+        ],
+    }
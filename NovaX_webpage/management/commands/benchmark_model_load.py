@@ -0,0 +1,88 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from NovaX_webpage.model_artifacts import read_manifest
+from NovaX_webpage.model_registry import registry
+
+# Each run is a fresh interpreter, so import costs (scikit-learn, xgboost)
+# count as part of start-up, like in a newly booted worker.
+_SETUP = """
+import json, os, sys, time
+import numpy as np
+import django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', {settings!r})
+django.setup()
+path, version = {path!r}, {version!r}
+row = np.full((1, 13), 5.0)
+started = time.perf_counter()
+"""
+
+_PICKLE = """
+import pickle
+with open(os.path.join(path, 'ensemble_models_optuna.pkl'), 'rb') as f:
+    models = pickle.load(f)
+with open(os.path.join(path, 'label_encoder.pkl'), 'rb') as f:
+    label_encoder = pickle.load(f)
+with open(os.path.join(path, 'scaler.pkl'), 'rb') as f:
+    scaler = pickle.load(f)
+loaded = time.perf_counter()
+probas = np.mean([m.predict_proba(scaler.transform(row)) for m in models], axis=0)
+label_encoder.classes_[probas.argmax()]
+"""
+
+_ARTIFACTS = """
+from NovaX_webpage.model_registry import load_bundle
+bundle = load_bundle(path, version)
+loaded = time.perf_counter()
+bundle.classes[bundle.predict_proba(row).argmax()]
+"""
+
+_REPORT = """
+print(json.dumps({'load': loaded - started, 'first_prediction': time.perf_counter() - started}))
+"""
+
+
+class Command(BaseCommand):
+    help = "Compare worker start-up time of pickled models against the converted artifact bundle."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model-version', default=None, help='Model version to benchmark (default: the active one)')
+        parser.add_argument('--repeat', type=int, default=5, help='Fresh processes per format')
+
+    def _run(self, body, path, version):
+        code = _SETUP.format(settings=os.environ.get('DJANGO_SETTINGS_MODULE', 'NovaX_project.settings'),
+                             path=path, version=version) + body + _REPORT
+        result = subprocess.run(
+            [sys.executable, '-c', code], capture_output=True, text=True, cwd=str(settings.BASE_DIR)
+        )
+        if result.returncode != 0:
+            raise CommandError(result.stderr.strip().splitlines()[-1])
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    def handle(self, *args, **options):
+        version = options['model_version'] or registry.active_version()
+        path = registry.version_path(version)
+        if read_manifest(path) is None:
+            raise CommandError(f'{version} has no artifact bundle; run convert_model_artifacts first.')
+
+        formats = [('pickle', _PICKLE), ('artifacts', _ARTIFACTS)]
+        results = {}
+        for name, body in formats:
+            runs = [self._run(body, path, version) for _ in range(options['repeat'])]
+            results[name] = {
+                key: statistics.median(run[key] for run in runs) for key in ('load', 'first_prediction')
+            }
+            self.stdout.write(
+                f"{name:>10}: load {results[name]['load'] * 1000:8.1f}ms, "
+                f"first prediction {results[name]['first_prediction'] * 1000:8.1f}ms "
+                f"(median of {options['repeat']})"
+            )
+
+        speedup = results['pickle']['first_prediction'] / max(results['artifacts']['first_prediction'], 1e-9)
+        self.stdout.write(self.style.SUCCESS(f"Artifacts reach the first prediction {speedup:.1f}x faster"))
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from NovaX_webpage.model_registry import registry
+from NovaX_webpage.prediction_table import build_prediction_table
+
+
+class Command(BaseCommand):
+    help = "Precompute career predictions for every Big Five profile (1-10) and store them next to the models."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model-version', default=None, help='Model version to build for (default: the active one)')
+        parser.add_argument('--top-k', type=int, default=10, help='Careers to keep per profile (default 10)')
+        parser.add_argument('--chunk-size', type=int, default=10000, help='Profiles scored per ensemble call')
+        parser.add_argument('--out-dir', default=None, help='Where to write the table (default: the model directory)')
+
+    def handle(self, *args, **options):
+        try:
+            bundle = registry.get(options['model_version'])
+        except Exception as e:
+            raise CommandError(f'Could not load model version {options["model_version"]}: {e}')
+        if not bundle:
+            raise CommandError('Prediction models are not loaded.')
+
+        out_dir = options['out_dir'] or bundle.path
+        started = time.perf_counter()
+        meta = build_prediction_table(
+            bundle.predict_proba,
+            bundle.schema,
+            out_dir,
+            signature=bundle.signature,
+            top_k=options['top_k'],
+            chunk_size=options['chunk_size'],
+        )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {meta['rows']} profiles x top {meta['top_k']} careers for {bundle.version} to {out_dir} in {elapsed:.1f}s"
+        ))
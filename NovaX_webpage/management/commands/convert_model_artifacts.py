@@ -0,0 +1,52 @@
+import os
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from NovaX_webpage.model_artifacts import MANIFEST_FILE, save_native_members, write_manifest
+from NovaX_webpage.model_registry import registry
+from NovaX_webpage.tree_export import FLAT_ENSEMBLE_DIR
+
+
+class Command(BaseCommand):
+    help = "Convert a pickled model version into checksummed, pickle-free artifacts (manifest + NumPy arrays + native boosters)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model-version', default=None, help='Model version to convert (default: the active one)')
+        parser.add_argument('--out-dir', default=None, help='Where to write the artifacts (default: the model directory)')
+        parser.add_argument('--check-rows', type=int, default=5000, help='Random profiles used to verify the export')
+        parser.add_argument('--tolerance', type=float, default=1e-6, help='Largest allowed probability difference')
+        parser.add_argument('--force', action='store_true', help='Replace artifacts that were already converted')
+
+    def handle(self, *args, **options):
+        try:
+            bundle = registry.get(options['model_version'])
+        except Exception as e:
+            raise CommandError(f'Could not load model version {options["model_version"]}: {e}')
+        if not bundle:
+            raise CommandError('Prediction models are not loaded.')
+
+        out_dir = options['out_dir'] or bundle.path
+        if os.path.exists(os.path.join(out_dir, MANIFEST_FILE)) and not options['force']:
+            raise CommandError(f'{out_dir} already has a {MANIFEST_FILE}; use --force to convert again')
+        os.makedirs(out_dir, exist_ok=True)
+        started = time.perf_counter()
+
+        # Flattened trees + scaler arrays + classes.npy, verified against predict_proba
+        call_command(
+            'export_flat_ensemble',
+            model_version=bundle.version,
+            out_dir=os.path.join(out_dir, FLAT_ENSEMBLE_DIR),
+            check_rows=options['check_rows'],
+            tolerance=options['tolerance'],
+            stdout=self.stdout,
+        )
+        members = save_native_members(bundle.models, out_dir)
+        manifest = write_manifest(out_dir, FLAT_ENSEMBLE_DIR, members, bundle.signature, bundle.classes)
+
+        native = sum(1 for m in members if m['native'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote artifacts for {bundle.version} to {out_dir}: {len(manifest['files'])} checksummed files, "
+            f"{native}/{len(members)} members also saved natively, in {time.perf_counter() - started:.1f}s"
+        ))
@@ -0,0 +1,115 @@
+import csv
+import json
+from datetime import timedelta
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from NovaX_webpage.drift import (
+    BIN_LABELS, count_min_estimate, histogram_baseline, merge_sketches, population_stability, training_baseline,
+)
+from NovaX_webpage.feature_schema import CAREER_FEATURES, career_feature_schema
+from NovaX_webpage.model_registry import registry
+from NovaX_webpage.models import InputSketch
+
+# Standardized mean shift / PSI at which a feature is flagged
+SHIFT_WARNING = 0.5
+PSI_WARNING = 0.25
+
+
+def _load_baseline(path):
+    """Histograms from a saved baseline (.json) or a training data file (.csv)"""
+    if path.endswith('.csv'):
+        with open(path, newline='') as f:
+            records = [{k: float(v) for k, v in row.items() if k in CAREER_FEATURES} for row in csv.DictReader(f)]
+        if not records:
+            raise CommandError(f"No rows in {path}")
+        hist = histogram_baseline(career_feature_schema().matrix(records))
+        return {feature: hist[i] for i, feature in enumerate(CAREER_FEATURES)}
+    with open(path) as f:
+        baseline = json.load(f)
+    return {feature: np.asarray(counts) for feature, counts in baseline['histograms'].items()}
+
+
+class Command(BaseCommand):
+    help = "Compare the distribution of live model inputs with the training-time baseline."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24, help='Window of recent sketches to report on')
+        parser.add_argument('--model-version', default=None, help='Model version whose traffic to report (default: the active one)')
+        parser.add_argument('--baseline', default=None,
+                            help='Histogram baseline: a file written by --save-baseline, or the training data as CSV')
+        parser.add_argument('--save-baseline', default=None, help='Write the window histograms to this file as a baseline')
+        parser.add_argument('--top', type=int, default=5, help='Most frequent input profiles to list')
+
+    def handle(self, *args, **options):
+        bundle = registry.get(options['model_version'])
+        if not bundle:
+            raise CommandError(f'Could not load model version {options["model_version"] or "(active)"}: {registry.last_error}')
+
+        since = timezone.now() - timedelta(hours=options['hours'])
+        sketches = InputSketch.objects.filter(model_version=bundle.version, bucket__gte=since)
+        rows, hist, moments, count_min, profiles = merge_sketches(sketches)
+        if not rows:
+            raise CommandError(f"No input sketches for {bundle.version} in the last {options['hours']}h")
+        self.stdout.write(f"{rows} inputs to {bundle.version} in the last {options['hours']}h")
+
+        if options['save_baseline']:
+            with open(options['save_baseline'], 'w') as f:
+                json.dump({
+                    'model_version': bundle.version,
+                    'rows': rows,
+                    'bins': BIN_LABELS,
+                    'histograms': {feature: hist[i].tolist() for i, feature in enumerate(CAREER_FEATURES)},
+                }, f, indent=2)
+            self.stdout.write(f"Baseline written to {options['save_baseline']}")
+
+        self._report_features(bundle, rows, hist, moments, options['baseline'])
+        self._report_profiles(rows, count_min, profiles, options['top'])
+
+    def _report_features(self, bundle, rows, hist, moments, baseline_path):
+        mean = moments[:, 0] / rows
+        std = np.sqrt(np.maximum(moments[:, 1] / rows - mean ** 2, 0))
+        training = training_baseline(bundle)
+        baseline = _load_baseline(baseline_path) if baseline_path else {}
+
+        self.stdout.write(f"\n{'feature':<22}{'mean':>7}{'std':>7}{'train':>8}{'shift':>8}{'PSI':>7}{'out of range':>14}")
+        for i, feature in enumerate(CAREER_FEATURES):
+            flags = []
+            if 'mean' in training:
+                train = f"{training['mean'][i]:.2f}"
+                shift = (mean[i] - training['mean'][i]) / training['std'][i] if training['std'][i] else 0.0
+                shift_text = f"{shift:+.2f}"
+                if abs(shift) >= SHIFT_WARNING:
+                    flags.append('mean shift')
+            elif 'min' in training:
+                train = f"{training['min'][i]:.0f}-{training['max'][i]:.0f}"
+                shift_text = '-'
+            else:
+                train = shift_text = '-'
+
+            psi_text = '-'
+            if feature in baseline:
+                psi = population_stability(baseline[feature], hist[i])
+                psi_text = f"{psi:.3f}"
+                if psi >= PSI_WARNING:
+                    flags.append('distribution shift')
+
+            out_of_range = (hist[i, 0] + hist[i, -1]) / rows
+            if out_of_range:
+                flags.append('out of range')
+            line = (f"{feature:<22}{mean[i]:>7.2f}{std[i]:>7.2f}{train:>8}{shift_text:>8}{psi_text:>7}"
+                    f"{out_of_range:>13.2%} {', '.join(flags)}")
+            self.stdout.write(self.style.WARNING(line) if flags else line)
+
+    def _report_profiles(self, rows, count_min, profiles, top):
+        if not top or not profiles:
+            return
+        # Re-estimate every worker's candidates against the merged count-min table
+        ranked = sorted(((count_min_estimate(count_min, key), values) for key, values in profiles.items()),
+                        key=lambda item: -item[0])[:top]
+        self.stdout.write("\nMost frequent input profiles (count-min estimate, may overcount):")
+        for estimate, values in ranked:
+            profile = ', '.join(f"{feature}={value:g}" for feature, value in values.items())
+            self.stdout.write(f"  {estimate:>7} ({estimate / rows:.1%})  {profile}")
@@ -0,0 +1,58 @@
+import os
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from NovaX_webpage.model_registry import registry
+from NovaX_webpage.tree_export import FLAT_ENSEMBLE_DIR, export_ensemble, max_abs_error
+
+
+class Command(BaseCommand):
+    help = "Flatten the tree ensemble (and scaler) into NumPy node arrays for the fast evaluator."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model-version', default=None, help='Model version to export (default: the active one)')
+        parser.add_argument('--out-dir', default=None, help='Where to write the arrays (default: <model dir>/flat_ensemble)')
+        parser.add_argument('--check-rows', type=int, default=5000, help='Random profiles used to verify the export')
+        parser.add_argument('--tolerance', type=float, default=1e-6, help='Largest allowed probability difference')
+
+    def handle(self, *args, **options):
+        try:
+            bundle = registry.get(options['model_version'])
+        except Exception as e:
+            raise CommandError(f'Could not load model version {options["model_version"]}: {e}')
+        if not bundle:
+            raise CommandError('Prediction models are not loaded.')
+
+        try:
+            flat = export_ensemble(
+                bundle.models,
+                bundle.scaler,
+                n_classes=bundle.n_classes,
+                n_features=bundle.schema.n_features,
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        # Compare against the live predict_proba on random 1-10 profiles (plus some fractions)
+        rng = np.random.default_rng(0)
+        check = rng.integers(1, 11, size=(options['check_rows'], flat.n_features)).astype(np.float64)
+        check[::4] += rng.random((len(check[::4]), flat.n_features))
+        error = max_abs_error(flat, bundle.models, bundle.scaler, check)
+        if error > options['tolerance']:
+            raise CommandError(f'Export differs from predict_proba by {error:.2e} (tolerance {options["tolerance"]:.0e})')
+
+        out_dir = options['out_dir'] or os.path.join(bundle.path, FLAT_ENSEMBLE_DIR)
+        flat.save(out_dir, classes=np.array(bundle.classes), model_signature=bundle.signature, max_abs_error=error)
+
+        single = check[:1]
+        started = time.perf_counter()
+        for _ in range(100):
+            flat.predict_proba(single)
+        per_row = (time.perf_counter() - started) / 100 * 1e6
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Exported {flat.n_trees} trees of {bundle.version} (depth {flat.depth}) to {out_dir}; "
+            f"max error {error:.2e}, single-row inference {per_row:.0f}us"
+        ))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from NovaX_webpage.model_registry import activate_version, publish_version, registry
+
+
+class Command(BaseCommand):
+    help = "Publish a model directory as a new version in the model store, or switch the active version."
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', nargs='?', help='Directory with ensemble_models_optuna.pkl, label_encoder.pkl, scaler.pkl')
+        parser.add_argument('--model-version', help='Version name (default: a timestamp)')
+        parser.add_argument('--no-activate', action='store_true', help='Publish without making it the active version')
+        parser.add_argument('--activate', metavar='VERSION', help='Only switch the active version')
+        parser.add_argument('--list', action='store_true', help='List published versions')
+
+    def handle(self, *args, **options):
+        if options['list']:
+            active = registry.active_version()
+            for version in registry.versions():
+                marker = '*' if version == active else ' '
+                self.stdout.write(f"{marker} {version}")
+            return
+
+        try:
+            if options['activate']:
+                activate_version(options['activate'])
+                self.stdout.write(self.style.SUCCESS(f"Activated model version {options['activate']}"))
+                return
+
+            if not options['source']:
+                raise CommandError('Give a source directory, --activate VERSION or --list.')
+
+            from django.utils import timezone
+            version = options['model_version'] or timezone.now().strftime('%Y%m%d-%H%M%S')
+            target = publish_version(options['source'], version, activate=not options['no_activate'])
+        except (FileExistsError, FileNotFoundError) as e:
+            raise CommandError(str(e))
+
+        state = 'published' if options['no_activate'] else 'published and activated'
+        self.stdout.write(self.style.SUCCESS(f"Model version {version} {state} at {target}"))
@@ -0,0 +1,173 @@
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+
+from NovaX_webpage.model_registry import registry
+
+# Models are imported inside the functions: pool workers import this module
+# before their initializer has run django.setup()
+
+
+def _attempts(quiz_type, first_id=None, last_id=None):
+    """Attempts that can be re-scored (they stored their feature scores), in id order"""
+    from NovaX_webpage.models import QuizAttempt
+
+    attempts = QuizAttempt.objects.filter(quiz_type=quiz_type).exclude(feature_scores={})
+    if first_id is not None:
+        attempts = attempts.filter(id__gte=first_id)
+    if last_id is not None:
+        attempts = attempts.filter(id__lte=last_id)
+    return attempts.order_by('id')
+
+
+def _rescore(attempts, bundle, top_k):
+    """Score one chunk with a single batched call and write it back"""
+    from NovaX_webpage.models import QuizAttempt
+    from NovaX_webpage.predictors import predict_careers_batch
+
+    if not attempts:
+        return 0
+    predictions = predict_careers_batch([a.feature_scores for a in attempts], top_k=top_k, bundle=bundle)
+    for attempt, result in zip(attempts, predictions):
+        attempt.predictions = result
+    with transaction.atomic():
+        QuizAttempt.objects.bulk_update(attempts, ['predictions'])
+    return len(attempts)
+
+
+def _init_worker():
+    import django
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'NovaX_project.settings')
+    django.setup()
+
+
+def _rescore_range(version, quiz_type, first_id, last_id, top_k):
+    """Pool worker: re-score the attempts with first_id <= id <= last_id"""
+    bundle = registry.get(version)
+    attempts = list(_attempts(quiz_type, first_id, last_id).only('id', 'feature_scores'))
+    return _rescore(attempts, bundle, top_k)
+
+
+class Command(BaseCommand):
+    help = "Re-score stored quiz attempts with the current (or a given) model version, in resumable chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model-version', default=None, help='Model version to score with (default: the active one)')
+        parser.add_argument('--quiz-type', default='AI_COUNSELING', help='Attempts of this quiz type (default AI_COUNSELING)')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Attempts read, scored and written per chunk')
+        parser.add_argument('--top-k', type=int, default=3, help='Careers stored per attempt (default 3)')
+        parser.add_argument('--workers', type=int, default=1, help='Processes scoring chunks in parallel')
+        parser.add_argument('--checkpoint', default='rescore_attempts.checkpoint.json',
+                            help='File recording the last attempt id done')
+        parser.add_argument('--restart', action='store_true', help='Ignore an existing checkpoint and start over')
+
+    def handle(self, *args, **options):
+        bundle = registry.get(options['model_version'])
+        if not bundle:
+            raise CommandError(f'Could not load model version {options["model_version"] or "(active)"}: {registry.last_error}')
+
+        checkpoint = options['checkpoint']
+        start_after = 0
+        if os.path.exists(checkpoint) and not options['restart']:
+            with open(checkpoint) as f:
+                state = json.load(f)
+            if state.get('model_version') == bundle.version and state.get('quiz_type') == options['quiz_type']:
+                start_after = state['last_id']
+                self.stdout.write(f"Resuming after attempt {start_after}")
+
+        self.total = 0
+        self.started = time.perf_counter()
+        args = (bundle, options, checkpoint)
+        if options['workers'] > 1:
+            self._run_parallel(start_after, *args)
+        else:
+            self._run_serial(start_after, *args)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Re-scored {self.total} attempts with {bundle.version} in {time.perf_counter() - self.started:.1f}s"
+        ))
+
+    def _save_checkpoint(self, checkpoint, bundle, options, last_id):
+        state = {'model_version': bundle.version, 'quiz_type': options['quiz_type'], 'last_id': last_id}
+        with open(checkpoint + '.tmp', 'w') as f:
+            json.dump(state, f)
+        os.replace(checkpoint + '.tmp', checkpoint)
+
+    def _progress(self, done, last_id):
+        self.total += done
+        rate = self.total / max(time.perf_counter() - self.started, 1e-9)
+        self.stdout.write(f"  {self.total} attempts (up to id {last_id}, {rate:.0f}/s)")
+
+    def _run_serial(self, start_after, bundle, options, checkpoint):
+        attempts = (
+            _attempts(options['quiz_type'], first_id=start_after + 1)
+            .only('id', 'feature_scores')
+            .iterator(chunk_size=options['chunk_size'])
+        )
+        chunk = []
+        for attempt in attempts:
+            chunk.append(attempt)
+            if len(chunk) >= options['chunk_size']:
+                self._serial_chunk(chunk, bundle, options, checkpoint)
+                chunk = []
+        self._serial_chunk(chunk, bundle, options, checkpoint)
+
+    def _serial_chunk(self, chunk, bundle, options, checkpoint):
+        if not chunk:
+            return
+        done = _rescore(chunk, bundle, options['top_k'])
+        self._save_checkpoint(checkpoint, bundle, options, chunk[-1].id)
+        self._progress(done, chunk[-1].id)
+
+    def _id_ranges(self, start_after, options):
+        """(first_id, last_id) of consecutive chunks, paged by id (no cursor held open)"""
+        attempts = _attempts(options['quiz_type'])
+        while True:
+            ids = list(attempts.filter(id__gt=start_after).values_list('id', flat=True)[:options['chunk_size']])
+            if not ids:
+                return
+            yield ids[0], ids[-1]
+            start_after = ids[-1]
+
+    def _run_parallel(self, start_after, bundle, options, checkpoint):
+        # Children open their own database connections
+        connections.close_all()
+        workers = options['workers']
+        pending = {}
+        finished = {}
+        ranges = []  # chunk ranges in id order, for a contiguous checkpoint
+
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+        ) as executor:
+            def drain(block):
+                done, _ = wait(pending, timeout=None if block else 0, return_when=FIRST_COMPLETED)
+                for future in done:
+                    span = pending.pop(future)
+                    finished[span] = future.result()
+                    self._progress(finished[span], span[1])
+                # Checkpoint only up to the first chunk that is not finished yet
+                while ranges and ranges[0] in finished:
+                    span = ranges.pop(0)
+                    finished.pop(span)
+                    self._save_checkpoint(checkpoint, bundle, options, span[1])
+
+            for first_id, last_id in self._id_ranges(start_after, options):
+                # Keep at most two chunks per worker in flight so memory stays bounded
+                while len(pending) >= workers * 2:
+                    drain(block=True)
+                future = executor.submit(
+                    _rescore_range, bundle.version, options['quiz_type'], first_id, last_id, options['top_k']
+                )
+                pending[future] = (first_id, last_id)
+                ranges.append((first_id, last_id))
+            while pending:
+                drain(block=True)
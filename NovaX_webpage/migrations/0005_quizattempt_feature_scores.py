@@ -0,0 +1,18 @@
+# Generated by Django 4.2.25 on 2026-10-18 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('NovaX_webpage', '0004_quizattempt_questionresponse'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quizattempt',
+            name='feature_scores',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.25 on 2026-10-18 11:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('NovaX_webpage', '0005_quizattempt_feature_scores'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShadowComparison',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField()),
+                ('primary_version', models.CharField(max_length=100)),
+                ('shadow_version', models.CharField(max_length=100)),
+                ('source', models.CharField(max_length=30)),
+                ('samples', models.PositiveIntegerField(default=0)),
+                ('top1_matches', models.PositiveIntegerField(default=0)),
+                ('rank_correlation_sum', models.FloatField(default=0)),
+                ('calls', models.PositiveIntegerField(default=0)),
+                ('primary_ms_sum', models.FloatField(default=0)),
+                ('shadow_ms_sum', models.FloatField(default=0)),
+                ('shadow_ms_max', models.FloatField(default=0)),
+            ],
+            options={
+                'ordering': ['-bucket'],
+                'unique_together': {('bucket', 'primary_version', 'shadow_version', 'source')},
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.25 on 2026-10-18 14:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('NovaX_webpage', '0006_shadowcomparison'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InputSketch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField()),
+                ('model_version', models.CharField(max_length=100)),
+                ('rows', models.PositiveIntegerField(default=0)),
+                ('histograms', models.JSONField(default=dict)),
+                ('moments', models.JSONField(default=dict)),
+                ('count_min', models.JSONField(default=list)),
+                ('profiles', models.JSONField(default=dict)),
+            ],
+            options={
+                'ordering': ['-bucket'],
+                'unique_together': {('bucket', 'model_version')},
+            },
+        ),
+    ]
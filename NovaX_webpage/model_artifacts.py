@@ -0,0 +1,105 @@
+"""
+Pickle-free model artifact bundle.
+
+``manage.py convert_model_artifacts`` writes, next to (or instead of) the
+``.pkl`` files of a model version::
+
+    manifest.json               format, classes, members, scaler, sha256 of every file
+    flat_ensemble/              node / leaf arrays, scaler arrays, classes.npy (see tree_export)
+    member_<i>.ubj              native xgboost boosters, where a member is one
+
+Serving only needs the manifest and the memory-mapped ``flat_ensemble``
+arrays, so a worker starts without unpickling (or importing) scikit-learn
+and xgboost, and nothing in the bundle can execute code on load. The native
+boosters are kept for tooling that needs the original xgboost models.
+"""
+import hashlib
+import json
+import os
+import time
+
+MANIFEST_FILE = 'manifest.json'
+ARTIFACT_FORMAT = 'career-artifacts/1'
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_manifest(path):
+    """The artifact manifest of a model directory, or None for pickle-only versions"""
+    manifest_path = os.path.join(path, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    if manifest.get('format') != ARTIFACT_FORMAT:
+        raise ValueError(f"Unsupported model artifact format {manifest.get('format')!r} in {path}")
+    return manifest
+
+
+def verify_artifacts(path, manifest):
+    """Raise ValueError if any file listed in the manifest is missing or altered"""
+    for name, expected in manifest['files'].items():
+        file_path = os.path.join(path, name)
+        if not os.path.isfile(file_path):
+            raise ValueError(f"Model artifact {name} is missing from {path}")
+        if file_sha256(file_path) != expected:
+            raise ValueError(f"Checksum mismatch for model artifact {name} in {path}")
+
+
+def write_manifest(path, flat_dir, members, signature, classes):
+    """Describe and checksum the artifacts written to ``path``"""
+    files = {}
+    for root, _, names in os.walk(os.path.join(path, flat_dir)):
+        for name in sorted(names):
+            rel = os.path.relpath(os.path.join(root, name), path)
+            files[rel] = file_sha256(os.path.join(path, rel))
+    for member in members:
+        if member.get('native'):
+            files[member['native']] = file_sha256(os.path.join(path, member['native']))
+
+    manifest = {
+        'format': ARTIFACT_FORMAT,
+        'created_at': time.time(),
+        'model_signature': signature,
+        'classes': [str(c) for c in classes],
+        'flat_ensemble': flat_dir,
+        'members': members,
+        'files': files,
+    }
+    tmp = os.path.join(path, MANIFEST_FILE + '.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, os.path.join(path, MANIFEST_FILE))
+    return manifest
+
+
+def save_native_members(models, path):
+    """Write xgboost members in their native format; describe every member"""
+    members = []
+    for i, model in enumerate(models):
+        member = {'index': i, 'type': f"{type(model).__module__}.{type(model).__name__}", 'native': None}
+        if hasattr(model, 'get_booster'):
+            member['native'] = f"member_{i}.ubj"
+            model.get_booster().save_model(os.path.join(path, member['native']))
+        members.append(member)
+    return members
+
+
+def load_native_boosters(path, manifest=None):
+    """xgboost Boosters saved by the converter (index -> Booster)"""
+    import xgboost
+
+    manifest = manifest or read_manifest(path)
+    boosters = {}
+    for member in manifest['members']:
+        if member.get('native'):
+            booster = xgboost.Booster()
+            booster.load_model(os.path.join(path, member['native']))
+            boosters[member['index']] = booster
+    return boosters
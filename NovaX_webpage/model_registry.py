@@ -0,0 +1,377 @@
+"""
+Versioned, hot-reloadable store for the career prediction models.
+
+Layout (``settings.CAREER_MODEL_STORE``, default ``NovaX_webpage/model_store``)::
+
+    model_store/
+        current.json            {"version": "2025-11-01"}   <- active version
+        2025-10-17/             ensemble_models_optuna.pkl, label_encoder.pkl, scaler.pkl, ...
+        2025-11-01/             manifest.json, flat_ensemble/, ...  <- pickle-free artifacts
+
+Without ``current.json`` the newest directory (by name) is active; with an
+empty or missing store the legacy ``ml_models2`` directory is served as
+version ``ml_models2``. Models load lazily on first use; when a flat export
+is present its arrays are memory-mapped and the pickles are not read at all
+(see ``gunicorn.conf.py`` for loading once in the master before forking). A newly published
+version is noticed by mtime, loaded in a background thread and swapped in
+atomically, so requests keep being served by the old version meanwhile.
+"""
+import json
+import logging
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+
+from . import inference_threads
+from .feature_schema import career_feature_schema
+from .model_artifacts import MANIFEST_FILE, read_manifest, verify_artifacts
+from .prediction_table import load_prediction_table, model_signature
+from .tree_export import FLAT_ENSEMBLE_DIR, load_flat_ensemble
+
+logger = logging.getLogger(__name__)
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+LEGACY_MODEL_DIR = os.path.join(APP_DIR, 'ml_models2')
+DEFAULT_STORE_DIR = os.path.join(APP_DIR, 'model_store')
+CURRENT_FILE = 'current.json'
+# Non-active versions kept loaded at once (e.g. the shadow candidate)
+MAX_OTHER_VERSIONS = 2
+
+
+class ModelBundle:
+    """One loaded model version and everything derived from it"""
+
+    def __init__(self, version, path, models=None, label_encoder=None, scaler=None, table=None, flat=None, signature=None):
+        self.version = version
+        self.path = path
+        self._models = models
+        self._label_encoder = label_encoder
+        self._scaler = scaler
+        self._unpickle_lock = threading.Lock()
+        self.table = table
+        self.flat = flat
+        self.signature = signature
+        self.loaded_at = time.time()
+
+        if flat is not None and flat.classes is not None and label_encoder is None:
+            # Class names come from the export, no unpickling needed (copied out of
+            # the mapping: it is small, and a re-export replaces the file)
+            self.classes = np.array(flat.classes)
+        else:
+            self.classes = np.asarray(self.label_encoder.classes_)
+        # Compile the feature schema once and make sure it matches the model input
+        self.schema = career_feature_schema()
+        if self._scaler is not None:
+            self.schema.validate(self._scaler)
+        elif flat is not None and flat.n_features != self.schema.n_features:
+            raise ValueError(
+                f"Feature schema has {self.schema.n_features} features but the flat ensemble expects {flat.n_features}"
+            )
+
+    # The pickled objects are only needed without a flat export (or for the
+    # offline commands), so they are read on first access
+    def _unpickle(self):
+        with self._unpickle_lock:
+            if self._models is not None:
+                return
+            with open(os.path.join(self.path, "label_encoder.pkl"), "rb") as f:
+                self._label_encoder = pickle.load(f)
+            with open(os.path.join(self.path, "scaler.pkl"), "rb") as f:
+                self._scaler = pickle.load(f)
+            with open(os.path.join(self.path, "ensemble_models_optuna.pkl"), "rb") as f:
+                self._models = pickle.load(f)
+        # Unpickling may have loaded xgboost's OpenMP runtime
+        inference_threads.reset()
+
+    @property
+    def models(self):
+        if self._models is None:
+            self._unpickle()
+        return self._models
+
+    @property
+    def label_encoder(self):
+        if self._models is None:
+            self._unpickle()
+        return self._label_encoder
+
+    @property
+    def scaler(self):
+        if self._models is None:
+            self._unpickle()
+        return self._scaler
+
+    @property
+    def n_classes(self):
+        return len(self.classes)
+
+    def predict_proba(self, input_array):
+        """Average ensemble probabilities for an N x 13 (unscaled) input matrix"""
+        if self.flat is not None:
+            # Exported trees with the scaler folded in (see `manage.py export_flat_ensemble`)
+            return self.flat.predict_proba(input_array)
+
+        models = self.models
+        inference_threads.ensure_limits()
+        scaled_input = self.scaler.transform(input_array)
+        # Ensemble prediction: one predict_proba call per model for the whole batch
+        return np.mean([model.predict_proba(scaled_input) for model in models], axis=0)
+
+    def describe(self):
+        return {
+            'version': self.version,
+            'path': self.path,
+            'loaded_at': self.loaded_at,
+            'n_classes': self.n_classes,
+            'prediction_table': self.table is not None,
+            'flat_ensemble': self.flat is not None,
+            'memory_mapped': self.flat is not None and not self.flat.feature.flags.owndata,
+            'pickles_loaded': self._models is not None,
+        }
+
+
+def is_model_dir(path):
+    """Pickled models or converted artifacts"""
+    return (
+        os.path.isfile(os.path.join(path, 'ensemble_models_optuna.pkl'))
+        or os.path.isfile(os.path.join(path, MANIFEST_FILE))
+    )
+
+
+def _optional(loader, *args):
+    """Load an optional derived artifact, logging instead of failing"""
+    try:
+        return loader(*args)
+    except Exception as e:
+        logger.warning(f"Optional model artifact not used ({loader.__name__}): {e}")
+        return None
+
+
+def load_bundle(path, version, mmap=None):
+    """Load one model directory into a ModelBundle"""
+    if mmap is None:
+        mmap = getattr(settings, 'CAREER_MODEL_MMAP', True)
+    # Converted artifacts (see `manage.py convert_model_artifacts`) carry the
+    # signature of the pickles they came from, so those are not read at all
+    manifest = read_manifest(path) if getattr(settings, 'CAREER_MODEL_ARTIFACTS', True) else None
+    if manifest is not None:
+        if getattr(settings, 'CAREER_MODEL_VERIFY_CHECKSUMS', True):
+            verify_artifacts(path, manifest)
+        signature = manifest['model_signature']
+    else:
+        signature = model_signature(path)
+
+    # Optional flattened tree evaluator (see `manage.py export_flat_ensemble`).
+    # Memory-mapped, so forked gunicorn workers share one page-cache copy.
+    flat = _optional(
+        load_flat_ensemble, os.path.join(path, FLAT_ENSEMBLE_DIR), signature, 'r' if mmap else None
+    )
+    if manifest is not None and (flat is None or flat.classes is None):
+        raise ValueError(f"Model artifacts in {path} have no usable flat ensemble")
+    bundle = ModelBundle(version, path, flat=flat, signature=signature)
+    if flat is None:
+        bundle.models  # no usable export: unpickle now rather than on the first request
+
+    # Optional precomputed predictions (see `manage.py build_prediction_table`)
+    bundle.table = _optional(load_prediction_table, path, bundle.schema, bundle.signature)
+    return bundle
+
+
+class ModelRegistry:
+    """Serves the active model version and hot-swaps it when a new one is published"""
+
+    def __init__(self, store_dir=None, check_interval=None):
+        self.store_dir = store_dir or str(getattr(settings, 'CAREER_MODEL_STORE', DEFAULT_STORE_DIR))
+        self.check_interval = (
+            check_interval if check_interval is not None
+            else getattr(settings, 'CAREER_MODEL_CHECK_INTERVAL', 30)
+        )
+        self._bundle = None
+        self._stamp = None
+        self._others = OrderedDict()  # version -> (stamp, bundle), least recently used first
+        self._others_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._cold_lock = threading.Lock()
+        self._loading = False
+        self._next_check = 0.0
+        self._listeners = []
+        self.last_error = None
+
+    # ----- resolving versions -----
+
+    def version_path(self, version):
+        if version == os.path.basename(LEGACY_MODEL_DIR):
+            return LEGACY_MODEL_DIR
+        return os.path.join(self.store_dir, version)
+
+    def versions(self):
+        """Published version names, oldest first"""
+        if not os.path.isdir(self.store_dir):
+            return []
+        return sorted(
+            name for name in os.listdir(self.store_dir)
+            if is_model_dir(os.path.join(self.store_dir, name))
+        )
+
+    def active_version(self):
+        current = os.path.join(self.store_dir, CURRENT_FILE)
+        if os.path.exists(current):
+            with open(current) as f:
+                return json.load(f)['version']
+        versions = self.versions()
+        return versions[-1] if versions else os.path.basename(LEGACY_MODEL_DIR)
+
+    def _stamp_for(self, version):
+        """Changes whenever a version or its files are republished"""
+        path = self.version_path(version)
+        stamps = [version]
+        for name in (MANIFEST_FILE, 'ensemble_models_optuna.pkl'):
+            try:
+                stamps.append(os.stat(os.path.join(path, name)).st_mtime_ns)
+            except OSError:
+                stamps.append(None)
+        return tuple(stamps)
+
+    # ----- loading / swapping -----
+
+    def on_swap(self, callback):
+        """Register ``callback(old_bundle, new_bundle)`` to run after every swap"""
+        self._listeners.append(callback)
+        return callback
+
+    def _load(self, version, stamp):
+        try:
+            bundle = load_bundle(self.version_path(version), version)
+        except Exception as e:
+            self.last_error = f"{version}: {e}"
+            logger.error(f"❌ Error loading model version {version}: {e}")
+            return None
+
+        with self._lock:
+            old, self._bundle, self._stamp = self._bundle, bundle, stamp
+            self.last_error = None
+        logger.info(f"✅ Career prediction models {version} loaded from {bundle.path}")
+        for callback in self._listeners:
+            try:
+                callback(old, bundle)
+            except Exception as e:
+                logger.error(f"Model swap listener failed: {e}")
+        return bundle
+
+    def _load_in_background(self, version, stamp):
+        def run():
+            try:
+                self._load(version, stamp)
+            finally:
+                self._loading = False
+        threading.Thread(target=run, name=f"model-load-{version}", daemon=True).start()
+
+    def _check(self):
+        """Notice a newly published version (at most every check_interval seconds)"""
+        try:
+            version = self.active_version()
+            stamp = self._stamp_for(version)
+        except Exception as e:
+            logger.error(f"Could not resolve the active model version: {e}")
+            return
+        if stamp == self._stamp:
+            return
+
+        if self._bundle is None:
+            # Nothing to serve yet: load in this thread. Concurrent callers wait
+            # here for that load instead of returning None
+            with self._cold_lock:
+                if self._bundle is None and stamp != self._stamp:
+                    self._load(version, stamp)
+                    if self._bundle is None:
+                        # Remember the failure so every request does not retry the load
+                        self._stamp = stamp
+            return
+
+        with self._lock:
+            if self._loading:
+                return
+            self._loading = True
+        self._load_in_background(version, stamp)
+
+    def get(self, version=None):
+        """Return the active ModelBundle (or a specific version), or None if none can be loaded"""
+        if version is not None and version != getattr(self._bundle, 'version', None):
+            return self._get_other(version)
+
+        now = time.monotonic()
+        if self._bundle is None or now >= self._next_check:
+            self._next_check = now + self.check_interval
+            self._check()
+        return self._bundle
+
+    def _get_other(self, version):
+        """A non-active version, loaded again when it has been republished"""
+        stamp = self._stamp_for(version)
+        with self._others_lock:
+            cached = self._others.get(version)
+            if cached is not None and cached[0] == stamp:
+                self._others.move_to_end(version)
+                return cached[1]
+            bundle = load_bundle(self.version_path(version), version)
+            self._others[version] = (stamp, bundle)
+            self._others.move_to_end(version)
+            while len(self._others) > MAX_OTHER_VERSIONS:
+                self._others.popitem(last=False)
+            return bundle
+
+    def reload(self):
+        """Force a check for a new version on the next get()"""
+        self._next_check = 0.0
+        self._stamp = None
+
+    def preload(self):
+        """Load the active version now (e.g. in the gunicorn master before forking)"""
+        return self.get()
+
+    def status(self):
+        bundle = self._bundle
+        return {
+            'store': self.store_dir,
+            'active': bundle.describe() if bundle else None,
+            'published': self.versions(),
+            'loading': self._loading,
+            'last_error': self.last_error,
+        }
+
+
+def publish_version(source_dir, version, store_dir=None, activate=True):
+    """Copy a model directory into the store and optionally make it active"""
+    import shutil
+
+    store_dir = store_dir or registry.store_dir
+    target = os.path.join(store_dir, version)
+    if os.path.exists(target):
+        raise FileExistsError(f"Model version {version} already exists in {store_dir}")
+
+    staging = target + '.tmp'
+    shutil.copytree(source_dir, staging)
+    os.replace(staging, target)
+    if activate:
+        activate_version(version, store_dir)
+    return target
+
+
+def activate_version(version, store_dir=None):
+    """Point current.json at ``version`` (atomic rename, picked up by every worker)"""
+    store_dir = store_dir or registry.store_dir
+    if not is_model_dir(os.path.join(store_dir, version)):
+        raise FileNotFoundError(f"Model version {version} is not published in {store_dir}")
+    current = os.path.join(store_dir, CURRENT_FILE)
+    with open(current + '.tmp', 'w') as f:
+        json.dump({'version': version, 'activated_at': time.time()}, f)
+    os.replace(current + '.tmp', current)
+
+
+# Global instance
+registry = ModelRegistry()
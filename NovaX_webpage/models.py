@@ -26,6 +26,9 @@ class QuizAttempt(models.Model):
     
     # Store predictions/results
     predictions = models.JSONField(default=list, blank=True)
+
+    # Counseling scores the predictions were made from (field -> 1-10 score)
+    feature_scores = models.JSONField(default=dict, blank=True)
     
     # Overall score if applicable
     score = models.FloatField(null=True, blank=True)
@@ -45,6 +48,55 @@ class QuestionResponse(models.Model):
     
     class Meta:
         ordering = ['order']
+
+
+class ShadowComparison(models.Model):
+    """Hourly agreement between the served model version and a shadow candidate"""
+    bucket = models.DateTimeField()  # start of the hour
+    primary_version = models.CharField(max_length=100)
+    shadow_version = models.CharField(max_length=100)
+    source = models.CharField(max_length=30)  # e.g. 'predict_career', 'counseling'
+
+    samples = models.PositiveIntegerField(default=0)  # profiles compared
+    top1_matches = models.PositiveIntegerField(default=0)
+    rank_correlation_sum = models.FloatField(default=0)  # Spearman over all careers
+    calls = models.PositiveIntegerField(default=0)  # sampled prediction calls
+    primary_ms_sum = models.FloatField(default=0)
+    shadow_ms_sum = models.FloatField(default=0)
+    shadow_ms_max = models.FloatField(default=0)
+
+    class Meta:
+        ordering = ['-bucket']
+        unique_together = ['bucket', 'primary_version', 'shadow_version', 'source']
+
+    def __str__(self):
+        return f"{self.primary_version} vs {self.shadow_version} ({self.source}) - {self.bucket.strftime('%Y-%m-%d %H:00')}"
+
+    @property
+    def top1_agreement(self):
+        return self.top1_matches / self.samples if self.samples else None
+
+    @property
+    def mean_rank_correlation(self):
+        return self.rank_correlation_sum / self.samples if self.samples else None
+
+
+class InputSketch(models.Model):
+    """Hourly distribution sketches of the model inputs seen in production (see drift.py)"""
+    bucket = models.DateTimeField()  # start of the hour
+    model_version = models.CharField(max_length=100)
+    rows = models.PositiveIntegerField(default=0)
+    histograms = models.JSONField(default=dict)  # feature -> fixed-bin counts
+    moments = models.JSONField(default=dict)  # feature -> [sum, sum of squares]
+    count_min = models.JSONField(default=list)  # depth x width counts of whole input rows
+    profiles = models.JSONField(default=dict)  # row key -> inputs, heavy-hitter candidates
+
+    class Meta:
+        ordering = ['-bucket']
+        unique_together = ['bucket', 'model_version']
+
+    def __str__(self):
+        return f"{self.model_version} inputs - {self.bucket.strftime('%Y-%m-%d %H:00')} ({self.rows} rows)"
 # ===== CAREER MODELS =====
 class Category(models.Model):
     name_en = models.CharField(max_length=200)
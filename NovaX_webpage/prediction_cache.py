@@ -0,0 +1,161 @@
+"""
+LRU cache of ensemble probabilities keyed by the quantized input row.
+
+Counseling answers are small integers, so many students produce exactly the
+same model input. The cache stores the full probability vector of a row
+(any ``top_k`` can be served from it) under the model version and content
+signature, and is cleared whenever the registry swaps models. With
+``CAREER_PREDICTION_CACHE_SHARED`` enabled, misses also consult the Django
+cache so workers can share results.
+"""
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+
+from .model_registry import registry
+
+logger = logging.getLogger(__name__)
+
+SHARED_KEY_PREFIX = "career"
+
+
+class PredictionCache:
+    """Bounded, thread-safe LRU of per-row probability vectors"""
+
+    def __init__(self, maxsize=4096, decimals=2, shared=False, shared_timeout=3600, cache_alias='default', name='pred'):
+        self.name = name
+        self.maxsize = maxsize
+        self.decimals = decimals
+        self.shared = shared
+        self.shared_timeout = shared_timeout
+        self.cache_alias = cache_alias
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.shared_hits = 0
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            maxsize=getattr(settings, 'CAREER_PREDICTION_CACHE_SIZE', 4096),
+            decimals=getattr(settings, 'CAREER_PREDICTION_CACHE_DECIMALS', 2),
+            shared=getattr(settings, 'CAREER_PREDICTION_CACHE_SHARED', False),
+            shared_timeout=getattr(settings, 'CAREER_PREDICTION_CACHE_TIMEOUT', 3600),
+        )
+
+    @property
+    def enabled(self):
+        return self.maxsize > 0
+
+    def keys(self, bundle, input_array):
+        """One key per row: model version + signature + quantized features"""
+        namespace = f"{bundle.version}:{(bundle.signature or '')[:16]}"
+        quantized = np.round(np.asarray(input_array, dtype=np.float64), self.decimals) + 0.0  # -0.0 -> 0.0
+        return [(namespace, row.tobytes()) for row in quantized]
+
+    def get_many(self, keys):
+        """Cached probability vectors for ``keys`` (None where missing)"""
+        found = [None] * len(keys)
+        with self._lock:
+            for i, key in enumerate(keys):
+                probas = self._entries.get(key)
+                if probas is not None:
+                    self._entries.move_to_end(key)
+                    found[i] = probas
+            n_hits = sum(p is not None for p in found)
+            self.hits += n_hits
+
+        missing = [i for i, p in enumerate(found) if p is None]
+        if missing and self.shared:
+            shared = self._shared_get([keys[i] for i in missing])
+            for i, probas in zip(missing, shared):
+                if probas is not None:
+                    found[i] = probas
+            local = [(keys[i], found[i]) for i in missing if found[i] is not None]
+            if local:
+                self.shared_hits += len(local)
+                self._put_local(local)
+
+        self.misses += sum(p is None for p in found)
+        return found
+
+    def set_many(self, keys, probas):
+        """Store one probability array per key"""
+        items = [(key, np.array(row, dtype=np.float64)) for key, row in zip(keys, probas)]
+        self._put_local(items)
+        if self.shared:
+            self._shared_set(items)
+
+    def _put_local(self, items):
+        with self._lock:
+            for key, probas in items:
+                probas.setflags(write=False)
+                self._entries[key] = probas
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    # ----- optional cross-worker tier -----
+
+    def _shared_key(self, key):
+        namespace, row = key
+        return f"{SHARED_KEY_PREFIX}_{self.name}:{namespace}:{hashlib.sha1(row).hexdigest()}"
+
+    def _shared_get(self, keys):
+        from django.core.cache import caches
+
+        try:
+            names = [self._shared_key(key) for key in keys]
+            values = caches[self.cache_alias].get_many(names)
+        except Exception as e:
+            logger.warning(f"Shared prediction cache unavailable: {e}")
+            return [None] * len(keys)
+        return [np.asarray(values[name]) if name in values else None for name in names]
+
+    def _shared_set(self, items):
+        from django.core.cache import caches
+
+        try:
+            caches[self.cache_alias].set_many(
+                {self._shared_key(key): probas for key, probas in items},
+                timeout=self.shared_timeout,
+            )
+        except Exception as e:
+            logger.warning(f"Shared prediction cache unavailable: {e}")
+
+    # ----- maintenance -----
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.shared_hits + self.misses
+        return {
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'shared_hits': self.shared_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round((self.hits + self.shared_hits) / lookups, 4) if lookups else None,
+            'shared': self.shared,
+        }
+
+
+# Global instance
+prediction_cache = PredictionCache.from_settings()
+
+
+@registry.on_swap
+def _clear_on_swap(old, new):
+    # Keys carry the version, but a republished version can reuse its name
+    prediction_cache.clear()
+    logger.info(f"Prediction cache cleared after switching to models {new.version}")
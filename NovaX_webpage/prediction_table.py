@@ -0,0 +1,153 @@
+"""
+Precomputed career predictions over the Big Five personality grid.
+
+With every aptitude / preference input left at its default, the model
+input is fully determined by five integer traits in 1-10, i.e. 10^5
+profiles. ``build_prediction_table`` scores that whole grid once offline
+and stores the top-k classes per profile as ``.npy`` arrays; at request
+time a matching profile is answered with an index computation and a
+memory-mapped read instead of a model call.
+"""
+import hashlib
+import itertools
+import json
+import logging
+import os
+
+import numpy as np
+
+from .tree_export import _replace_file
+
+logger = logging.getLogger(__name__)
+
+# Traits covered by the table, in counseling question order
+TABLE_FEATURES = ("C_score", "O_score", "E_score", "A_score", "N_score")
+GRID_MIN = 1
+GRID_MAX = 10
+
+TABLE_META_FILE = "career_table.json"
+TABLE_INDICES_FILE = "career_table_indices.npy"
+TABLE_PROBAS_FILE = "career_table_probas.npy"
+
+MODEL_FILES = ("ensemble_models_optuna.pkl", "label_encoder.pkl", "scaler.pkl")
+
+
+def model_signature(model_dir, filenames=MODEL_FILES):
+    """Content hash of the model files a table was built from"""
+    digest = hashlib.sha256()
+    for name in filenames:
+        with open(os.path.join(model_dir, name), "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def top_k_classes(probas, k):
+    """Indices and probabilities of the k best classes of every row, best first.
+
+    ``argpartition`` selects the k candidates in linear time and only those
+    are sorted, for all rows at once.
+    """
+    n_classes = probas.shape[1]
+    if k < n_classes:
+        candidates = np.argpartition(-probas, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.broadcast_to(np.arange(n_classes), probas.shape)
+    values = np.take_along_axis(probas, candidates, axis=1)
+    order = np.argsort(-values, axis=1, kind="stable")
+    return np.take_along_axis(candidates, order, axis=1), np.take_along_axis(values, order, axis=1)
+
+
+def grid_matrix(schema, features=TABLE_FEATURES, low=GRID_MIN, high=GRID_MAX):
+    """All integer profiles of the grid as model input rows, in table order"""
+    columns = [schema.index[feat] for feat in features]
+    values = np.arange(low, high + 1, dtype=schema.dtype)
+    # First trait varies fastest so row number == sum((v - low) * stride)
+    grid = np.array(list(itertools.product(values, repeat=len(columns))), dtype=schema.dtype)[:, ::-1]
+    matrix = np.full((len(grid), schema.n_features), schema.default, dtype=schema.dtype)
+    matrix[:, columns] = grid
+    return matrix
+
+
+def build_prediction_table(predict_probas, schema, out_dir, signature, top_k=10, chunk_size=10000):
+    """Score the whole grid with ``predict_probas`` and write the table files"""
+    matrix = grid_matrix(schema)
+    n_rows = len(matrix)
+    indices = None
+    probas = None
+
+    for start in range(0, n_rows, chunk_size):
+        chunk = predict_probas(matrix[start:start + chunk_size])
+        k = min(top_k, chunk.shape[1])
+        if indices is None:
+            indices = np.empty((n_rows, k), dtype=np.uint16)
+            probas = np.empty((n_rows, k), dtype=np.float32)
+        top, top_probas = top_k_classes(chunk, k)
+        indices[start:start + len(chunk)] = top
+        probas[start:start + len(chunk)] = top_probas
+
+    os.makedirs(out_dir, exist_ok=True)
+    # Running workers may have the old arrays mapped; the meta goes last so
+    # new meta is never read with old arrays
+    _replace_file(os.path.join(out_dir, TABLE_INDICES_FILE), lambda f: np.save(f, indices))
+    _replace_file(os.path.join(out_dir, TABLE_PROBAS_FILE), lambda f: np.save(f, probas))
+    meta = {
+        "features": list(TABLE_FEATURES),
+        "grid": [GRID_MIN, GRID_MAX],
+        "default": schema.default,
+        "schema": list(schema.features),
+        "top_k": int(indices.shape[1]),
+        "rows": n_rows,
+        "model_signature": signature,
+    }
+    _replace_file(os.path.join(out_dir, TABLE_META_FILE), lambda f: f.write(json.dumps(meta, indent=2).encode()))
+    return meta
+
+
+class PredictionTable:
+    """Memory-mapped lookup of precomputed top-k predictions"""
+
+    def __init__(self, indices, probas, meta, schema):
+        self.indices = indices
+        self.probas = probas
+        self.meta = meta
+        self.top_k = int(meta["top_k"])
+        self.low, self.high = meta["grid"]
+        self.default = float(meta["default"])
+
+        self.columns = np.array([schema.index[feat] for feat in meta["features"]])
+        self.other_columns = np.setdiff1d(np.arange(schema.n_features), self.columns)
+        base = self.high - self.low + 1
+        self.strides = base ** np.arange(len(self.columns), dtype=np.int64)
+
+    def lookup(self, input_array):
+        """Return (hit mask, table rows) for the rows of ``input_array`` the table covers"""
+        grid = input_array[:, self.columns]
+        hits = (
+            (grid == np.round(grid)).all(axis=1)
+            & (grid >= self.low).all(axis=1)
+            & (grid <= self.high).all(axis=1)
+            & (input_array[:, self.other_columns] == self.default).all(axis=1)
+        )
+        rows = ((grid[hits] - self.low).astype(np.int64) * self.strides).sum(axis=1)
+        return hits, rows
+
+
+def load_prediction_table(table_dir, schema, signature=None):
+    """Open a table built for the current models, or return None"""
+    meta_path = os.path.join(table_dir, TABLE_META_FILE)
+    if not os.path.exists(meta_path):
+        return None
+
+    with open(meta_path) as f:
+        meta = json.load(f)
+    if tuple(meta.get("schema", ())) != schema.features or meta.get("default") != schema.default:
+        logger.warning("Prediction table schema does not match the model schema; ignoring it.")
+        return None
+    if signature is not None and meta.get("model_signature") != signature:
+        logger.warning("Prediction table was built for different model files; ignoring it.")
+        return None
+
+    indices = np.load(os.path.join(table_dir, TABLE_INDICES_FILE), mmap_mode="r")
+    probas = np.load(os.path.join(table_dir, TABLE_PROBAS_FILE), mmap_mode="r")
+    return PredictionTable(indices, probas, meta, schema)
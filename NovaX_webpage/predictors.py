@@ -0,0 +1,317 @@
+"""
+Career predictors, one per quiz type.
+
+Each quiz type in ``QuizAttempt.QUIZ_TYPES`` that produces career matches is
+served by a ``Predictor`` registered at the bottom of this module. Views and
+commands look one up with ``get_predictor(quiz_type)`` instead of loading
+and scoring models themselves. A predictor loads its artifacts lazily on
+first use, scores a whole batch of answer dicts in one vectorized pass,
+caches per-row results and returns ranked ``{rank, career, probability}``
+lists.
+
+Adding a quiz type means a ``Predictor`` subclass with a ``_load`` that
+returns its model (``version``, ``signature``, ``classes``, ``schema`` and
+``predict_proba``), plus one ``register_predictor`` line below.
+"""
+import abc
+import json
+import logging
+import math
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+
+from .drift import drift_sketch
+from .feature_schema import FeatureSchema
+from .inference_pool import inference_pool
+from .model_artifacts import file_sha256
+from .model_registry import registry
+from .prediction_cache import PredictionCache, prediction_cache
+from .prediction_table import top_k_classes
+from .shadow import shadow_evaluator
+
+logger = logging.getLogger(__name__)
+
+QUIZ_MODEL_DIR = settings.BASE_DIR / 'NovaX_webpage' / 'quiz_models'
+WEIGHTED_SCORES_FORMAT = 'weighted-scores/1'
+
+
+def parse_top_k(value, n_classes):
+    """Number of careers to return: a positive int, or None / 'all' for every career"""
+    if value is None or value == 'all':
+        return n_classes
+    if isinstance(value, bool) or not math.isfinite(float(value)) or int(value) != float(value) or int(value) < 1:
+        raise ValueError(f"top_k must be a positive integer or 'all', got {value!r}")
+    return min(int(value), n_classes)
+
+
+def parse_min_probability(value):
+    """Probability cutoff in percent (same unit as the returned probabilities)"""
+    if value is None:
+        return None
+    value = float(value)
+    if not 0 <= value <= 100:
+        raise ValueError(f"min_probability must be between 0 and 100, got {value}")
+    return value
+
+
+def ranked_results(classes, top_indices, top_probas, min_probability=None, percentages=None):
+    """Per-row ``[{rank, career, probability}]`` lists from top-k class indices / probabilities"""
+    top_careers = classes[top_indices]
+    if percentages is None:
+        percentages = np.round(top_probas * 100, 2)
+    keep = np.ones(top_probas.shape, dtype=bool) if min_probability is None else percentages >= min_probability
+
+    results = []
+    for row in range(len(top_indices)):
+        results.append([
+            {
+                'rank': int(rank) + 1,
+                'career': top_careers[row, rank],
+                'probability': float(percentages[row, rank])
+            }
+            for rank in np.flatnonzero(keep[row])
+        ])
+    return results
+
+
+def predict_careers_batch(records, top_k=3, min_probability=None, bundle=None, source=None):
+    """Score many students at once and return the ranked careers for each.
+
+    ``records`` is a list of feature dicts (same keys as ``predict_career``).
+    The scaler and every ensemble member run once over the whole N x 13
+    matrix instead of once per student. Rows covered by the precomputed
+    prediction table are answered from it without touching the models, and
+    repeated profiles come from the prediction cache.
+    ``top_k`` careers are returned per student (None or 'all' for the full
+    ranked distribution), dropping those below ``min_probability`` percent.
+    ``bundle`` pins the model version (default: the registry's active one).
+    ``source`` marks live traffic (e.g. 'predict_career'): its inputs are
+    added to the drift sketches (``drift.py``) and a sample of the rows is
+    also scored by the shadow candidate model (``shadow.py``).
+    """
+    started = time.perf_counter()
+    bundle = bundle or registry.get()
+    if not bundle:
+        raise RuntimeError('Prediction models are not loaded.')
+    top_k = parse_top_k(top_k, bundle.n_classes)
+    min_probability = parse_min_probability(min_probability)
+    if not records:
+        return []
+
+    # Build the N x 13 input matrix
+    input_array = bundle.schema.matrix(records)
+    top_indices = np.empty((len(records), top_k), dtype=np.intp)
+    top_probas = np.empty((len(records), top_k), dtype=np.float64)
+
+    live = np.ones(len(records), dtype=bool)
+    avg_probas = None
+    table = bundle.table
+    if table is not None and top_k <= table.top_k:
+        hits, rows = table.lookup(input_array)
+        top_indices[hits] = table.indices[rows, :top_k]
+        top_probas[hits] = table.probas[rows, :top_k]
+        live = ~hits
+
+    if live.any():
+        live_rows = input_array[live]
+        if prediction_cache.enabled:
+            # Repeated answer profiles are served from the LRU cache
+            keys = prediction_cache.keys(bundle, live_rows)
+            cached = prediction_cache.get_many(keys)
+            missing = [i for i, probas in enumerate(cached) if probas is None]
+            if missing:
+                fresh = inference_pool.predict_proba(bundle, live_rows[missing])
+                prediction_cache.set_many([keys[i] for i in missing], fresh)
+                for i, probas in zip(missing, fresh):
+                    cached[i] = probas
+            avg_probas = np.vstack(cached)
+        else:
+            avg_probas = inference_pool.predict_proba(bundle, live_rows)
+        # Top-k of every row in one vectorized argpartition
+        top_indices[live], top_probas[live] = top_k_classes(avg_probas, top_k)
+
+    results = ranked_results(bundle.classes, top_indices, top_probas, min_probability)
+
+    if source:
+        shadow_evaluator.maybe_submit(
+            bundle, input_array, (time.perf_counter() - started) * 1000, source, primary_probas=avg_probas, scored=live
+        )
+        drift_sketch.observe(bundle, input_array)
+    return results
+
+
+class Predictor(abc.ABC):
+    """Scores answer dicts of one quiz type into ranked careers"""
+
+    def __init__(self, quiz_type, cache_size=None):
+        self.quiz_type = quiz_type
+        self.cache = PredictionCache(
+            maxsize=cache_size if cache_size is not None else getattr(settings, 'CAREER_PREDICTION_CACHE_SIZE', 4096),
+            name=quiz_type.lower(),
+        )
+        self._model = None
+        self._lock = threading.Lock()
+        self.last_error = None
+
+    @abc.abstractmethod
+    def _load(self):
+        """Load this predictor's artifacts (called once, on first use)"""
+
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    try:
+                        self._model = self._load()
+                        logger.info(f"✅ {self.quiz_type} predictor {self._model.version} loaded")
+                    except Exception as e:
+                        self.last_error = str(e)
+                        logger.error(f"❌ Error loading the {self.quiz_type} predictor: {e}")
+                        return None
+        return self._model
+
+    def predict_batch(self, records, top_k=3, min_probability=None, **options):
+        """Ranked careers for every answer dict in ``records`` (one vectorized pass)"""
+        model = self.model()
+        if model is None:
+            raise RuntimeError(f'{self.quiz_type} prediction model is not loaded.')
+        top_k = parse_top_k(top_k, len(model.classes))
+        min_probability = parse_min_probability(min_probability)
+        if not records:
+            return []
+
+        input_array = model.schema.matrix(records)
+        keys = self.cache.keys(model, input_array)
+        probas = self.cache.get_many(keys) if self.cache.enabled else [None] * len(keys)
+        missing = [i for i, row in enumerate(probas) if row is None]
+        if missing:
+            fresh = model.predict_proba(input_array[missing])
+            if self.cache.enabled:
+                self.cache.set_many([keys[i] for i in missing], fresh)
+            for i, row in zip(missing, fresh):
+                probas[i] = row
+        probas = np.vstack(probas)
+        top_indices, top_probas = top_k_classes(probas, top_k)
+        percentages = self._percentages(probas, top_indices, top_probas)
+        return ranked_results(model.classes, top_indices, top_probas, min_probability, percentages)
+
+    def _percentages(self, probas, top_indices, top_probas):
+        """The probabilities returned for the top-k classes, in percent"""
+        return np.round(top_probas * 100, 2)
+
+    def describe(self):
+        model = self._model
+        return {
+            'quiz_type': self.quiz_type,
+            'loaded': model is not None,
+            'version': model.version if model is not None else None,
+            'last_error': self.last_error,
+            'cache': self.cache.stats(),
+        }
+
+
+class CareerEnsemblePredictor(Predictor):
+    """The 13-feature career ensemble, served through the model registry"""
+
+    def __init__(self, quiz_type):
+        # Versions, table and cache come from the registry (see predict_careers_batch)
+        super().__init__(quiz_type, cache_size=0)
+
+    def _load(self):
+        return registry.get()
+
+    def model(self):
+        # The registry loads, caches and hot-swaps the ensemble itself
+        return registry.get()
+
+    def predict_batch(self, records, top_k=3, min_probability=None, bundle=None, source=None):
+        return predict_careers_batch(records, top_k=top_k, min_probability=min_probability, bundle=bundle, source=source)
+
+    def describe(self):
+        active = registry.status()['active']
+        return {
+            'quiz_type': self.quiz_type,
+            'loaded': active is not None,
+            'version': active['version'] if active else None,
+            'last_error': registry.last_error,
+            'cache': prediction_cache.stats(),
+        }
+
+
+class WeightedScoreModel:
+    """Career match from a fixed weight per (career, answer); probabilities are normalized scores"""
+
+    def __init__(self, path):
+        with open(path) as f:
+            spec = json.load(f)
+        if spec.get('format') != WEIGHTED_SCORES_FORMAT:
+            raise ValueError(f"Unsupported weighted score format {spec.get('format')!r} in {path}")
+        self.version = spec['version']
+        self.signature = file_sha256(path)
+        self.low, self.high = spec['scale']
+        features = spec['features']
+        # Unanswered questions count as the middle of the scale
+        self.schema = FeatureSchema(features, default=(self.low + self.high) / 2)
+        self.classes = np.array(list(spec['careers']), dtype=object)
+        self.weights = np.array(
+            [[weights.get(feature, 0.0) for feature in features] for weights in spec['careers'].values()]
+        )
+
+    def predict_proba(self, input_array):
+        scores = ((input_array - self.low) / (self.high - self.low)) @ self.weights.T
+        totals = scores.sum(axis=1, keepdims=True)
+        uniform = np.full_like(scores, 1 / scores.shape[1])
+        return np.divide(scores, totals, out=uniform, where=totals > 0)
+
+
+class WeightedScorePredictor(Predictor):
+    """Quizzes scored by a weight table (``weighted-scores/1`` JSON artifact)"""
+
+    def __init__(self, quiz_type, path, cache_size=None):
+        super().__init__(quiz_type, cache_size)
+        self.path = path
+
+    def _load(self):
+        return WeightedScoreModel(self.path)
+
+    def _percentages(self, probas, top_indices, top_probas):
+        """Whole percents of the full distribution that add up to 100, as the aptitude page showed.
+
+        Every career gets its percent rounded down and the points left over go
+        to the largest remainders, so the ranking order is kept.
+        """
+        exact = probas * 100
+        percents = np.floor(exact)
+        left_over = np.round(100 - percents.sum(axis=1, keepdims=True))
+        # Position of every career when sorted by its remainder, largest first
+        remainder_rank = np.argsort(np.argsort(percents - exact, axis=1, kind='stable'), axis=1)
+        percents += remainder_rank < left_over
+        return np.take_along_axis(percents, top_indices, axis=1)
+
+
+_predictors = {}
+
+
+def register_predictor(predictor):
+    _predictors[predictor.quiz_type] = predictor
+    return predictor
+
+
+def get_predictor(quiz_type):
+    """The predictor serving ``quiz_type``; ValueError if there is none"""
+    try:
+        return _predictors[quiz_type]
+    except KeyError:
+        raise ValueError(f"No predictor for quiz type {quiz_type!r}") from None
+
+
+def predictors():
+    return dict(_predictors)
+
+
+# One place for every quiz type that has a model
+career_predictor = register_predictor(CareerEnsemblePredictor('AI_COUNSELING'))
+register_predictor(WeightedScorePredictor('APTITUDE', QUIZ_MODEL_DIR / 'aptitude_weights.json'))
@@ -0,0 +1,203 @@
+"""
+Cache of AI-enhanced counselor replies.
+
+The counselor prompt only depends on the current field, the student's answer
+and the ratings collected so far, and those are small integers, so many
+students send Gemini exactly the same prompt. Replies are cached under a
+fingerprint of those normalized inputs (and the Gemini model name).
+
+Up to ``variants`` different replies are kept per fingerprint: until a key
+has that many, lookups miss and the next Gemini reply is added; after that
+every lookup is a hit and the variants are served in rotation, so students
+do not all read the same sentence. Entries expire after ``ttl`` seconds.
+With ``COUNSELOR_REPLY_CACHE_SHARED`` enabled, the variants are also kept in
+the Django cache so workers fill and share one set.
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+SHARED_KEY_PREFIX = "counselor_reply"
+
+
+def _normalize(value):
+    """Same text for '7', 7 and 7.0; other answers compare case- and space-insensitively"""
+    text = str(value).strip().lower()
+    try:
+        return f"{float(text):g}"
+    except ValueError:
+        return ' '.join(text.split())
+
+
+class ReplyCache:
+    """Bounded, thread-safe LRU of reply variants per prompt fingerprint"""
+
+    def __init__(self, maxsize=1024, ttl=3600, variants=3, shared=False, cache_alias='default'):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.variants = variants
+        self.shared = shared
+        self.cache_alias = cache_alias
+        self._entries = OrderedDict()  # key -> {'expires': monotonic time, 'replies': [...], 'next': int}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            maxsize=getattr(settings, 'COUNSELOR_REPLY_CACHE_SIZE', 1024),
+            ttl=getattr(settings, 'COUNSELOR_REPLY_CACHE_TTL', 3600),
+            variants=getattr(settings, 'COUNSELOR_REPLY_CACHE_VARIANTS', 3),
+            shared=getattr(settings, 'COUNSELOR_REPLY_CACHE_SHARED', False),
+        )
+
+    @property
+    def enabled(self):
+        return self.maxsize > 0 and self.variants > 0
+
+    def key(self, model_name, user_input, current_field, collected_data):
+        """Fingerprint of everything the prompt is built from"""
+        ratings = sorted((str(field), _normalize(value)) for field, value in collected_data.items())
+        payload = json.dumps([model_name, current_field, _normalize(user_input), ratings])
+        return hashlib.sha1(payload.encode()).hexdigest()
+
+    def get(self, key):
+        """A cached reply once ``key`` has its full set of variants, else None"""
+        if not self.enabled:
+            return None
+        reply = self._take_local(key)
+        if reply is None and self.shared:
+            reply = self._adopt_shared(key, self._shared_get(key))
+        return self._found(reply)
+
+    async def aget(self, key):
+        """``get`` for the async views: the shared tier is read off the event loop"""
+        from asgiref.sync import sync_to_async
+
+        if not self.enabled:
+            return None
+        reply = self._take_local(key)
+        if reply is None and self.shared:
+            reply = self._adopt_shared(key, await sync_to_async(self._shared_get)(key))
+        return self._found(reply)
+
+    def add(self, key, reply):
+        """Keep ``reply`` as one of the variants for ``key``"""
+        if not self.enabled:
+            return
+        self._put_local(key, [dict(reply)], append=True)
+        if self.shared:
+            self._shared_add(key, reply)
+
+    async def aadd(self, key, reply):
+        """``add`` for the async views"""
+        from asgiref.sync import sync_to_async
+
+        if not self.enabled:
+            return
+        self._put_local(key, [dict(reply)], append=True)
+        if self.shared:
+            await sync_to_async(self._shared_add)(key, reply)
+
+    def _adopt_shared(self, key, replies):
+        """Take a full set of variants from the shared tier into this worker"""
+        if len(replies) < self.variants:
+            return None
+        self.shared_hits += 1
+        self._put_local(key, replies)
+        return self._take_local(key, count=False)
+
+    def _found(self, reply):
+        if reply is None:
+            self.misses += 1
+            return None
+        return dict(reply)
+
+    def _live_entry(self, key):
+        """The unexpired entry for ``key`` (caller holds the lock)"""
+        entry = self._entries.get(key)
+        if entry is not None and entry['expires'] <= time.monotonic():
+            del self._entries[key]
+            return None
+        return entry
+
+    def _take_local(self, key, count=True):
+        with self._lock:
+            entry = self._live_entry(key)
+            if entry is None or len(entry['replies']) < self.variants:
+                return None
+            self._entries.move_to_end(key)
+            reply = entry['replies'][entry['next'] % len(entry['replies'])]
+            entry['next'] += 1
+            if count:
+                self.hits += 1
+            return reply
+
+    def _put_local(self, key, replies, append=False):
+        with self._lock:
+            entry = self._live_entry(key)
+            if entry is None:
+                entry = self._entries[key] = {'expires': time.monotonic() + self.ttl, 'replies': [], 'next': 0}
+            entry['replies'] = ((entry['replies'] if append else []) + replies)[:self.variants]
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    # ----- optional cross-worker tier -----
+
+    def _shared_get(self, key):
+        from django.core.cache import caches
+
+        try:
+            return caches[self.cache_alias].get(f"{SHARED_KEY_PREFIX}:{key}") or []
+        except Exception as e:
+            logger.warning(f"Shared counselor reply cache unavailable: {e}")
+            return []
+
+    def _shared_add(self, key, reply):
+        from django.core.cache import caches
+
+        try:
+            cache = caches[self.cache_alias]
+            replies = cache.get(f"{SHARED_KEY_PREFIX}:{key}") or []
+            if len(replies) < self.variants:
+                # Concurrent workers may overwrite each other's variant; the next miss adds it again
+                cache.set(f"{SHARED_KEY_PREFIX}:{key}", replies + [dict(reply)], timeout=self.ttl)
+        except Exception as e:
+            logger.warning(f"Shared counselor reply cache unavailable: {e}")
+
+    # ----- maintenance -----
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.shared_hits + self.misses
+        return {
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'variants': self.variants,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'shared_hits': self.shared_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round((self.hits + self.shared_hits) / lookups, 4) if lookups else None,
+            'shared': self.shared,
+        }
+
+
+# Global instance
+reply_cache = ReplyCache.from_settings()
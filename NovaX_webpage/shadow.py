@@ -0,0 +1,193 @@
+"""
+Shadow evaluation of a candidate model version on sampled live traffic.
+
+With ``CAREER_SHADOW_VERSION`` set and ``CAREER_SHADOW_SAMPLE_RATE`` > 0, a
+random sample of the profiles scored for ``predict_career`` and counseling
+completion is handed to a background thread after the response has been
+computed, together with the probabilities the primary version already gave
+them. That thread scores them with the candidate and accumulates top-1
+agreement, Spearman rank correlation over all careers and latency into
+in-memory hourly buckets, which are flushed to ``ShadowComparison`` rows.
+
+The request thread only draws the sample and enqueues it; when the backlog
+is full, samples are dropped instead of waiting.
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from .model_registry import registry
+
+logger = logging.getLogger(__name__)
+
+
+def rank_correlation(a, b):
+    """Spearman correlation between the rows of two probability matrices"""
+    ranks_a = np.argsort(np.argsort(a, axis=1), axis=1).astype(np.float64)
+    ranks_b = np.argsort(np.argsort(b, axis=1), axis=1).astype(np.float64)
+    ranks_a -= ranks_a.mean(axis=1, keepdims=True)
+    ranks_b -= ranks_b.mean(axis=1, keepdims=True)
+    denom = np.sqrt((ranks_a ** 2).sum(axis=1) * (ranks_b ** 2).sum(axis=1))
+    return np.divide((ranks_a * ranks_b).sum(axis=1), denom, out=np.ones(len(a)), where=denom > 0)
+
+
+class ShadowEvaluator:
+    """Samples live inputs and compares a candidate version off the request thread"""
+
+    def __init__(self, version=None, sample_rate=0.0, max_pending=64, flush_interval=60):
+        self.version = version
+        self.sample_rate = sample_rate
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+        self._executor = None
+        self._pid = None
+        self._pending = 0
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._next_flush = time.monotonic() + flush_interval
+        self.submitted = 0
+        self.dropped = 0
+        self.errors = 0
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            version=getattr(settings, 'CAREER_SHADOW_VERSION', None),
+            sample_rate=getattr(settings, 'CAREER_SHADOW_SAMPLE_RATE', 0.0),
+            flush_interval=getattr(settings, 'CAREER_SHADOW_FLUSH_INTERVAL', 60),
+        )
+
+    @property
+    def enabled(self):
+        return bool(self.version) and self.sample_rate > 0
+
+    def maybe_submit(self, bundle, input_array, primary_ms, source, primary_probas=None, scored=None):
+        """Called on the request path: sample rows and enqueue them, never block.
+
+        ``primary_probas`` are the primary version's probabilities for the rows
+        of ``input_array`` selected by the ``scored`` mask (default: all rows);
+        sampled rows without them (e.g. prediction table hits) are scored by
+        the primary version in the background.
+        """
+        if not self.enabled or bundle.version == self.version:
+            return
+        sampled = np.flatnonzero(np.random.random(len(input_array)) < self.sample_rate)
+        if not len(sampled):
+            return
+        if self._pending >= self.max_pending:
+            self.dropped += len(sampled)
+            return
+
+        if self._pid != os.getpid():
+            # One background thread per worker process (created after fork)
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='shadow')
+            self._pid = os.getpid()
+        with self._lock:
+            self._pending += 1
+        primary = np.full((len(sampled), bundle.n_classes), np.nan)
+        if primary_probas is not None:
+            scored = np.ones(len(input_array), dtype=bool) if scored is None else scored
+            have = scored[sampled]
+            primary[have] = primary_probas[(np.cumsum(scored) - 1)[sampled[have]]]
+        self.submitted += len(sampled)
+        self._executor.submit(self._evaluate, bundle, np.array(input_array[sampled]), primary, primary_ms, source)
+
+    def _evaluate(self, bundle, rows, primary, primary_ms, source):
+        from django.db import connection
+
+        try:
+            candidate = registry.get(self.version)
+            if candidate is None:
+                raise RuntimeError(f'Shadow model {self.version} could not be loaded')
+            started = time.perf_counter()
+            shadow = candidate.predict_proba(rows)
+            shadow_ms = (time.perf_counter() - started) * 1000
+            missing = np.isnan(primary[:, 0])
+            if missing.any():
+                primary[missing] = bundle.predict_proba(rows[missing])
+
+            # Compare by career name; the candidate may order (or add) classes differently
+            common = [c for c in bundle.classes.tolist() if c in set(candidate.classes.tolist())]
+            primary_cols = [bundle.classes.tolist().index(c) for c in common]
+            shadow_cols = [candidate.classes.tolist().index(c) for c in common]
+            top1 = bundle.classes[primary.argmax(axis=1)] == candidate.classes[shadow.argmax(axis=1)]
+            correlation = rank_correlation(primary[:, primary_cols], shadow[:, shadow_cols])
+
+            self._record(bundle.version, candidate.version, source, len(rows),
+                         int(top1.sum()), float(correlation.sum()), primary_ms, shadow_ms)
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Shadow evaluation against {self.version} failed: {e}")
+        finally:
+            with self._lock:
+                self._pending -= 1
+        if time.monotonic() >= self._next_flush:
+            try:
+                self.flush()
+            finally:
+                # This thread's connection is otherwise left open until the worker exits
+                connection.close()
+
+    def _record(self, primary_version, shadow_version, source, samples, matches, correlation_sum, primary_ms, shadow_ms):
+        hour = timezone.now().replace(minute=0, second=0, microsecond=0)
+        key = (hour, primary_version, shadow_version, source)
+        with self._lock:
+            bucket = self._buckets.setdefault(key, {
+                'samples': 0, 'top1_matches': 0, 'rank_correlation_sum': 0.0, 'calls': 0,
+                'primary_ms_sum': 0.0, 'shadow_ms_sum': 0.0, 'shadow_ms_max': 0.0,
+            })
+            bucket['samples'] += samples
+            bucket['top1_matches'] += matches
+            bucket['rank_correlation_sum'] += correlation_sum
+            bucket['calls'] += 1
+            bucket['primary_ms_sum'] += primary_ms
+            bucket['shadow_ms_sum'] += shadow_ms
+            bucket['shadow_ms_max'] = max(bucket['shadow_ms_max'], shadow_ms)
+
+    def flush(self):
+        """Add the accumulated buckets to the ShadowComparison table"""
+        from django.db import transaction
+        from django.db.models import F
+
+        from .models import ShadowComparison
+
+        self._next_flush = time.monotonic() + self.flush_interval
+        with self._lock:
+            buckets, self._buckets = self._buckets, {}
+        try:
+            for (hour, primary_version, shadow_version, source), sums in buckets.items():
+                with transaction.atomic():
+                    row, _ = ShadowComparison.objects.select_for_update().get_or_create(
+                        bucket=hour, primary_version=primary_version,
+                        shadow_version=shadow_version, source=source,
+                    )
+                    ShadowComparison.objects.filter(pk=row.pk).update(
+                        shadow_ms_max=max(row.shadow_ms_max, sums.pop('shadow_ms_max')),
+                        **{field: F(field) + value for field, value in sums.items()}
+                    )
+        except Exception as e:
+            logger.error(f"Could not save shadow comparisons: {e}")
+
+    def stats(self):
+        with self._lock:
+            unflushed = sum(b['samples'] for b in self._buckets.values())
+        return {
+            'enabled': self.enabled,
+            'version': self.version,
+            'sample_rate': self.sample_rate,
+            'submitted': self.submitted,
+            'dropped': self.dropped,
+            'errors': self.errors,
+            'pending': self._pending,
+            'unflushed_samples': unflushed,
+        }
+
+
+# Global instance
+shadow_evaluator = ShadowEvaluator.from_settings()
@@ -0,0 +1,199 @@
+"""
+"Students like you chose": nearest neighbours over past counseling attempts.
+
+The feature vectors of completed AI counseling attempts
+(``QuizAttempt.feature_scores``) are kept in one contiguous float32 matrix
+together with each attempt's top career. A query is a single brute-force
+matrix-vector product plus ``argpartition``, which takes a few milliseconds
+for 100k attempts and never touches the database.
+
+The index loads lazily and then only appends: ``refresh`` reads attempts
+with an id above the last indexed one. It runs on the next query after this
+worker saves an attempt (``mark_stale``) and otherwise at most every
+``CAREER_SIMILAR_REFRESH_INTERVAL`` seconds, which picks up attempts saved
+by other workers.
+"""
+import logging
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+
+from .feature_schema import career_feature_schema
+
+logger = logging.getLogger(__name__)
+
+INITIAL_CAPACITY = 1024
+LOAD_CHUNK_SIZE = 2000
+
+
+def _top_career(predictions):
+    if predictions and isinstance(predictions, list) and isinstance(predictions[0], dict):
+        return predictions[0].get('career')
+    return None
+
+
+class SimilarStudentsIndex:
+    """Append-only, in-memory index of historical feature vectors"""
+
+    def __init__(self, refresh_interval=None):
+        self.schema = career_feature_schema(dtype=np.float32)
+        self.refresh_interval = (
+            refresh_interval if refresh_interval is not None
+            else getattr(settings, 'CAREER_SIMILAR_REFRESH_INTERVAL', 60)
+        )
+        self._vectors = np.empty((0, self.schema.n_features), dtype=np.float32)
+        self._norms = np.empty(0, dtype=np.float32)
+        self._ids = np.empty(0, dtype=np.int64)
+        self._users = np.empty(0, dtype=np.int64)
+        self._careers = np.empty(0, dtype=np.int32)
+        self._career_names = []
+        self._career_codes = {}
+        self.size = 0
+        self.last_id = 0
+        self._loaded = False
+        self._next_refresh = 0.0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    # ----- building -----
+
+    def _career_code(self, career):
+        code = self._career_codes.get(career)
+        if code is None:
+            code = self._career_codes[career] = len(self._career_names)
+            self._career_names.append(career)
+        return code
+
+    def _grow(self, needed):
+        capacity = len(self._ids)
+        if needed <= capacity:
+            return
+        capacity = max(INITIAL_CAPACITY, capacity * 2, needed)
+
+        def resized(array, shape):
+            out = np.empty(shape, dtype=array.dtype)
+            out[:self.size] = array[:self.size]
+            return out
+
+        self._vectors = resized(self._vectors, (capacity, self.schema.n_features))
+        self._norms = resized(self._norms, capacity)
+        self._ids = resized(self._ids, capacity)
+        self._users = resized(self._users, capacity)
+        self._careers = resized(self._careers, capacity)
+
+    def _append(self, rows):
+        """rows: iterable of (attempt id, user id, feature scores, predictions)"""
+        rows = [row for row in rows if row[2] and _top_career(row[3])]
+        if not rows:
+            return 0
+        vectors = self.schema.matrix([scores for _, _, scores, _ in rows])
+        with self._lock:
+            # Rows come in id order; skip any a concurrent refresh already added
+            fresh = [i for i, row in enumerate(rows) if row[0] > self.last_id]
+            rows = [rows[i] for i in fresh]
+            vectors = vectors[fresh]
+            if not rows:
+                return 0
+            start = self.size
+            self._grow(start + len(rows))
+            end = start + len(rows)
+            self._vectors[start:end] = vectors
+            self._norms[start:end] = np.einsum('ij,ij->i', vectors, vectors)
+            self._ids[start:end] = [row[0] for row in rows]
+            self._users[start:end] = [row[1] for row in rows]
+            self._careers[start:end] = [self._career_code(_top_career(row[3])) for row in rows]
+            self.size = end
+            self.last_id = max(self.last_id, int(self._ids[start:end].max()))
+        return len(rows)
+
+    def refresh(self):
+        """Append attempts saved since the last refresh (by id, no full scan)"""
+        from .models import QuizAttempt
+
+        self._next_refresh = time.monotonic() + self.refresh_interval
+        attempts = (
+            QuizAttempt.objects
+            .filter(quiz_type='AI_COUNSELING', id__gt=self.last_id)
+            .exclude(feature_scores={})
+            .order_by('id')
+            .values_list('id', 'user_id', 'feature_scores', 'predictions')
+        )
+        added = 0
+        chunk = []
+        for row in attempts.iterator(chunk_size=LOAD_CHUNK_SIZE):
+            chunk.append(row)
+            if len(chunk) >= LOAD_CHUNK_SIZE:
+                added += self._append(chunk)
+                chunk = []
+        added += self._append(chunk)
+        self._loaded = True
+        if added:
+            logger.info(f"Similar-students index: +{added} attempts ({self.size} total)")
+        return added
+
+    def mark_stale(self):
+        """A new attempt was saved: refresh on the next query"""
+        self._next_refresh = 0.0
+
+    def rebuild(self):
+        """Drop everything and reload (e.g. after re-scoring stored attempts)"""
+        with self._lock:
+            self.size = 0
+            self.last_id = 0
+        return self.refresh()
+
+    def _maybe_refresh(self):
+        if self._loaded and time.monotonic() < self._next_refresh:
+            return
+        # The first load blocks; later refreshes are skipped while one is running
+        if not self._refresh_lock.acquire(blocking=not self._loaded):
+            return
+        try:
+            self.refresh()
+        except Exception as e:
+            logger.error(f"Similar-students index refresh failed: {e}")
+        finally:
+            self._refresh_lock.release()
+
+    # ----- querying -----
+
+    def query(self, data, k=25, exclude_user=None):
+        """Careers chosen by the ``k`` past students closest to the profile ``data``"""
+        self._maybe_refresh()
+        with self._lock:
+            size = self.size
+            vectors = self._vectors[:size]
+            norms = self._norms[:size]
+            users = self._users[:size]
+            careers = self._careers[:size]
+            names = list(self._career_names)
+
+        if exclude_user is not None and size:
+            keep = np.flatnonzero(users != exclude_user)
+            vectors, norms, careers = vectors[keep], norms[keep], careers[keep]
+        if not len(vectors):
+            return {'neighbours': 0, 'careers': []}
+
+        q = self.schema.row(data)
+        # |v - q|^2 = |v|^2 - 2 v.q + |q|^2 (the last term does not change the order)
+        distances = norms - 2 * (vectors @ q)
+        k = min(k, len(vectors))
+        nearest = np.argpartition(distances, k - 1)[:k]
+        counts = np.bincount(careers[nearest], minlength=len(names))
+        order = np.argsort(-counts, kind='stable')
+        return {
+            'neighbours': int(k),
+            'careers': [
+                {'career': names[code], 'count': int(counts[code]), 'share': round(counts[code] / k * 100, 1)}
+                for code in order if counts[code]
+            ],
+        }
+
+    def stats(self):
+        return {'size': self.size, 'last_id': self.last_id, 'loaded': self._loaded}
+
+
+# Global instance
+similar_students = SimilarStudentsIndex()
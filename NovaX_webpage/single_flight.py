@@ -0,0 +1,256 @@
+"""
+Single-flight coalescing of identical in-flight Gemini calls.
+
+In a class session many students send the same answer to the same question
+within seconds, so the counselor builds the same prompt many times at once.
+``do(key, fn)`` runs ``fn`` for the first caller of a key (the leader); every
+caller arriving while it is in flight waits for that result (or exception)
+instead of making its own upstream call. ``do_async`` does the same for the
+async views, on the worker's event loop.
+
+With ``COUNSELOR_SINGLE_FLIGHT_SHARED`` enabled, leaders also take a
+short-lived lock in the Django cache: a leader in another worker that finds
+the lock taken polls for the result the lock holder publishes, and makes its
+own call only if the holder gives up without one.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+SHARED_KEY_PREFIX = "counselor_flight"
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Per-key deduplication of concurrent calls (threads, event loop and optionally workers)"""
+
+    def __init__(self, enabled=True, shared=False, lock_seconds=10, poll_interval=0.1, cache_alias='default'):
+        self.enabled = enabled
+        self.shared = shared
+        self.lock_seconds = lock_seconds
+        self.poll_interval = poll_interval
+        self.cache_alias = cache_alias
+        self._calls = {}  # key -> _Call (threads)
+        self._futures = {}  # (event loop, key) -> Future (async views)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.coalesced = 0
+        self.shared_coalesced = 0
+        self.timeouts = 0
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            enabled=getattr(settings, 'COUNSELOR_SINGLE_FLIGHT', True),
+            shared=getattr(settings, 'COUNSELOR_SINGLE_FLIGHT_SHARED', False),
+            lock_seconds=getattr(settings, 'COUNSELOR_SINGLE_FLIGHT_LOCK_SECONDS', 10),
+        )
+
+    # ----- threads -----
+
+    def _wait_until(self, deadline):
+        """When waiting for another caller must end: the lock lifetime, or the caller's deadline if sooner"""
+        until = time.monotonic() + self.lock_seconds
+        return until if deadline is None else min(until, deadline)
+
+    def do(self, key, fn, deadline=None, wait_shared=True):
+        """``fn()``, shared with every concurrent caller of the same ``key``.
+
+        ``deadline`` (``time.monotonic()`` based) bounds how long this caller
+        waits for someone else's call. With ``wait_shared`` False the
+        cross-worker lock is skipped and the leader calls ``fn`` at once.
+        """
+        if not self.enabled:
+            return fn()
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            self.coalesced += 1
+            if not call.done.wait(max(self._wait_until(deadline) - time.monotonic(), 0)):
+                self.timeouts += 1
+                raise TimeoutError("Coalesced call did not finish in time")
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._lead(key, fn, deadline, wait_shared)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def _lead(self, key, fn, deadline, wait_shared):
+        acquired = self._acquire(key) if wait_shared else None
+        if acquired is False:
+            # Another worker is making this call: wait for what it publishes
+            until = self._wait_until(deadline)
+            while True:
+                if time.monotonic() >= until:
+                    self._give_up(deadline)
+                    break
+                time.sleep(min(self.poll_interval, max(until - time.monotonic(), 0)))
+                result, held = self._shared_poll(key)
+                if result is not None:
+                    self.shared_coalesced += 1
+                    return result
+                if not held:
+                    break
+        self.calls += 1
+        try:
+            result = fn()
+            if acquired and result is not None:
+                self._publish(key, result)
+            return result
+        finally:
+            if acquired:
+                self._release(key)
+
+    # ----- event loop -----
+
+    async def do_async(self, key, fn, deadline=None, wait_shared=True):
+        """``await fn()``, shared with every concurrent caller of the same ``key`` on this loop (see ``do``)"""
+        if not self.enabled:
+            return await fn()
+        loop = asyncio.get_running_loop()
+        future = self._futures.get((loop, key))
+        if future is not None:
+            self.coalesced += 1
+            try:
+                # shield: a waiter that times out must not cancel the leader's call
+                return await asyncio.wait_for(
+                    asyncio.shield(future), max(self._wait_until(deadline) - time.monotonic(), 0)
+                )
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                raise
+
+        future = self._futures[(loop, key)] = loop.create_future()
+        try:
+            result = await self._lead_async(key, fn, deadline, wait_shared)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            # Only the leader's request went away: its waiters get an ordinary
+            # error (CancelledError would escape their ``except Exception``)
+            future.set_exception(RuntimeError("Coalesced call was cancelled"))
+            future.exception()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark it retrieved: with no waiters asyncio would log it as never retrieved
+            future.exception()
+            raise
+        finally:
+            del self._futures[(loop, key)]
+
+    async def _lead_async(self, key, fn, deadline, wait_shared):
+        from asgiref.sync import sync_to_async
+
+        acquired = await sync_to_async(self._acquire)(key) if wait_shared else None
+        if acquired is False:
+            until = self._wait_until(deadline)
+            while True:
+                if time.monotonic() >= until:
+                    self._give_up(deadline)
+                    break
+                await asyncio.sleep(min(self.poll_interval, max(until - time.monotonic(), 0)))
+                result, held = await sync_to_async(self._shared_poll)(key)
+                if result is not None:
+                    self.shared_coalesced += 1
+                    return result
+                if not held:
+                    break
+        self.calls += 1
+        try:
+            result = await fn()
+            if acquired and result is not None:
+                await sync_to_async(self._publish)(key, result)
+            return result
+        finally:
+            if acquired:
+                await sync_to_async(self._release)(key)
+
+    def _give_up(self, deadline):
+        """Stop waiting on another worker; past the caller's deadline there is no time for our own call"""
+        if deadline is not None and time.monotonic() >= deadline:
+            self.timeouts += 1
+            raise TimeoutError("Another worker's call did not finish in time")
+
+    # ----- optional cross-worker lock -----
+
+    def _acquire(self, key):
+        """True if this worker holds the shared lock, False if another does, None without a shared tier"""
+        if not self.shared:
+            return None
+        from django.core.cache import caches
+
+        try:
+            return caches[self.cache_alias].add(f"{SHARED_KEY_PREFIX}_lock:{key}", os.getpid(), timeout=self.lock_seconds)
+        except Exception as e:
+            logger.warning(f"Shared single-flight lock unavailable: {e}")
+            return None
+
+    def _shared_poll(self, key):
+        """(published result or None, whether the lock is still held)"""
+        from django.core.cache import caches
+
+        try:
+            values = caches[self.cache_alias].get_many(
+                [f"{SHARED_KEY_PREFIX}_result:{key}", f"{SHARED_KEY_PREFIX}_lock:{key}"]
+            )
+        except Exception as e:
+            logger.warning(f"Shared single-flight lock unavailable: {e}")
+            return None, False
+        return values.get(f"{SHARED_KEY_PREFIX}_result:{key}"), f"{SHARED_KEY_PREFIX}_lock:{key}" in values
+
+    def _publish(self, key, result):
+        from django.core.cache import caches
+
+        try:
+            caches[self.cache_alias].set(f"{SHARED_KEY_PREFIX}_result:{key}", result, timeout=self.lock_seconds)
+        except Exception as e:
+            logger.warning(f"Shared single-flight lock unavailable: {e}")
+
+    def _release(self, key):
+        from django.core.cache import caches
+
+        try:
+            caches[self.cache_alias].delete(f"{SHARED_KEY_PREFIX}_lock:{key}")
+        except Exception as e:
+            logger.warning(f"Shared single-flight lock unavailable: {e}")
+
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'shared': self.shared,
+            'in_flight': len(self._calls) + len(self._futures),
+            'calls': self.calls,
+            'coalesced': self.coalesced,
+            'shared_coalesced': self.shared_coalesced,
+            'timeouts': self.timeouts,
+        }
+
+
+# Global instance
+single_flight = SingleFlight.from_settings()
@@ -1,3 +1,686 @@
-from django.test import TestCase
+import tempfile
+import threading
+import time
 
-# Create your tests here.
+import numpy as np
+from django.test import SimpleTestCase, TestCase
+
+from .feature_schema import career_feature_schema
+from .predictors import parse_top_k
+from .prediction_table import TABLE_FEATURES, build_prediction_table, load_prediction_table, top_k_classes
+from .single_flight import SingleFlight
+from .tree_export import FlatEnsemble, export_ensemble, load_flat_ensemble, max_abs_error
+
+
+def _training_data(n_rows=300, n_features=13, n_classes=4, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.integers(1, 11, size=(n_rows, n_features)).astype(np.float64)
+    y = (X[:, 0] + X[:, 1] - X[:, 2] + rng.normal(0, 2, n_rows)).argsort().argsort() * n_classes // n_rows
+    return X, y
+
+
+class FlatEnsembleExportTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        from sklearn.ensemble import GradientBoostingClassifier, RandomForestClassifier
+        from sklearn.preprocessing import StandardScaler
+
+        X, y = _training_data()
+        cls.scaler = StandardScaler().fit(X)
+        scaled = cls.scaler.transform(X)
+        cls.models = [
+            RandomForestClassifier(n_estimators=5, max_depth=4, random_state=0).fit(scaled, y),
+            GradientBoostingClassifier(n_estimators=5, max_depth=3, random_state=0).fit(scaled, y),
+        ]
+        try:
+            from xgboost import XGBClassifier
+            cls.models.append(XGBClassifier(n_estimators=5, max_depth=3, random_state=0).fit(scaled, y))
+        except ImportError:
+            pass
+        cls.classes = np.array(['Artist', 'Doctor', 'Engineer', 'Teacher'], dtype=object)
+        cls.check = np.random.default_rng(1).integers(1, 11, size=(500, 13)).astype(np.float64)
+
+    def test_export_matches_predict_proba(self):
+        flat = export_ensemble(self.models, self.scaler)
+        self.assertLess(max_abs_error(flat, self.models, self.scaler, self.check), 1e-6)
+
+    def test_saved_export_loads_memory_mapped(self):
+        flat = export_ensemble(self.models, self.scaler)
+        with tempfile.TemporaryDirectory() as directory:
+            flat.save(directory, classes=self.classes, model_signature='sig')
+            loaded = load_flat_ensemble(directory, signature='sig')
+            np.testing.assert_allclose(loaded.predict_proba(self.check), flat.predict_proba(self.check))
+            self.assertEqual(loaded.classes.tolist(), self.classes.tolist())
+            self.assertIsNone(load_flat_ensemble(directory, signature='other'))
+
+    def test_re_export_keeps_classes_of_mapped_files(self):
+        # Re-exporting a version passes its own memory-mapped classes.npy back into save
+        with tempfile.TemporaryDirectory() as directory:
+            export_ensemble(self.models, self.scaler).save(directory, classes=self.classes)
+            mapped = FlatEnsemble.load(directory, mmap_mode='r')
+            export_ensemble(self.models, self.scaler).save(directory, classes=mapped.classes)
+
+            self.assertEqual(mapped.classes.tolist(), self.classes.tolist())
+            reloaded = FlatEnsemble.load(directory, mmap_mode='r')
+            self.assertEqual(reloaded.classes.tolist(), self.classes.tolist())
+            np.testing.assert_allclose(reloaded.predict_proba(self.check), mapped.predict_proba(self.check))
+
+
+def _write_model_dir(directory, seed=0):
+    """Pickled ensemble, label encoder and scaler, laid out like ``ml_models2``"""
+    import os
+    import pickle
+
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+    X, y = _training_data(seed=seed)
+    scaler = StandardScaler().fit(X)
+    objects = {
+        'ensemble_models_optuna': [RandomForestClassifier(n_estimators=5, max_depth=4, random_state=0).fit(scaler.transform(X), y)],
+        'label_encoder': LabelEncoder().fit(['Artist', 'Doctor', 'Engineer', 'Teacher']),
+        'scaler': scaler,
+    }
+    os.makedirs(directory, exist_ok=True)
+    for name, obj in objects.items():
+        with open(os.path.join(directory, f'{name}.pkl'), 'wb') as f:
+            pickle.dump(obj, f)
+    return directory
+
+
+def _fake_probas(matrix):
+    """Deterministic class probabilities that depend on every table feature"""
+    scores = np.stack([matrix[:, 0] * (c + 1) + matrix[:, 1] * (5 - c) + matrix[:, 4] * c for c in range(6)], axis=1)
+    scores = np.exp(scores / 10)
+    return scores / scores.sum(axis=1, keepdims=True)
+
+
+class PredictionTableTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.schema = career_feature_schema()
+        cls.directory = tempfile.TemporaryDirectory()
+        build_prediction_table(_fake_probas, cls.schema, cls.directory.name, 'sig', top_k=3)
+        cls.table = load_prediction_table(cls.directory.name, cls.schema, signature='sig')
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+        super().tearDownClass()
+
+    def test_hits_return_the_rows_of_their_profiles(self):
+        rng = np.random.default_rng(0)
+        rows = np.full((50, self.schema.n_features), self.schema.default)
+        columns = [self.schema.index[feature] for feature in TABLE_FEATURES]
+        rows[:, columns] = rng.integers(1, 11, size=(50, len(columns)))
+
+        hits, table_rows = self.table.lookup(rows)
+        self.assertTrue(hits.all())
+        expected_indices, expected_probas = top_k_classes(_fake_probas(rows), 3)
+        np.testing.assert_array_equal(self.table.indices[table_rows], expected_indices)
+        np.testing.assert_allclose(self.table.probas[table_rows], expected_probas, rtol=1e-6)
+
+    def test_profiles_outside_the_grid_miss(self):
+        base = self.schema.row({})
+        fractional = self.schema.row({'O_score': 5.5})
+        out_of_range = self.schema.row({'C_score': 11})
+        other_feature = self.schema.row({'Creative_Thinking': 7})
+        hits, rows = self.table.lookup(np.stack([base, fractional, out_of_range, other_feature]))
+        self.assertEqual(hits.tolist(), [True, False, False, False])
+        self.assertEqual(len(rows), 1)
+
+    def test_other_model_signature_is_ignored(self):
+        self.assertIsNone(load_prediction_table(self.directory.name, self.schema, signature='other'))
+
+    def test_rebuild_leaves_mapped_table_intact(self):
+        with tempfile.TemporaryDirectory() as directory:
+            build_prediction_table(_fake_probas, self.schema, directory, 'old', top_k=3)
+            mapped = load_prediction_table(directory, self.schema, signature='old')
+            before = np.array(mapped.probas)
+            build_prediction_table(lambda matrix: _fake_probas(matrix) ** 2, self.schema, directory, 'new', top_k=3)
+
+            np.testing.assert_array_equal(mapped.probas, before)
+            self.assertIsNotNone(load_prediction_table(directory, self.schema, signature='new'))
+
+
+class WhatIfSweepTests(TestCase):
+    def test_default_range(self):
+        from .views import _sweep_values
+
+        self.assertEqual(_sweep_values({'feature': 'O_score'}), list(np.arange(1.0, 11.0)))
+
+    def test_oversized_sweeps_are_rejected_before_allocating(self):
+        from .views import MAX_WHAT_IF_POINTS, _sweep_values
+
+        started = time.perf_counter()
+        with self.assertRaises(ValueError):
+            _sweep_values({'feature': 'O_score', 'min': 0, 'max': 10, 'step': 1e-8})
+        self.assertLess(time.perf_counter() - started, 0.1)
+        with self.assertRaises(ValueError):
+            _sweep_values({'feature': 'O_score', 'values': list(range(MAX_WHAT_IF_POINTS + 1))})
+
+    def test_invalid_ranges_are_rejected(self):
+        from .views import _sweep_values
+
+        for spec in ({'max': float('inf')}, {'step': 0}, {'min': 5, 'max': 1}, {'values': [1, float('nan')]}, {'values': []}):
+            with self.subTest(spec=spec), self.assertRaises(ValueError):
+                _sweep_values(dict(spec, feature='O_score'))
+
+
+class InputValidationTests(SimpleTestCase):
+    def test_null_and_infinite_features_are_rejected(self):
+        schema = career_feature_schema()
+        for value in (None, float('inf'), float('nan')):
+            with self.subTest(value=value), self.assertRaises(ValueError):
+                schema.matrix([{'O_score': value}])
+        self.assertEqual(schema.row({'O_score': '7'})[0], 7.0)
+
+    def test_features_that_are_not_collected_keep_the_default(self):
+        schema = career_feature_schema()
+        row = schema.row({'Perceptual Aptitude': 9, 'Verbal Reasoning': 8})
+        self.assertEqual(row[schema.index['Perceptual Aptitude']], schema.default)
+        self.assertEqual(row[schema.index['Verbal Reasoning']], 8.0)
+        self.assertIsNone(schema.source_keys[schema.index['Perceptual Aptitude']])
+
+    def test_parse_top_k(self):
+        self.assertEqual(parse_top_k(None, 10), 10)
+        self.assertEqual(parse_top_k(20, 10), 10)
+        for value in (float('inf'), float('nan'), 0, 2.5, True):
+            with self.subTest(value=value), self.assertRaises(ValueError):
+                parse_top_k(value, 10)
+
+
+class SingleFlightTests(SimpleTestCase):
+    def _run_concurrently(self, flight, fn, n=8):
+        results = []
+        errors = []
+
+        def call():
+            try:
+                results.append(flight.do('key', fn))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(n)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results, errors
+
+    def test_waiters_share_the_leaders_result(self):
+        flight = SingleFlight()
+        calls = []
+
+        def slow():
+            calls.append(1)
+            time.sleep(0.2)
+            return {'message': 'hi'}
+
+        results, errors = self._run_concurrently(flight, slow)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{'message': 'hi'}] * 8)
+        self.assertEqual(errors, [])
+        self.assertEqual(flight.stats()['coalesced'], 7)
+        self.assertEqual(flight.stats()['in_flight'], 0)
+
+    def test_leader_error_reaches_every_waiter(self):
+        flight = SingleFlight()
+
+        def failing():
+            time.sleep(0.2)
+            raise RuntimeError('upstream down')
+
+        results, errors = self._run_concurrently(flight, failing)
+        self.assertEqual(results, [])
+        self.assertEqual(len(errors), 8)
+        self.assertTrue(all(str(e) == 'upstream down' for e in errors))
+        # Nothing stays in flight: the next call runs again
+        self.assertEqual(flight.do('key', lambda: 'again'), 'again')
+
+    def test_waiter_gives_up_at_its_deadline(self):
+        flight = SingleFlight()
+        started = threading.Event()
+
+        def slow():
+            started.set()
+            time.sleep(0.5)
+            return 'late'
+
+        leader = threading.Thread(target=flight.do, args=('key', slow))
+        leader.start()
+        started.wait()
+        with self.assertRaises(TimeoutError):
+            flight.do('key', slow, deadline=time.monotonic() + 0.05)
+        leader.join()
+
+    def test_async_waiters_share_one_call(self):
+        import asyncio
+
+        flight = SingleFlight()
+        calls = []
+
+        async def slow():
+            calls.append(1)
+            await asyncio.sleep(0.1)
+            return 'shared'
+
+        async def main():
+            return await asyncio.gather(*[flight.do_async('key', slow) for _ in range(5)])
+
+        self.assertEqual(asyncio.run(main()), ['shared'] * 5)
+        self.assertEqual(len(calls), 1)
+
+    def test_cancelled_async_leader_fails_its_waiters_with_an_error(self):
+        import asyncio
+
+        flight = SingleFlight()
+
+        async def slow():
+            await asyncio.sleep(1)
+            return 'late'
+
+        async def main():
+            leader = asyncio.ensure_future(flight.do_async('key', slow))
+            await asyncio.sleep(0.01)
+            waiter = asyncio.ensure_future(flight.do_async('key', slow))
+            await asyncio.sleep(0.01)
+            leader.cancel()
+            try:
+                await waiter
+            except Exception as e:
+                return e
+
+        self.assertIsInstance(asyncio.run(main()), RuntimeError)
+
+
+class WeightedScorePredictorTests(SimpleTestCase):
+    def test_aptitude_percentages_add_up_to_100(self):
+        from .predictors import get_predictor
+
+        predictor = get_predictor('APTITUDE')
+        rng = np.random.default_rng(0)
+        features = predictor.model().schema.features
+        records = [dict(zip(features, answers)) for answers in rng.integers(1, 11, size=(200, len(features))).tolist()]
+        for ranked in predictor.predict_batch(records, top_k='all'):
+            percentages = [entry['probability'] for entry in ranked]
+            self.assertEqual(sum(percentages), 100)
+            self.assertEqual(percentages, sorted(percentages, reverse=True))
+
+    def test_predictors_must_load_something(self):
+        from .predictors import Predictor
+
+        with self.assertRaises(TypeError):
+            Predictor('QUIZ')
+
+
+class CounselorConnectTests(SimpleTestCase):
+    def _wait_for_connect(self, counselor):
+        for _ in range(100):
+            if not counselor._connecting:
+                return
+            time.sleep(0.01)
+
+    def test_failed_connection_is_retried_after_backoff(self):
+        from unittest import mock
+
+        from .ai_counselor import EducationalCounselor
+
+        counselor = EducationalCounselor()
+        counselor.connect_retry = 0.2
+        with mock.patch.dict('os.environ', {'GEMINI_API_KEY': ''}), \
+                mock.patch.object(counselor, '_attach_model', wraps=counselor._attach_model) as attach:
+            counselor.connect_in_background()
+            self._wait_for_connect(counselor)
+            self.assertEqual(counselor.connection_state, 'no api key')
+
+            # Backing off: no new attempt yet
+            counselor.connect_in_background()
+            self.assertEqual(attach.call_count, 1)
+
+            time.sleep(0.25)
+            counselor.connect_in_background()
+            self._wait_for_connect(counselor)
+            self.assertEqual(attach.call_count, 2)
+            # The second failure backs off twice as long
+            self.assertGreater(counselor.status()['retry_in'], 0.2)
+
+
+class ShadowEvaluationTests(TestCase):
+    def setUp(self):
+        import os
+
+        from .model_registry import ModelRegistry, activate_version
+
+        self.store = tempfile.TemporaryDirectory()
+        self.addCleanup(self.store.cleanup)
+        # v2 is trained like v1, so the two versions must agree on every profile
+        _write_model_dir(os.path.join(self.store.name, 'v1'))
+        _write_model_dir(os.path.join(self.store.name, 'v2'))
+        _write_model_dir(os.path.join(self.store.name, 'v3'), seed=1)
+        _write_model_dir(os.path.join(self.store.name, 'v4'), seed=2)
+        activate_version('v1', self.store.name)
+        self.registry = ModelRegistry(store_dir=self.store.name)
+
+    def _evaluate(self, evaluator, bundle, rows, scored):
+        from unittest import mock
+
+        with mock.patch('NovaX_webpage.shadow.registry', self.registry), \
+                mock.patch.object(bundle, 'predict_proba', wraps=bundle.predict_proba) as primary:
+            evaluator.maybe_submit(bundle, rows, 2.0, 'test', primary_probas=bundle.predict_proba(rows[scored]), scored=scored)
+            primary.reset_mock()
+            evaluator._executor.shutdown(wait=True)
+        evaluator.flush()
+        return primary
+
+    def test_comparison_reuses_the_primary_probabilities(self):
+        from .models import ShadowComparison
+        from .shadow import ShadowEvaluator
+
+        bundle = self.registry.get()
+        rows = np.random.default_rng(2).integers(1, 11, size=(20, 13)).astype(np.float64)
+        scored = np.arange(20) % 4 != 0
+
+        primary = self._evaluate(ShadowEvaluator(version='v2', sample_rate=1.0), bundle, rows, scored)
+        # Only the rows the request did not score itself (e.g. table hits) are scored again
+        self.assertEqual(primary.call_count, 1)
+        self.assertEqual(len(primary.call_args[0][0]), 5)
+
+        comparison = ShadowComparison.objects.get(primary_version='v1', shadow_version='v2')
+        self.assertEqual(comparison.samples, 20)
+        self.assertEqual(comparison.top1_matches, 20)
+        self.assertAlmostEqual(comparison.rank_correlation_sum, 20)
+        self.assertEqual(comparison.calls, 1)
+
+    def test_republished_candidate_is_loaded_again(self):
+        import os
+
+        first = self.registry.get('v2')
+        self.assertIs(self.registry.get('v2'), first)
+
+        pickled = os.path.join(self.store.name, 'v2', 'ensemble_models_optuna.pkl')
+        stat = os.stat(pickled)
+        os.utime(pickled, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+        self.assertIsNot(self.registry.get('v2'), first)
+
+        # Only the most recently used other versions stay loaded
+        self.registry.get('v3')
+        self.registry.get('v4')
+        self.assertEqual(list(self.registry._others), ['v3', 'v4'])
+
+
+class InferencePoolDispatchTests(SimpleTestCase):
+    def test_failed_batches_fail_fast_and_the_dispatcher_keeps_running(self):
+        from concurrent.futures import ThreadPoolExecutor
+        from unittest import mock
+
+        from .inference_pool import InferencePool
+
+        pool = InferencePool(processes=1, max_wait_ms=50)
+        self.addCleanup(pool.shutdown)
+        with mock.patch.object(pool, '_new_executor', lambda: ThreadPoolExecutor(max_workers=1)), \
+                mock.patch('NovaX_webpage.inference_pool._score', lambda version, batch: batch[:, :1]):
+            # Rows that cannot be stacked into one batch, then rows that break the dispatcher itself
+            mismatched = [pool.submit('v1', np.ones((1, 13))), pool.submit('v1', np.ones((1, 12)))]
+            for future in mismatched:
+                with self.assertRaises(ValueError):
+                    future.result(timeout=1)
+            with self.assertRaises(TypeError):
+                pool.submit('v1', None).result(timeout=1)
+
+            self.assertEqual(pool.submit('v1', np.full((2, 13), 3.0)).result(timeout=1).tolist(), [[3.0], [3.0]])
+
+
+class DriftSketchTests(TestCase):
+    def test_sketches_of_a_failed_write_are_added_by_the_next_flush(self):
+        from types import SimpleNamespace
+        from unittest import mock
+
+        from django.db import DatabaseError
+
+        from .drift import DriftSketch
+        from .models import InputSketch
+
+        sketch = DriftSketch(flush_interval=3600)
+        bundle = SimpleNamespace(version='v1')
+        rows = np.random.default_rng(0).integers(1, 11, size=(30, 13)).astype(np.float64)
+
+        sketch.observe(bundle, rows[:20])
+        with mock.patch.object(InputSketch.objects, 'select_for_update', side_effect=DatabaseError('database is down')):
+            sketch.flush()
+        self.assertFalse(InputSketch.objects.exists())
+        self.assertEqual(sketch.stats()['unflushed_rows'], 20)
+        self.assertEqual(sketch.stats()['errors'], 1)
+
+        sketch.observe(bundle, rows[20:])
+        sketch.flush()
+        stored = InputSketch.objects.get(model_version='v1')
+        self.assertEqual(stored.rows, 30)
+        self.assertEqual(sum(stored.histograms['O_score']), 30)
+        self.assertAlmostEqual(stored.moments['O_score'][0], rows[:, 0].sum())
+        self.assertEqual(sketch.stats()['unflushed_rows'], 0)
+
+
+class ModelRegistryTests(SimpleTestCase):
+    def _wait_for_version(self, registry, version):
+        for _ in range(500):
+            bundle = registry.get()
+            if bundle is not None and bundle.version == version:
+                return bundle
+            time.sleep(0.01)
+        self.fail(f'{version} was never swapped in')
+
+    def test_publishing_and_activating_versions_hot_swaps_them(self):
+        import os
+
+        from .model_registry import ModelRegistry, activate_version, publish_version
+
+        store = tempfile.TemporaryDirectory()
+        sources = tempfile.TemporaryDirectory()
+        self.addCleanup(store.cleanup)
+        self.addCleanup(sources.cleanup)
+        publish_version(_write_model_dir(os.path.join(sources.name, 'v1')), 'v1', store.name)
+        registry = ModelRegistry(store_dir=store.name, check_interval=0)
+        swaps = []
+        registry.on_swap(lambda old, new: swaps.append((old.version if old else None, new.version)))
+
+        self.assertEqual(registry.get().version, 'v1')
+        publish_version(_write_model_dir(os.path.join(sources.name, 'v2'), seed=1), 'v2', store.name)
+        self._wait_for_version(registry, 'v2')
+        # Rolling back is activating the old version again
+        activate_version('v1', store.name)
+        self._wait_for_version(registry, 'v1')
+
+        self.assertEqual(swaps, [(None, 'v1'), ('v1', 'v2'), ('v2', 'v1')])
+        self.assertEqual(registry.versions(), ['v1', 'v2'])
+        with self.assertRaises(FileExistsError):
+            publish_version(os.path.join(sources.name, 'v2'), 'v2', store.name)
+
+
+class PredictionCacheTests(SimpleTestCase):
+    def test_entries_are_per_model_version_and_signature(self):
+        from types import SimpleNamespace
+
+        from .prediction_cache import PredictionCache
+
+        cache = PredictionCache(maxsize=10)
+        v1 = SimpleNamespace(version='v1', signature='aaa')
+        rows = np.array([[5.0] * 13, [7.0] * 13])
+        cache.set_many(cache.keys(v1, rows), [np.full(4, 0.25), np.full(4, 0.5)])
+
+        # Answers equal after quantization share an entry
+        found = cache.get_many(cache.keys(v1, rows + 0.001))
+        self.assertEqual([p.tolist() for p in found], [[0.25] * 4, [0.5] * 4])
+        for other in (SimpleNamespace(version='v2', signature='aaa'), SimpleNamespace(version='v1', signature='bbb')):
+            self.assertEqual(cache.get_many(cache.keys(other, rows)), [None, None])
+
+    def test_model_swap_clears_the_cache(self):
+        from types import SimpleNamespace
+
+        from .model_registry import registry
+        from .prediction_cache import prediction_cache
+
+        self.addCleanup(prediction_cache.clear)
+        bundle = SimpleNamespace(version='v1', signature='aaa')
+        keys = prediction_cache.keys(bundle, np.ones((1, 13)))
+        prediction_cache.set_many(keys, [np.full(4, 0.25)])
+
+        # What the registry runs after loading a (re)published version
+        for callback in registry._listeners:
+            callback(bundle, SimpleNamespace(version='v1', signature='bbb'))
+        self.assertEqual(prediction_cache.get_many(keys), [None])
+
+
+class RescoreAttemptsTests(TestCase):
+    def setUp(self):
+        import os
+
+        from django.contrib.auth.models import User
+
+        from .model_registry import ModelRegistry
+        from .models import QuizAttempt
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        _write_model_dir(os.path.join(self.directory.name, 'store', 'v1'))
+        self.registry = ModelRegistry(store_dir=os.path.join(self.directory.name, 'store'))
+        self.checkpoint = os.path.join(self.directory.name, 'checkpoint.json')
+
+        user = User.objects.create_user('student', password='pw')
+        self.ids = [
+            QuizAttempt.objects.create(user=user, quiz_type='AI_COUNSELING', feature_scores={'O_score': score}).id
+            for score in range(1, 6)
+        ]
+
+    def _rescore(self, **options):
+        from io import StringIO
+        from unittest import mock
+
+        from django.core.management import call_command
+
+        with mock.patch('NovaX_webpage.management.commands.rescore_attempts.registry', self.registry):
+            call_command('rescore_attempts', checkpoint=self.checkpoint, chunk_size=2, stdout=StringIO(), **options)
+
+    def _rescored(self):
+        from .models import QuizAttempt
+
+        return [bool(QuizAttempt.objects.get(id=i).predictions) for i in self.ids]
+
+    def test_resumes_after_the_checkpoint(self):
+        import json
+
+        with open(self.checkpoint, 'w') as f:
+            json.dump({'model_version': 'v1', 'quiz_type': 'AI_COUNSELING', 'last_id': self.ids[2]}, f)
+        self._rescore()
+        self.assertEqual(self._rescored(), [False, False, False, True, True])
+        with open(self.checkpoint) as f:
+            self.assertEqual(json.load(f)['last_id'], self.ids[-1])
+
+        # A checkpoint of another model version is not resumed from
+        with open(self.checkpoint, 'w') as f:
+            json.dump({'model_version': 'v0', 'quiz_type': 'AI_COUNSELING', 'last_id': self.ids[-1]}, f)
+        self._rescore()
+        self.assertEqual(self._rescored(), [True] * 5)
+
+    def test_restart_ignores_the_checkpoint(self):
+        import json
+
+        with open(self.checkpoint, 'w') as f:
+            json.dump({'model_version': 'v1', 'quiz_type': 'AI_COUNSELING', 'last_id': self.ids[-1]}, f)
+        self._rescore()
+        self.assertEqual(self._rescored(), [False] * 5)
+        self._rescore(restart=True)
+        self.assertEqual(self._rescored(), [True] * 5)
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def _breaker(self, **options):
+        from .circuit_breaker import CircuitBreaker
+
+        options = {'min_calls': 4, 'failure_rate': 0.5, 'slow_call_ms': 100, 'open_seconds': 0.1, **options}
+        return CircuitBreaker('test', **options)
+
+    def test_opens_on_failure_rate_and_recovers_through_a_probe(self):
+        from .circuit_breaker import CLOSED, HALF_OPEN, OPEN
+
+        breaker = self._breaker()
+        for _ in range(2):
+            breaker.record_success(10)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CLOSED)
+        # A success slower than slow_call_ms counts as a failure: 2 of 4 calls failed
+        breaker.record_success(500)
+        self.assertEqual(breaker.state, OPEN)
+        self.assertFalse(breaker.allow())
+
+        time.sleep(0.15)
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.state, HALF_OPEN)
+        self.assertFalse(breaker.allow())  # one probe at a time
+        breaker.record_success(10)
+        self.assertEqual(breaker.state, CLOSED)
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.stats()['rejected'], 2)
+
+    def test_failed_probe_opens_it_again(self):
+        from .circuit_breaker import OPEN
+
+        breaker = self._breaker(min_calls=1)
+        breaker.record_failure()
+        time.sleep(0.15)
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, OPEN)
+        self.assertFalse(breaker.allow())
+        self.assertEqual(breaker.stats()['times_opened'], 2)
+
+
+class ReplyCacheTests(SimpleTestCase):
+    def test_prompt_fingerprint_ignores_formatting(self):
+        from .reply_cache import ReplyCache
+
+        cache = ReplyCache()
+        key = cache.key('gemini-pro', ' Seven ', 'O_score', {'C_score': '7', 'E_score': 3})
+        self.assertEqual(key, cache.key('gemini-pro', 'seven', 'O_score', {'E_score': 3.0, 'C_score': 7}))
+        self.assertNotEqual(key, cache.key('gemini-pro', 'seven', 'O_score', {'E_score': 4, 'C_score': 7}))
+        self.assertNotEqual(key, cache.key('gemini-flash', 'seven', 'O_score', {'E_score': 3, 'C_score': 7}))
+
+    def test_variants_are_collected_then_served_in_rotation(self):
+        from .reply_cache import ReplyCache
+
+        cache = ReplyCache(variants=2)
+        self.assertIsNone(cache.get('key'))
+        cache.add('key', {'message': 'a'})
+        self.assertIsNone(cache.get('key'))
+        cache.add('key', {'message': 'b'})
+        self.assertEqual([cache.get('key')['message'] for _ in range(3)], ['a', 'b', 'a'])
+        self.assertEqual(cache.stats()['hits'], 3)
+
+    def test_expired_and_evicted_entries_miss(self):
+        from .reply_cache import ReplyCache
+
+        cache = ReplyCache(maxsize=2, ttl=0.05, variants=1)
+        for key in ('a', 'b', 'c'):
+            cache.add(key, {'message': key})
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get('c'), {'message': 'c'})
+        time.sleep(0.06)
+        self.assertIsNone(cache.get('c'))
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_workers_share_variants_through_the_django_cache(self):
+        import asyncio
+
+        from django.core.cache import cache as django_cache
+
+        from .reply_cache import ReplyCache
+
+        self.addCleanup(django_cache.clear)
+        first, second = ReplyCache(variants=2, shared=True), ReplyCache(variants=2, shared=True)
+        first.add('key', {'message': 'a'})
+        asyncio.run(first.aadd('key', {'message': 'b'}))
+        self.assertEqual(asyncio.run(second.aget('key')), {'message': 'a'})
+        self.assertEqual(second.get('key'), {'message': 'b'})
+        self.assertEqual(second.stats()['shared_hits'], 1)
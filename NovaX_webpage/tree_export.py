@@ -0,0 +1,378 @@
+"""
+Flattened NumPy evaluator for the tree-based career ensemble.
+
+``export_ensemble`` turns every tree of every ensemble member (sklearn
+forests / decision trees / gradient boosting, xgboost boosters) into one
+set of flat node arrays and folds the scaler into the evaluator.
+``FlatEnsemble.predict_proba`` then walks all trees for all rows at once
+with a handful of vectorised NumPy gathers per tree level, and takes the
+same *unscaled* 13-feature matrix the views build.
+"""
+import json
+import logging
+import os
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Sub-directory of the model directory holding the exported arrays
+FLAT_ENSEMBLE_DIR = "flat_ensemble"
+FLAT_META_FILE = "flat_ensemble.json"
+FLAT_ARRAYS = ("feature", "threshold", "children", "value", "roots", "scale_a", "scale_b")
+
+# Rows x trees x classes kept in memory at once while aggregating leaves
+_CHUNK_ELEMENTS = 4_000_000
+
+
+def _scaler_arrays(scaler, n_features):
+    """Return (op, a, b) reproducing scaler.transform inside the evaluator"""
+    if scaler is None:
+        return 'none', np.zeros(n_features), np.ones(n_features)
+
+    if hasattr(scaler, 'min_') and hasattr(scaler, 'scale_'):
+        # MinMaxScaler: x * scale_ + min_
+        return 'minmax', np.asarray(scaler.scale_, dtype=np.float64), np.asarray(scaler.min_, dtype=np.float64)
+    if hasattr(scaler, 'scale_') or hasattr(scaler, 'mean_'):
+        # StandardScaler: (x - mean_) / scale_
+        mean = getattr(scaler, 'mean_', None)
+        scale = getattr(scaler, 'scale_', None)
+        mean = np.zeros(n_features) if mean is None else np.asarray(mean, dtype=np.float64)
+        scale = np.ones(n_features) if scale is None else np.asarray(scale, dtype=np.float64)
+        return 'standard', mean, scale
+    raise ValueError(f"Cannot fold scaler of type {type(scaler).__name__} into the evaluator")
+
+
+class _TreeBuilder:
+    """Accumulates trees into the shared flat node arrays"""
+
+    def __init__(self, n_classes):
+        self.n_classes = n_classes
+        self.feature, self.threshold, self.left, self.right, self.value = [], [], [], [], []
+        self.roots = []
+        self.depth = 0
+        self.size = 0
+
+    def add(self, feature, threshold, left, right, value, depth):
+        """Add one tree given local node arrays (leaves have left == -1)"""
+        n = len(feature)
+        offset = self.size
+        leaf = left < 0
+        local = np.arange(n)
+        self.feature.append(np.where(leaf, 0, feature).astype(np.int32))
+        self.threshold.append(np.where(leaf, 0.0, threshold).astype(np.float64))
+        # Leaves point at themselves so the level loop can run a fixed number of steps
+        self.left.append((np.where(leaf, local, left) + offset).astype(np.int32))
+        self.right.append((np.where(leaf, local, right) + offset).astype(np.int32))
+        self.value.append(value.astype(np.float64))
+        self.roots.append(offset)
+        self.depth = max(self.depth, depth)
+        self.size += n
+
+    def add_sklearn_tree(self, tree, leaf_values):
+        self.add(tree.feature, tree.threshold, tree.children_left, tree.children_right,
+                 leaf_values, int(tree.max_depth))
+
+    def add_xgb_tree(self, dump, feature_index, column, scale=1.0):
+        """Add one xgboost tree from its JSON dump; leaf values go to ``column``"""
+        nodes = []
+        stack = [(dump, 0)]
+        ids = {}
+        while stack:
+            node, depth = stack.pop()
+            ids[node['nodeid']] = len(nodes)
+            nodes.append((node, depth))
+            for child in node.get('children', ()):
+                stack.append((child, depth + 1))
+
+        n = len(nodes)
+        feature = np.zeros(n, dtype=np.int64)
+        threshold = np.zeros(n)
+        left = np.full(n, -1, dtype=np.int64)
+        right = np.full(n, -1, dtype=np.int64)
+        value = np.zeros((n, self.n_classes))
+        for i, (node, _) in enumerate(nodes):
+            if 'leaf' in node:
+                value[i, column] = node['leaf'] * scale
+                continue
+            feature[i] = feature_index(node['split'])
+            # xgboost sends x < c left (in float32); turn it into the x <= t form used everywhere else
+            condition = np.float32(node['split_condition'])
+            threshold[i] = np.nextafter(condition, np.float32(-np.inf))
+            left[i] = ids[node['yes']]
+            right[i] = ids[node['no']]
+        self.add(feature, threshold, left, right, value, max(d for _, d in nodes))
+
+    def arrays(self):
+        return {
+            'feature': np.concatenate(self.feature),
+            'threshold': np.concatenate(self.threshold),
+            # children[2 * node] is the left child, children[2 * node + 1] the right one
+            'children': np.column_stack([np.concatenate(self.left), np.concatenate(self.right)]).ravel(),
+            'value': np.vstack(self.value),
+            'roots': np.asarray(self.roots, dtype=np.int32),
+        }
+
+
+def _export_forest(builder, model, n_classes):
+    trees = [model] if hasattr(model, 'tree_') else list(model.estimators_)
+    for estimator in trees:
+        tree = estimator.tree_
+        value = tree.value[:, 0, :]
+        totals = value.sum(axis=1, keepdims=True)
+        probas = np.divide(value, totals, out=np.zeros_like(value), where=totals > 0)
+        # Forest output is the mean of tree probabilities; fold the 1/n in here
+        builder.add_sklearn_tree(tree, probas / len(trees))
+    return {'link': 'identity', 'n_trees': len(trees)}
+
+
+def _export_gradient_boosting(builder, model, n_classes):
+    estimators = model.estimators_
+    binary = estimators.shape[1] == 1
+    for stage in estimators:
+        for k, estimator in enumerate(stage):
+            tree = estimator.tree_
+            value = np.zeros((tree.node_count, n_classes))
+            value[:, 1 if binary else k] = tree.value[:, 0, 0] * model.learning_rate
+            builder.add_sklearn_tree(tree, value)
+    return {
+        'link': 'sigmoid' if binary else 'softmax',
+        'n_trees': estimators.size,
+        'margin': lambda X: model.decision_function(X),
+    }
+
+
+def _export_xgboost(builder, model, n_classes):
+    booster = model.get_booster()
+    names = booster.feature_names
+
+    def feature_index(split):
+        if names:
+            return names.index(split)
+        return int(split.lstrip('f'))
+
+    try:
+        config = json.loads(booster.save_config())
+        parallel = int(config['learner']['gradient_booster']['gbtree_model_param']['num_parallel_tree'])
+    except (KeyError, TypeError, ValueError):
+        parallel = 1
+
+    binary = n_classes == 2
+    groups = 1 if binary else n_classes
+    dumps = booster.get_dump(dump_format='json')
+    best = getattr(model, 'best_iteration', None) if hasattr(model, 'best_iteration') else None
+    if best is not None:
+        dumps = dumps[:(best + 1) * groups * parallel]
+
+    for t, dump in enumerate(dumps):
+        column = 1 if binary else (t // parallel) % groups
+        builder.add_xgb_tree(json.loads(dump), feature_index, column)
+    return {
+        'link': 'sigmoid' if binary else 'softmax',
+        'n_trees': len(dumps),
+        'margin': lambda X: model.predict(X, output_margin=True),
+    }
+
+
+def _member_exporter(model):
+    if hasattr(model, 'get_booster'):
+        return 'xgboost', _export_xgboost
+    if hasattr(model, 'tree_'):
+        return 'tree', _export_forest
+    estimators = getattr(model, 'estimators_', None)
+    if estimators is not None and hasattr(model, 'learning_rate') and hasattr(estimators, 'shape'):
+        return 'gradient_boosting', _export_gradient_boosting
+    if estimators is not None and len(estimators) and hasattr(estimators[0], 'tree_'):
+        return 'forest', _export_forest
+    raise ValueError(f"Ensemble member {type(model).__name__} is not a supported tree model")
+
+
+class FlatEnsemble:
+    """Vectorised evaluator over flat tree node arrays"""
+
+    def __init__(self, arrays, meta):
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.children = arrays['children']
+        self.value = arrays['value']
+        self.roots = arrays['roots']
+        self.scale_a = arrays['scale_a']
+        self.scale_b = arrays['scale_b']
+        # Class names shipped alongside the trees (None until saved with them)
+        self.classes = arrays.get('classes')
+        self.meta = meta
+        self.scaler = meta.get('scaler', 'none')
+        self.members = meta['members']
+        self.depth = int(meta['depth'])
+        self.n_classes = int(meta['n_classes'])
+        self.n_features = int(meta['n_features'])
+        self._bias = [np.asarray(m['bias'], dtype=np.float64) for m in self.members]
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def arrays(self):
+        return {name: getattr(self, name) for name in FLAT_ARRAYS}
+
+    def _scale(self, X):
+        """Apply the folded scaler, rounded to float32 like the tree models do"""
+        if self.scaler == 'standard':
+            X = (X - self.scale_a) / self.scale_b
+        elif self.scaler == 'minmax':
+            X = X * self.scale_a + self.scale_b
+        return X.astype(np.float32).astype(np.float64)
+
+    def _leaves(self, X):
+        """Leaf node index of every (row, tree) pair"""
+        values = X.ravel()
+        offsets = (np.arange(len(X)) * X.shape[1])[:, None]
+        node = np.broadcast_to(self.roots, (len(X), len(self.roots)))
+        for _ in range(self.depth):
+            go_right = values.take(offsets + self.feature.take(node)) > self.threshold.take(node)
+            node = self.children.take(node * 2 + go_right)
+        return node
+
+    def raw_scores(self, X):
+        """Per-member summed leaf values (before the link function)"""
+        X = np.ascontiguousarray(X, dtype=np.float64).reshape(-1, self.n_features)
+        scores = [np.empty((len(X), self.n_classes)) for _ in self.members]
+        step = max(1, _CHUNK_ELEMENTS // max(1, self.n_trees * self.n_classes))
+        for start in range(0, len(X), step):
+            leaves = self._leaves(self._scale(X[start:start + step]))
+            for i, member in enumerate(self.members):
+                first, last = member['trees']
+                block = self.value[leaves[:, first:last]]
+                scores[i][start:start + step] = block.sum(axis=1) + self._bias[i]
+        return scores
+
+    def predict_proba(self, X):
+        """Average class probabilities of all members for unscaled inputs"""
+        probas = []
+        for member, raw in zip(self.members, self.raw_scores(X)):
+            link = member['link']
+            if link == 'softmax':
+                raw = np.exp(raw - raw.max(axis=1, keepdims=True))
+                probas.append(raw / raw.sum(axis=1, keepdims=True))
+            elif link == 'sigmoid':
+                p = 1.0 / (1.0 + np.exp(-raw[:, 1]))
+                probas.append(np.column_stack([1.0 - p, p]))
+            else:
+                probas.append(raw)
+        return np.mean(probas, axis=0)
+
+    def save(self, directory, classes=None, **extra_meta):
+        """Write every array as its own .npy file so it can be memory-mapped"""
+        os.makedirs(directory, exist_ok=True)
+        if classes is not None:
+            # A copy: ``classes`` may be the memory-mapped classes.npy that is about to be replaced
+            classes = np.array(classes)
+            if classes.dtype == object:
+                # Fixed-width strings can be mmapped, Python objects can't
+                classes = classes.astype(str)
+        for name, array in self.arrays().items():
+            _replace_file(os.path.join(directory, f"{name}.npy"), lambda f: np.save(f, np.ascontiguousarray(array)))
+        if classes is not None:
+            _replace_file(os.path.join(directory, "classes.npy"), lambda f: np.save(f, classes))
+            self.classes = classes
+        meta = dict(self.meta, **extra_meta)
+        _replace_file(os.path.join(directory, FLAT_META_FILE), lambda f: f.write(json.dumps(meta, indent=2).encode()))
+        self.meta = meta
+
+    @classmethod
+    def load(cls, directory, mmap_mode=None):
+        """Load saved arrays; with ``mmap_mode='r'`` they stay in the shared page cache"""
+        with open(os.path.join(directory, FLAT_META_FILE)) as f:
+            meta = json.load(f)
+        names = list(FLAT_ARRAYS)
+        if os.path.exists(os.path.join(directory, "classes.npy")):
+            names.append("classes")
+        arrays = {
+            # np.asarray drops the np.memmap subclass but keeps the mapping (no copy)
+            name: np.asarray(np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode))
+            for name in names
+        }
+        return cls(arrays, meta)
+
+
+def _replace_file(path, write):
+    """Write ``path`` through a temp file and swap it in.
+
+    Workers may have the old file memory-mapped: it must never be truncated
+    or rewritten in place, only replaced (the old inode stays valid for them).
+    """
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, 'wb') as f:
+            write(f)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def export_ensemble(models, scaler=None, n_classes=None, n_features=None):
+    """Flatten a list of tree-based classifiers (and the scaler) into a FlatEnsemble"""
+    if not models:
+        raise ValueError("No ensemble members to export")
+    n_classes = n_classes or len(models[0].classes_)
+    n_features = n_features or int(getattr(scaler, 'n_features_in_', None) or models[0].n_features_in_)
+    op, a, b = _scaler_arrays(scaler, n_features)
+
+    builder = _TreeBuilder(n_classes)
+    members = []
+    margins = []
+    for model in models:
+        kind, exporter = _member_exporter(model)
+        first = len(builder.roots)
+        member = exporter(builder, model, n_classes)
+        margins.append(member.pop('margin', None))
+        member.update(kind=kind, trees=[first, len(builder.roots)], bias=[0.0] * n_classes)
+        members.append(member)
+
+    arrays = builder.arrays()
+    arrays['scale_a'] = a
+    arrays['scale_b'] = b
+
+    meta = {
+        'scaler': op,
+        'n_classes': n_classes,
+        'n_features': n_features,
+        'depth': builder.depth,
+        'members': members,
+    }
+    flat = FlatEnsemble(arrays, meta)
+
+    # Boosting models add a constant initial score; recover it from one reference row
+    reference = np.full((1, n_features), 5.0)
+    scaled = scaler.transform(reference) if scaler is not None else reference
+    for i, (member, margin) in enumerate(zip(members, margins)):
+        if margin is None:
+            continue
+        target = np.asarray(margin(scaled), dtype=np.float64).reshape(1, -1)
+        summed = flat.raw_scores(reference)[i]
+        bias = np.zeros(n_classes)
+        if member['link'] == 'sigmoid':
+            bias[1] = target[0, -1] - summed[0, 1]
+        else:
+            bias = target[0] - summed[0]
+        member['bias'] = bias.tolist()
+    return FlatEnsemble(arrays, meta)
+
+
+def max_abs_error(flat, models, scaler, X):
+    """Largest difference between the flat evaluator and the live ensemble on X"""
+    scaled = scaler.transform(X) if scaler is not None else X
+    expected = np.mean([model.predict_proba(scaled) for model in models], axis=0)
+    return float(np.abs(flat.predict_proba(X) - expected).max())
+
+
+def load_flat_ensemble(directory, signature=None, mmap_mode='r'):
+    """Open an exported ensemble built for the current models, or return None"""
+    if not os.path.exists(os.path.join(directory, FLAT_META_FILE)):
+        return None
+    flat = FlatEnsemble.load(directory, mmap_mode=mmap_mode)
+    if signature is not None and flat.meta.get('model_signature') != signature:
+        logger.warning("Flat ensemble was exported from different model files; ignoring it.")
+        return None
+    return flat
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 from django.contrib.auth import views as auth_views 
@@ -51,9 +52,16 @@ urlpatterns = [
     path('api/college/<int:college_id>/last-updated/', views.college_last_updated, name='college_last_updated'),
     # AI Counseling URLs
     path('predict-career/', views.predict_career, name='predict_career'),
+    path('predict-career/batch/', views.predict_career_batch, name='predict_career_batch'),
+    path('predict-career/what-if/', views.predict_career_what_if, name='predict_career_what_if'),
+    path('predict-career/explain/', views.predict_career_explain, name='predict_career_explain'),
+    path('predict-career/similar/', views.similar_students_view, name='similar_students'),
+    path('predict-career/diagnostics/', views.prediction_diagnostics, name='prediction_diagnostics'),
+    path('predict-career/ready/', views.prediction_ready, name='prediction_ready'),
+    path('predict/<str:quiz_type>/', views.predict_quiz, name='predict_quiz'),
     path('career-counseling/', views.career_counseling, name='career_counseling'),
-    path('start-counseling/', views.start_counseling, name='start_counseling'),
-    path('process-answer/', views.process_counseling_answer, name='process_answer'),
+    path('start-counseling/', views.start_counseling_async if settings.COUNSELOR_ASYNC_VIEWS else views.start_counseling, name='start_counseling'),
+    path('process-answer/', views.process_counseling_answer_async if settings.COUNSELOR_ASYNC_VIEWS else views.process_counseling_answer, name='process_answer'),
     path('download-report/', views.download_career_report, name='download_report'),
     path('conversation-history/', views.get_conversation_history, name='conversation_history'),
 
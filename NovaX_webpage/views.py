@@ -1,9 +1,12 @@
 # views.py
 
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import JsonResponse
+from django.http import HttpResponseNotAllowed, JsonResponse
 from django.views.decorators.http import require_POST
 import json
+import math
+
+from asgiref.sync import sync_to_async
 
 from django.contrib import messages
 from django.contrib.auth import authenticate, login, update_session_auth_hash
@@ -38,7 +41,17 @@ from django.utils.crypto import get_random_string
 from .send_email import send_email
 from django.conf import settings
 from .ai_counselor import counselor
-import pickle
+from .model_registry import registry
+from . import inference_threads
+from .explanations import explain_prediction, explanation_cache
+from .inference_pool import inference_pool
+from .prediction_cache import prediction_cache
+from .prediction_table import top_k_classes
+from .drift import drift_sketch
+from .predictors import get_predictor, parse_top_k, predict_careers_batch, predictors
+from .shadow import shadow_evaluator
+from .similar_students import similar_students
+from .warmup import is_warm, warm_up_in_background, warmup_status
 import numpy as np
 import google.generativeai as genai
 import os
@@ -147,9 +160,22 @@ def download_career_report(request):
                 'Attention_to_Detail': 'Precision Focus'
             }
             
+            # Answers that push each career up the most (cached from the results page)
+            try:
+                explanations = {
+                    item['career']: item['contributions']
+                    for item in explain_prediction(counseling_data, careers=[p['career'] for p in predictions[:3]])
+                }
+            except Exception as e:
+                print(f"Explanation error: {e}")
+                explanations = {}
+
             for i, pred in enumerate(predictions[:3], 1):
                 # Determine top 3 strengths for this career
-                strengths = get_strengths_for_career(counseling_data)
+                strengths = [
+                    strength_mapping.get(c['feature'], c['feature'])
+                    for c in explanations.get(pred['career'], []) if c['contribution'] > 0
+                ] or get_strengths_for_career(counseling_data)
                 strength_text = ", ".join(strengths[:3])
                 
                 prediction_data.append([
@@ -388,119 +414,197 @@ def get_environment_preference(counseling_data):
 def start_counseling(request):
     """Start a new counseling session"""
     try:
-        initial_data = counselor.get_initial_greeting()
-        
-        # Initialize session
-        request.session['counseling_data'] = {}
-        request.session['conversation_history'] = []
-        request.session['current_field'] = initial_data['field']
-        request.session['conversation_step'] = initial_data['conversation_step']
-        
-        # Log first message
-        request.session['conversation_history'].append({
-            'type': 'bot',
-            'message': initial_data['message']
-        })
-        request.session['conversation_history'].append({
-            'type': 'bot',
-            'message': initial_data['next_question']
-        })
-        
-        return JsonResponse({
-            'success': True,
-            'message': initial_data['message'],
-            'next_question': initial_data['next_question'],
-            'field': initial_data['field'],
-            'conversation_step': initial_data['conversation_step']
-        })
+        return JsonResponse(_start_counseling_session(request.session))
         
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=400)
+
+
+def _start_counseling_session(session):
+    initial_data = counselor.get_initial_greeting()
+    
+    # Initialize session
+    session['counseling_data'] = {}
+    session['conversation_history'] = []
+    session['current_field'] = initial_data['field']
+    session['conversation_step'] = initial_data['conversation_step']
+    
+    # Log first message
+    session['conversation_history'].append({
+        'type': 'bot',
+        'message': initial_data['message']
+    })
+    session['conversation_history'].append({
+        'type': 'bot',
+        'message': initial_data['next_question']
+    })
+    
+    return {
+        'success': True,
+        'message': initial_data['message'],
+        'next_question': initial_data['next_question'],
+        'field': initial_data['field'],
+        'conversation_step': initial_data['conversation_step']
+    }
+
+
 @csrf_exempt
 @require_POST
 def process_counseling_answer(request):
     """Process user's answer during counseling session"""
     try:
         data = json.loads(request.body.decode('utf-8'))
-        user_answer = data.get('answer')
-        current_field = request.session.get('current_field')
-        counseling_data = request.session.get('counseling_data', {})
-        conversation_step = request.session.get('conversation_step', 'personality')
-        
-        # Log user message
-        conversation_history = request.session.get('conversation_history', [])
-        
-        # Only log if it's not a simple edit command we're handling
-        if not (user_answer.lower() in ['edit', 'change', 'back'] and conversation_step != 'editing'):
-            conversation_history.append({
-                'type': 'user',
-                'message': user_answer
-            })
+        turn = _read_counseling_turn(request.session, data)
         
         # Get next question from counselor
         counselor_response = counselor.process_answer(
-            user_answer, current_field, conversation_step, counseling_data
+            turn['user_answer'], turn['current_field'], turn['conversation_step'], turn['counseling_data']
         )
         
-        # Update session data
-        request.session['counseling_data'] = counseling_data
-        request.session['current_field'] = counselor_response.get('field')
-        request.session['conversation_step'] = counselor_response.get('conversation_step')
-        
-        # Log bot responses
-        if counselor_response.get('message'):
-            conversation_history.append({
-                'type': 'bot', 
-                'message': counselor_response['message']
-            })
-        if counselor_response.get('next_question'):
-            conversation_history.append({
-                'type': 'bot',
-                'message': counselor_response['next_question']
-            })
-        
-        request.session['conversation_history'] = conversation_history
-        request.session.modified = True
-        
-        response_data = {
-            'success': True,
-            'message': counselor_response.get('message', ''),
-            'next_question': counselor_response.get('next_question'),
-            'field': counselor_response.get('field'),
-            'conversation_step': counselor_response.get('conversation_step'),
-            'completed': counselor_response.get('completed', False),
-            'show_edit_option': counselor_response.get('show_edit_option', True),
-            'collected_data': counseling_data
-        }
-        
-        # Add edit options if in edit mode
-        if counselor_response.get('edit_options'):
-            response_data['edit_options'] = counselor_response['edit_options']
+        return JsonResponse(_finish_counseling_turn(request, data, turn, counselor_response))
         
-        # If counseling is completed, make prediction
-    #     if counselor_response.get('completed'):
-    #         predictions = generate_career_predictions(counseling_data)
-    #         response_data['predictions'] = predictions
-            
-    #         # Save the session data
-    #         save_counseling_session(request, counseling_data, predictions)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+
+def _read_counseling_turn(session, data):
+    """Session state for one answer, with the answer logged to the history"""
+    user_answer = data.get('answer')
+    conversation_step = session.get('conversation_step', 'personality')
+    
+    # Log user message
+    conversation_history = session.get('conversation_history', [])
+    
+    # Only log if it's not a simple edit command we're handling
+    if not (user_answer.lower() in ['edit', 'change', 'back'] and conversation_step != 'editing'):
+        conversation_history.append({
+            'type': 'user',
+            'message': user_answer
+        })
+    
+    return {
+        'user_answer': user_answer,
+        'current_field': session.get('current_field'),
+        'counseling_data': session.get('counseling_data', {}),
+        'conversation_step': conversation_step,
+        'conversation_history': conversation_history,
+    }
+
+
+def _finish_counseling_turn(request, data, turn, counselor_response):
+    """Store the counselor's reply in the session and build the JSON response"""
+    counseling_data = turn['counseling_data']
+    conversation_history = turn['conversation_history']
+    
+    # Update session data
+    request.session['counseling_data'] = counseling_data
+    request.session['current_field'] = counselor_response.get('field')
+    request.session['conversation_step'] = counselor_response.get('conversation_step')
+    
+    # Log bot responses
+    if counselor_response.get('message'):
+        conversation_history.append({
+            'type': 'bot', 
+            'message': counselor_response['message']
+        })
+    if counselor_response.get('next_question'):
+        conversation_history.append({
+            'type': 'bot',
+            'message': counselor_response['next_question']
+        })
+    
+    request.session['conversation_history'] = conversation_history
+    request.session.modified = True
+    
+    response_data = {
+        'success': True,
+        'message': counselor_response.get('message', ''),
+        'next_question': counselor_response.get('next_question'),
+        'field': counselor_response.get('field'),
+        'conversation_step': counselor_response.get('conversation_step'),
+        'completed': counselor_response.get('completed', False),
+        'show_edit_option': counselor_response.get('show_edit_option', True),
+        'collected_data': counseling_data
+    }
+    
+    # Add edit options if in edit mode
+    if counselor_response.get('edit_options'):
+        response_data['edit_options'] = counselor_response['edit_options']
+
+    # Top careers so far, updated after every answer
+    if not counselor_response.get('completed') and getattr(settings, 'CAREER_LIVE_PREDICTIONS', True):
+        try:
+            response_data['live_predictions'] = live_career_predictions(
+                request.session, counseling_data, top_k=data.get('top_k', 3)
+            )
+        except Exception as e:
+            print(f"Live prediction error: {e}")
+    
+    # If counseling is completed, make prediction
+    if counselor_response.get('completed'):
+        bundle = registry.get()
+        predictions = generate_career_predictions(counseling_data, bundle=bundle)
+        response_data['predictions'] = predictions
+        response_data['model_version'] = bundle.version if bundle else None
+        if predictions:
+            try:
+                response_data['explanations'] = explain_prediction(
+                    counseling_data, careers=[p['career'] for p in predictions], bundle=bundle
+                )
+            except Exception as e:
+                print(f"Explanation error: {e}")
+            try:
+                response_data['similar_students'] = similar_students.query(
+                    counseling_data, exclude_user=request.user.id
+                )
+            except Exception as e:
+                print(f"Similar students error: {e}")
         
-    #     return JsonResponse(response_data)
+        # Save the session data
+        save_counseling_session(request, counseling_data, predictions)
+    
+    return response_data
+
+
+# ====================================================
+# Async counseling views (served when running under ASGI)
+# ====================================================
+# The Gemini call and its rate-limit backoff are awaited, so a slow or
+# throttled reply no longer holds a worker thread. Session and database work
+# reuses the sync helpers above through sync_to_async.
+
+async def start_counseling_async(request):
+    """Start a new counseling session (async)"""
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    try:
+        return JsonResponse(await sync_to_async(_start_counseling_session)(request.session))
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+
+async def process_counseling_answer_async(request):
+    """Process user's answer during counseling session (async)"""
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    try:
+        data = json.loads(request.body.decode('utf-8'))
+        turn = await sync_to_async(_read_counseling_turn)(request.session, data)
         
-    # except Exception as e:
-    #     return JsonResponse({'error': str(e)}, status=400)
-        if counselor_response.get('completed'):
-            predictions = generate_career_predictions(counseling_data)
-            response_data['predictions'] = predictions
-            
-            # Save the session data
-            save_counseling_session(request, counseling_data, predictions)
+        counselor_response = await counselor.process_answer_async(
+            turn['user_answer'], turn['current_field'], turn['conversation_step'], turn['counseling_data']
+        )
         
-        return JsonResponse(response_data)
+        return JsonResponse(await sync_to_async(_finish_counseling_turn)(request, data, turn, counselor_response))
         
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=400)
 
+
+# csrf_exempt does not wrap coroutines in this Django version; set its marker directly
+start_counseling_async.csrf_exempt = True
+process_counseling_answer_async.csrf_exempt = True
+
 # def generate_career_predictions(counseling_data):
 #     """Generate career predictions from collected data"""
 #     if not ENSEMBLE_MODELS:
@@ -543,70 +647,50 @@ def process_counseling_answer(request):
 #         print(f"Prediction error: {e}")
 #         return None
 
-def generate_career_predictions(counseling_data):
+def generate_career_predictions(counseling_data, bundle=None):
     """Generate career predictions from collected data"""
-    if not ENSEMBLE_MODELS:
+    bundle = bundle or registry.get()
+    if not bundle:
         return None
     
     try:
-        # Use the EXACT features your model was trained on
-        features = [
-            "O_score", "C_score", "E_score", "A_score", "N_score",
-            "Numerical Aptitude", "Spatial Aptitude", "Perceptual Aptitude", 
-            "Abstract Reasoning", "Verbal Reasoning",
-            "Enjoy_Teamwork", "Creative_Thinking", "Attention_to_Detail"
-        ]
-        
-        # Map from collected data to expected features
-        feature_mapping = {
-            "Numerical Aptitude": "Numerical_Aptitude",
-            "Spatial Aptitude": "Spatial_Aptitude", 
-            "Perceptual Aptitude": None,  # Not currently collected
-            "Abstract Reasoning": "Abstract_Reasoning",
-            "Verbal Reasoning": "Verbal_Aptitude",
-            # Other features have the same names
-        }
-        
-        # Ensure all features are present
-        input_data = []
-        for feat in features:
-            if feat in feature_mapping and feature_mapping[feat]:
-                # Use mapped feature name
-                mapped_feat = feature_mapping[feat]
-                input_data.append(float(counseling_data.get(mapped_feat, 5)))
-            elif feat in feature_mapping and feature_mapping[feat] is None:
-                # For Perceptual Aptitude (not collected), use default
-                input_data.append(5.0)
-            else:
-                # Use direct feature name
-                input_data.append(float(counseling_data.get(feat, 5)))
-        
-        # Scale and predict
-        input_array = np.array(input_data).reshape(1, -1)
-        scaled_input = SCALER.transform(input_array)
-        
-        # Ensemble prediction
-        probas_list = [model.predict_proba(scaled_input) for model in ENSEMBLE_MODELS]
-        avg_probas = np.mean(probas_list, axis=0)
-        
-        # Get top 3 predictions
-        top3_indices = np.argsort(avg_probas[0])[::-1][:3]
-        top3_careers = LABEL_ENCODER.inverse_transform(top3_indices)
-        
-        results = []
-        for career, index in zip(top3_careers, top3_indices):
-            probability = avg_probas[0][index]
-            results.append({
-                'career': career,
-                'probability': round(probability * 100, 2)
-            })
-            
-        return results
+        return predict_careers_batch([counseling_data], bundle=bundle, source='counseling')[0]
         
     except Exception as e:
         print(f"Prediction error: {e}")
         return None
 
+def live_career_predictions(session, counseling_data, top_k=3):
+    """Top careers for a partly finished conversation, unanswered traits at the neutral default.
+
+    While only Big Five traits are answered the profile is covered by the
+    prediction table, later ones mostly by the prediction cache, so a step
+    costs a lookup or one ensemble pass. The result is kept in the session
+    and returned as is while the answers do not change (invalid answers,
+    edit commands).
+    """
+    bundle = registry.get()
+    if not bundle:
+        return None
+    collected = [key for key in bundle.schema.source_keys if key is not None]
+    answered = {key: counseling_data[key] for key in collected if key in counseling_data}
+    if not answered:
+        return None
+
+    state = json.dumps([bundle.version, str(top_k), sorted(answered.items())])
+    previous = session.get('live_predictions')
+    if previous and previous.get('state') == state:
+        return previous['result']
+
+    result = {
+        'predictions': predict_careers_batch([answered], top_k=top_k, bundle=bundle)[0],
+        'answered': len(answered),
+        'total': len(collected),
+        'model_version': bundle.version,
+    }
+    session['live_predictions'] = {'state': state, 'result': result}
+    return result
+
 # def save_counseling_session(request, counseling_data, predictions):
 #     """Save counseling session to database"""
 #     try:
@@ -634,8 +718,10 @@ def save_counseling_session(request, counseling_data, predictions):
             quiz_type='AI_COUNSELING',
             completed_at=timezone.now(),
             conversation_data=request.session.get('conversation_history', []),
-            predictions=predictions or []
+            predictions=predictions or [],
+            feature_scores=counseling_data or {}
         )
+        similar_students.mark_stale()
         
         # Save individual question responses
         conversation_history = request.session.get('conversation_history', [])
@@ -683,27 +769,9 @@ def career_counseling(request):
     return render(request, 'career_counseling.html')
 
 # =====================================================
-# Get the directory of the current views.py file
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-# Define the path to the directory containing the model files
-MODEL_DIR = os.path.join(BASE_DIR, 'ml_models2') # Assuming you created an ml_models folder
-print(MODEL_DIR)
-# Check if model files exist and load them globally for efficiency
-# This loads the models only once when Django starts
-try:
-    with open(os.path.join(MODEL_DIR, "ensemble_models_optuna.pkl"), "rb") as f:
-        ENSEMBLE_MODELS = pickle.load(f)
-    with open(os.path.join(MODEL_DIR, "label_encoder.pkl"), "rb") as f:
-        LABEL_ENCODER = pickle.load(f)
-    with open(os.path.join(MODEL_DIR, "scaler.pkl"), "rb") as f:
-        SCALER = pickle.load(f)
-    print("✅ Career Prediction Models loaded successfully!")
-except Exception as e:
-    # IMPORTANT: Handle the case where models aren't found or fail to load
-    print(f"❌ Error loading ML models: {e}. Check if the files are in {MODEL_DIR}")
-    ENSEMBLE_MODELS = None
-    LABEL_ENCODER = None
-    SCALER = None
+# Career prediction models are served by the model registry: the active
+# version is loaded lazily on first use and hot-swapped when a new one is
+# published (see model_registry.py and `manage.py publish_model`).
 
 
 # @csrf_exempt
@@ -761,69 +829,329 @@ except Exception as e:
 @csrf_exempt
 @require_POST
 def predict_career(request):
-    if not ENSEMBLE_MODELS:
+    bundle = registry.get()
+    if not bundle:
         return JsonResponse({'error': 'Prediction models are not loaded.'}, status=503)
 
     try:
         data = json.loads(request.body.decode('utf-8'))
-        
-        # Use the exact features from training
-        features = [
-            "O_score", "C_score", "E_score", "A_score", "N_score",
-            "Numerical Aptitude", "Spatial Aptitude", "Perceptual Aptitude", 
-            "Abstract Reasoning", "Verbal Reasoning",
-            "Enjoy_Teamwork", "Creative_Thinking", "Attention_to_Detail"
-        ]
-        
-        # Map collected data to expected features
-        feature_mapping = {
-            "Numerical Aptitude": "Numerical_Aptitude",
-            "Spatial Aptitude": "Spatial_Aptitude",
-            "Perceptual Aptitude": None,  # Default value
-            "Abstract Reasoning": "Abstract_Reasoning", 
-            "Verbal Reasoning": "Verbal_Aptitude"
-        }
-        
-        # Extract features in the correct order with mapping
-        input_data = []
-        for feat in features:
-            if feat in feature_mapping and feature_mapping[feat]:
-                mapped_feat = feature_mapping[feat]
-                input_data.append(float(data.get(mapped_feat, 5)))
-            elif feat in feature_mapping and feature_mapping[feat] is None:
-                input_data.append(5.0)  # Default for Perceptual Aptitude
-            else:
-                input_data.append(float(data.get(feat, 5)))
-        
-        # Rest of your prediction code remains the same...
-        input_array = np.array(input_data).reshape(1, -1)
-        scaled_input = SCALER.transform(input_array)
-        
-        # Ensemble Prediction
-        probas_list = [model.predict_proba(scaled_input) for model in ENSEMBLE_MODELS]
-        avg_probas = np.mean(probas_list, axis=0)
-        
-        # Get Top 3 Predictions
-        top3_indices = np.argsort(avg_probas[0])[::-1][:3]
-        top3_careers = LABEL_ENCODER.inverse_transform(top3_indices)
-        
-        results = []
-        for career, index in zip(top3_careers, top3_indices):
-            probability = avg_probas[0][index]
-            results.append({
-                'career': career,
-                'probability': round(probability * 100, 2)
-            })
-            
-        return JsonResponse({'predictions': results}, status=200)
+        results = predict_careers_batch(
+            [data],
+            top_k=data.get('top_k', 3),
+            min_probability=data.get('min_probability'),
+            bundle=bundle,
+            source='predict_career'
+        )[0]
+
+        return JsonResponse({'predictions': results, 'model_version': bundle.version}, status=200)
 
     except json.JSONDecodeError:
         return JsonResponse({'error': 'Invalid JSON in request body.'}, status=400)
     except KeyError as e:
         return JsonResponse({'error': f'Missing expected data field: {e}'}, status=400)
+    except (TypeError, ValueError) as e:
+        return JsonResponse({'error': f'Invalid request value: {str(e)}'}, status=400)
+    except Exception as e:
+        return JsonResponse({'error': f'An unexpected error occurred: {str(e)}'}, status=400)
+
+# ====================================================
+# 🔹 Batch Career Prediction
+# ====================================================
+
+# Upper bound on students per batch request
+MAX_BATCH_SIZE = 5000
+
+
+@csrf_exempt
+@require_POST
+def predict_career_batch(request):
+    """Score a whole cohort of students in one request"""
+    bundle = registry.get()
+    if not bundle:
+        return JsonResponse({'error': 'Prediction models are not loaded.'}, status=503)
+
+    try:
+        data = json.loads(request.body.decode('utf-8'))
+        students = data.get('students') if isinstance(data, dict) else data
+
+        if not isinstance(students, list) or not all(isinstance(s, dict) for s in students):
+            return JsonResponse({'error': "Expected a list of student feature objects in 'students'."}, status=400)
+        if len(students) > MAX_BATCH_SIZE:
+            return JsonResponse({'error': f'At most {MAX_BATCH_SIZE} students per request.'}, status=400)
+
+        options = data if isinstance(data, dict) else {}
+        results = predict_careers_batch(
+            students,
+            top_k=options.get('top_k', 3),
+            min_probability=options.get('min_probability'),
+            bundle=bundle
+        )
+        return JsonResponse({
+            'predictions': results,
+            'count': len(results),
+            'model_version': bundle.version
+        }, status=200)
+
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON in request body.'}, status=400)
+    except (TypeError, ValueError) as e:
+        return JsonResponse({'error': f'Invalid request value: {str(e)}'}, status=400)
+    except Exception as e:
+        return JsonResponse({'error': f'An unexpected error occurred: {str(e)}'}, status=400)
+
+# ====================================================
+# 🔹 Per-Quiz-Type Prediction
+# ====================================================
+
+@csrf_exempt
+@require_POST
+def predict_quiz(request, quiz_type):
+    """Score quiz answers with the predictor registered for the quiz type (see predictors.py)"""
+    try:
+        predictor = get_predictor(quiz_type.upper())
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=404)
+
+    try:
+        data = json.loads(request.body.decode('utf-8'))
+        if not isinstance(data, dict):
+            return JsonResponse({'error': "Expected an object of answers, or a list of them in 'students'."}, status=400)
+        students = data.get('students')
+        records = students if students is not None else [data.get('answers', data)]
+
+        if not isinstance(records, list) or not all(isinstance(r, dict) for r in records):
+            return JsonResponse({'error': "Expected a list of answer objects in 'students'."}, status=400)
+        if len(records) > MAX_BATCH_SIZE:
+            return JsonResponse({'error': f'At most {MAX_BATCH_SIZE} students per request.'}, status=400)
+
+        results = predictor.predict_batch(
+            records,
+            top_k=data.get('top_k', 3),
+            min_probability=data.get('min_probability')
+        )
+        model = predictor.model()
+        response = {'quiz_type': predictor.quiz_type, 'model_version': model.version if model else None}
+        if students is None:
+            response['predictions'] = results[0]
+        else:
+            response.update(predictions=results, count=len(results))
+        return JsonResponse(response, status=200)
+
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON in request body.'}, status=400)
+    except RuntimeError as e:
+        return JsonResponse({'error': str(e)}, status=503)
+    except (TypeError, ValueError) as e:
+        return JsonResponse({'error': f'Invalid request value: {str(e)}'}, status=400)
+    except Exception as e:
+        return JsonResponse({'error': f'An unexpected error occurred: {str(e)}'}, status=400)
+
+# ====================================================
+# 🔹 What-If Sweep
+# ====================================================
+
+# Upper bound on grid points (product of all swept value lists)
+MAX_WHAT_IF_POINTS = 1000
+MAX_WHAT_IF_FEATURES = 2
+
+
+def _sweep_values(spec):
+    """Values for one swept feature: an explicit list, or min/max/step (default 1-10)"""
+    # The point limit is checked before anything is allocated: a tiny step would build a huge grid
+    if spec.get('values') is not None:
+        if len(spec['values']) > MAX_WHAT_IF_POINTS:
+            raise ValueError(f'At most {MAX_WHAT_IF_POINTS} grid points per sweep.')
+        values = [float(v) for v in spec['values']]
+        if not all(math.isfinite(v) for v in values):
+            raise ValueError(f"Values for {spec.get('feature')} must be finite numbers")
+    else:
+        low = float(spec.get('min', 1))
+        high = float(spec.get('max', 10))
+        step = float(spec.get('step', 1))
+        if not all(math.isfinite(v) for v in (low, high, step)) or step <= 0 or high < low:
+            raise ValueError(f"Invalid range for {spec.get('feature')}: min={low}, max={high}, step={step}")
+        if math.floor((high - low) / step) + 1 > MAX_WHAT_IF_POINTS:
+            raise ValueError(f'At most {MAX_WHAT_IF_POINTS} grid points per sweep.')
+        values = list(np.arange(low, high + step / 2, step))
+    if not values:
+        raise ValueError(f"No values to sweep for {spec.get('feature')}")
+    return values
+
+
+def what_if_sweep(profile, sweep, careers=None, top_k=5, bundle=None):
+    """Career probability curves while one or two features of ``profile`` vary.
+
+    ``sweep`` is a list of ``{'feature', 'values' | 'min'/'max'/'step'}``.
+    The whole grid is built as one matrix and scored in a single ensemble
+    pass. Curves are returned for ``careers`` (default: the ``top_k`` careers
+    of the unchanged profile), as lists (one feature) or nested lists (two).
+    """
+    bundle = bundle or registry.get()
+    if not bundle:
+        raise RuntimeError('Prediction models are not loaded.')
+    schema = bundle.schema
+    if not sweep or len(sweep) > MAX_WHAT_IF_FEATURES:
+        raise ValueError(f'Sweep 1 to {MAX_WHAT_IF_FEATURES} features.')
+
+    columns = []
+    axes = []
+    for spec in sweep:
+        feature = spec.get('feature')
+        if feature not in schema.index:
+            raise ValueError(f'Unknown feature: {feature}')
+        columns.append(schema.index[feature])
+        axes.append(_sweep_values(spec))
+    if len(set(columns)) != len(columns):
+        raise ValueError('Each feature can only be swept once.')
+    shape = tuple(len(values) for values in axes)
+    if int(np.prod(shape)) > MAX_WHAT_IF_POINTS:
+        raise ValueError(f'At most {MAX_WHAT_IF_POINTS} grid points per sweep.')
+
+    # Base profile in row 0, followed by every grid point
+    base = schema.row(profile)
+    grid = np.stack(np.meshgrid(*axes, indexing='ij'), axis=-1).reshape(-1, len(columns))
+    matrix = np.repeat(base[None, :], len(grid) + 1, axis=0)
+    matrix[1:, columns] = grid
+
+    probas = inference_pool.predict_proba(bundle, matrix)
+
+    if careers:
+        lookup = {career: i for i, career in enumerate(bundle.classes.tolist())}
+        unknown = [career for career in careers if career not in lookup]
+        if unknown:
+            raise ValueError(f'Unknown careers: {unknown}')
+        selected = np.array([lookup[career] for career in careers], dtype=np.intp)
+    else:
+        selected = top_k_classes(probas[:1], parse_top_k(top_k, bundle.n_classes))[0][0]
+
+    curves = np.round(probas[1:, selected] * 100, 2).T.reshape((len(selected),) + shape)
+    return {
+        'features': [spec['feature'] for spec in sweep],
+        'values': [[float(v) for v in values] for values in axes],
+        'base': [
+            {'career': bundle.classes[i], 'probability': round(float(probas[0, i]) * 100, 2)}
+            for i in selected
+        ],
+        'curves': {bundle.classes[i]: curve.tolist() for i, curve in zip(selected, curves)},
+        'model_version': bundle.version,
+    }
+
+
+@csrf_exempt
+@require_POST
+def predict_career_what_if(request):
+    """Score a base profile over a grid of one or two swept features"""
+    bundle = registry.get()
+    if not bundle:
+        return JsonResponse({'error': 'Prediction models are not loaded.'}, status=503)
+
+    try:
+        data = json.loads(request.body.decode('utf-8'))
+        sweep = data.get('sweep')
+        if isinstance(sweep, dict):
+            # Short form: {"O_score": [1, 10]} or {"O_score": {"min": 1, "max": 10}}
+            sweep = [
+                {'feature': feature, **(spec if isinstance(spec, dict) else {'min': spec[0], 'max': spec[1]})}
+                for feature, spec in sweep.items()
+            ]
+        result = what_if_sweep(
+            data.get('profile', {}),
+            sweep,
+            careers=data.get('careers'),
+            top_k=data.get('top_k', 5),
+            bundle=bundle
+        )
+        return JsonResponse(result, status=200)
+
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON in request body.'}, status=400)
+    except (TypeError, ValueError, IndexError, AttributeError) as e:
+        return JsonResponse({'error': f'Invalid request value: {str(e)}'}, status=400)
     except Exception as e:
         return JsonResponse({'error': f'An unexpected error occurred: {str(e)}'}, status=400)
 
+# ====================================================
+# 🔹 Prediction Explanations
+# ====================================================
+
+@csrf_exempt
+@require_POST
+def predict_career_explain(request):
+    """Which answers push each of the top careers up or down"""
+    bundle = registry.get()
+    if not bundle:
+        return JsonResponse({'error': 'Prediction models are not loaded.'}, status=503)
+
+    try:
+        data = json.loads(request.body.decode('utf-8'))
+        explanations = explain_prediction(
+            data.get('profile', data),
+            careers=data.get('careers'),
+            top_k=parse_top_k(data.get('top_k', 3), bundle.n_classes),
+            bundle=bundle
+        )
+        return JsonResponse({'explanations': explanations, 'model_version': bundle.version}, status=200)
+
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON in request body.'}, status=400)
+    except (TypeError, ValueError) as e:
+        return JsonResponse({'error': f'Invalid request value: {str(e)}'}, status=400)
+    except Exception as e:
+        return JsonResponse({'error': f'An unexpected error occurred: {str(e)}'}, status=400)
+
+# ====================================================
+# 🔹 Similar Students
+# ====================================================
+
+@csrf_exempt
+@require_POST
+def similar_students_view(request):
+    """Careers chosen by past students with the closest answers"""
+    try:
+        data = json.loads(request.body.decode('utf-8')) if request.body else {}
+        profile = data.get('profile') or request.session.get('counseling_data', {})
+        k = max(1, min(int(data.get('k', 25)), 200))
+        result = similar_students.query(profile, k=k, exclude_user=request.user.id)
+        return JsonResponse(result, status=200)
+
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON in request body.'}, status=400)
+    except (TypeError, ValueError) as e:
+        return JsonResponse({'error': f'Invalid request value: {str(e)}'}, status=400)
+    except Exception as e:
+        return JsonResponse({'error': f'An unexpected error occurred: {str(e)}'}, status=400)
+
+# ====================================================
+# 🔹 Prediction Diagnostics
+# ====================================================
+
+def prediction_diagnostics(request):
+    """Model version, caches, inference pool and thread limits of this worker"""
+    if not (settings.DEBUG or request.user.is_staff):
+        return JsonResponse({'error': 'Not allowed.'}, status=403)
+
+    return JsonResponse({
+        'pid': os.getpid(),
+        'models': registry.status(),
+        'prediction_cache': prediction_cache.stats(),
+        'explanation_cache': explanation_cache.stats(),
+        'similar_students': similar_students.stats(),
+        'shadow': shadow_evaluator.stats(),
+        'drift': drift_sketch.stats(),
+        'counselor': counselor.status(),
+        'predictors': {quiz_type: predictor.describe() for quiz_type, predictor in predictors().items()},
+        'inference_pool': inference_pool.stats(),
+        'inference_threads': inference_threads.describe(),
+        'warmup': warmup_status(),
+    }, status=200)
+
+def prediction_ready(request):
+    """Readiness probe: 200 once this worker has loaded and warmed up the models"""
+    if not is_warm():
+        warm_up_in_background()
+        return JsonResponse({'ready': False, 'warmup': warmup_status()}, status=503)
+    return JsonResponse({'ready': True, 'warmup': warmup_status()}, status=200)
+
 # ====================================================
 # 🔹 Existing Views (Unchanged)
 # ====================================================
@@ -0,0 +1,92 @@
+"""
+Warm-up of the prediction stack in a freshly started worker.
+
+The first ``predict_proba`` of a process pays one-off costs: xgboost booster
+setup, scikit-learn validation, OpenMP thread creation and page faults on the
+(memory-mapped) model arrays. ``warm_up`` pushes synthetic batches through
+the exact path requests use, so the first student does not pay for it.
+
+It runs from the gunicorn ``post_fork`` hook (see ``gunicorn.conf.py``), from
+``AppConfig.ready`` when ``CAREER_WARMUP_ON_STARTUP`` is set, and on demand
+from the readiness endpoint.
+"""
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+from .inference_pool import inference_pool
+from .model_registry import registry
+
+logger = logging.getLogger(__name__)
+
+WARMUP_BATCH_SIZES = (1, 8, 64)
+
+_state = {}
+_lock = threading.Lock()
+
+
+def warm_up(bundle=None, batch_sizes=WARMUP_BATCH_SIZES):
+    """Score synthetic batches with the active models and record the timing"""
+    with _lock:
+        started = time.perf_counter()
+        _state.update({'pid': os.getpid(), 'warmed': False, 'running': True, 'error': None})
+        try:
+            bundle = bundle or registry.get()
+            if bundle is None:
+                raise RuntimeError(registry.last_error or 'Prediction models are not loaded.')
+
+            schema = bundle.schema
+            rng = np.random.default_rng(0)
+            timings = {}
+            for size in batch_sizes:
+                rows = rng.integers(1, 11, size=(size, schema.n_features)).astype(schema.dtype)
+                rows[0] = schema.default
+                step = time.perf_counter()
+                probas = bundle.predict_proba(rows)
+                bundle.classes[np.argmax(probas, axis=1)]
+                if bundle.table is not None:
+                    # Touch the memory-mapped table pages on the default profile
+                    hits, table_rows = bundle.table.lookup(rows[:1])
+                    np.asarray(bundle.table.indices[table_rows])
+                timings[size] = round((time.perf_counter() - step) * 1000, 2)
+            if inference_pool.enabled:
+                # Start this worker's inference processes (they warm themselves up)
+                inference_pool.predict_proba(bundle, rows[:1])
+
+            _state.update({
+                'warmed': True,
+                'version': bundle.version,
+                'batches_ms': timings,
+                'seconds': round(time.perf_counter() - started, 3),
+                'finished_at': time.time(),
+            })
+            logger.info(f"Worker {os.getpid()} warmed up models {bundle.version} in {_state['seconds']}s {timings}")
+        except Exception as e:
+            _state['error'] = str(e)
+            logger.error(f"Warm-up failed in worker {os.getpid()}: {e}")
+        finally:
+            _state['running'] = False
+        return dict(_state)
+
+
+def warm_up_in_background():
+    """Start a warm-up thread unless this process is already warm or warming"""
+    if is_warm() or (_state.get('pid') == os.getpid() and _state.get('running')):
+        return
+    _state.update({'pid': os.getpid(), 'running': True})
+    threading.Thread(target=warm_up, name='model-warmup', daemon=True).start()
+
+
+def is_warm():
+    # Forked workers inherit the master's state, but not its warmed-up threads
+    return _state.get('pid') == os.getpid() and _state.get('warmed', False)
+
+
+def warmup_status():
+    state = dict(_state) if _state.get('pid') == os.getpid() else {}
+    state['pid'] = os.getpid()
+    state['warmed'] = state.get('warmed', False)
+    return state
@@ -0,0 +1,43 @@
+# Gunicorn settings (picked up automatically from the working directory)
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', '2'))
+
+# Import Django and load the career models once in the master; forked workers
+# share those pages (and the memory-mapped flat ensemble) instead of each
+# unpickling their own copy.
+preload_app = True
+
+
+def when_ready(server):
+    from NovaX_webpage.model_registry import registry
+
+    bundle = registry.preload()
+    if bundle:
+        server.log.info(f"Career models {bundle.version} preloaded: {bundle.describe()}")
+    else:
+        server.log.warning(f"Career models not preloaded: {registry.last_error}")
+
+
+def post_fork(server, worker):
+    # Threads and lazy native state do not survive fork: warm up each worker
+    # before it accepts requests so the first prediction is not a cold start
+    from NovaX_webpage.ai_counselor import counselor
+    from NovaX_webpage.warmup import warm_up
+
+    counselor.connect_in_background()
+    state = warm_up()
+    if state.get('warmed'):
+        server.log.info(f"Worker {worker.pid} warmed up in {state['seconds']}s")
+    else:
+        server.log.warning(f"Worker {worker.pid} warm-up failed: {state.get('error')}")
+
+
+def worker_exit(server, worker):
+    # Write what this worker sampled since its last periodic flush
+    from NovaX_webpage.drift import drift_sketch
+    from NovaX_webpage.shadow import shadow_evaluator
+
+    drift_sketch.flush()
+    shadow_evaluator.flush()